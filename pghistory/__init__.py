@@ -1,6 +1,7 @@
 import django
 import pgtrigger
 
+from pghistory.archival import archive, archived_events
 from pghistory.config import (
     ContextForeignKey,
     ContextJSONField,
@@ -19,10 +20,14 @@ from pghistory.core import (
     RowEvent,
     Tracker,
     UpdateEvent,
+    bulk_create_events,
     create_event,
     create_event_model,
     track,
 )
+from pghistory.exporting import export
+from pghistory.partition import create_partitions, detach_partitions
+from pghistory.retention import prune, prune_contexts
 from pghistory.runtime import context
 from pghistory.version import __version__
 
@@ -119,9 +124,12 @@ For specifying a statement-level trigger in a [pghistory.RowEvent][]
 
 __all__ = [
     "AnyChange",
+    "archive",
+    "archived_events",
     "AllChange",
     "AnyDontChange",
     "AllDontChange",
+    "bulk_create_events",
     "Condition",
     "context",
     "ContextForeignKey",
@@ -129,9 +137,12 @@ __all__ = [
     "ContextUUIDField",
     "create_event",
     "create_event_model",
+    "create_partitions",
     "DEFAULT",
     "Delete",
     "DeleteEvent",
+    "detach_partitions",
+    "export",
     "F",
     "Field",
     "ForeignKey",
@@ -142,6 +153,8 @@ __all__ = [
     "ObjForeignKey",
     "Old",
     "ProxyField",
+    "prune",
+    "prune_contexts",
     "Q",
     "RelatedField",
     "Row",
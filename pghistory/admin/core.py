@@ -3,12 +3,20 @@ import warnings
 import django
 from django.apps import apps
 from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
 from django.contrib.admin.utils import unquote
-from django.contrib.admin.views.main import ChangeList
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import connections, router
+from django.utils.dateparse import parse_datetime
 from django.utils.encoding import force_str
+from django.utils.functional import cached_property
 
 from pghistory import config, core
 
+# The query parameter of the keyset pagination cursor
+CURSOR_VAR = "cursor"
+
 
 def _get_model(model):
     if model:
@@ -153,9 +161,85 @@ class BackFilter(DynamicFilter):
     template = "pghistory_admin/hidden_filter.html"
 
 
+def _estimate_count(event_models, using):
+    """Estimates the number of events from the planner statistics of the event tables.
+
+    Partitioned tables don't have statistics, so the statistics of their partitions are used.
+    """
+    connection = connections[using]
+    tables = sorted(
+        {connection.ops.quote_name(event_model._meta.db_table) for event_model in event_models}
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "WITH tables AS (SELECT to_regclass(t) AS oid FROM unnest(%s::TEXT[]) t)"
+            " SELECT COALESCE(SUM(GREATEST(reltuples, 0)), 0) FROM pg_class"
+            " WHERE relkind != 'p' AND (oid IN (SELECT oid FROM tables)"
+            " OR oid IN (SELECT inhrelid FROM pg_inherits"
+            " WHERE inhparent IN (SELECT oid FROM tables)))",
+            [tables],
+        )
+        return int(cursor.fetchone()[0])
+
+
+class EventPaginator(Paginator):
+    """A paginator that counts at most `count_limit + 1` events"""
+
+    def __init__(self, *args, count_limit, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count_limit = count_limit
+
+    @cached_property
+    def count(self):
+        return self.object_list.order_by()[: self.count_limit + 1].count()
+
+    @property
+    def count_capped(self):
+        return self.count > self.count_limit
+
+
+class EventChangeList(ChangeList):
+    pgh_count_capped = False
+
+    def get_results(self, request):
+        super().get_results(request)
+
+        if getattr(self.paginator, "count_capped", False):
+            # Showing all events would fetch every event beyond the limit
+            self.can_show_all = False
+            self.pgh_count_capped = True
+            self.pgh_page_range = (
+                self.paginator.get_elided_page_range(self.page_num) if self.multi_page else []
+            )
+
+
 class BaseEventAdmin(admin.ModelAdmin):
     change_list_template = "pghistory_admin/events_change_list.html"
 
+    @property
+    def show_full_result_count(self):
+        """Only count all events when counts aren't limited or there are few events"""
+        count_limit = config.admin_count_limit()
+        return count_limit is None or self.estimate_count() <= count_limit
+
+    def estimate_count(self):
+        """Estimates the number of events shown by the admin without filters"""
+        return _estimate_count([self.model], router.db_for_read(self.model))
+
+    def get_changelist(self, request, **kwargs):
+        return EventChangeList
+
+    def get_paginator(self, request, queryset, per_page, orphans=0, allow_empty_first_page=True):
+        count_limit = config.admin_count_limit()
+        if count_limit is None:
+            return super().get_paginator(
+                request, queryset, per_page, orphans, allow_empty_first_page
+            )
+
+        return EventPaginator(
+            queryset, per_page, orphans, allow_empty_first_page, count_limit=count_limit
+        )
+
     def has_add_permission(self, request):
         return False
 
@@ -192,7 +276,9 @@ class EventModelAdmin(BaseEventAdmin):
     list_filter = [LabelFilter, ObjFilter, BackFilter]
 
 
-class EventsChangeList(ChangeList):
+class EventsChangeList(EventChangeList):
+    pgh_keyset = False
+
     def get_queryset(self, request):
         # Note: Call get_queryset first so that has_active_filters is accurate
         qset = super().get_queryset(request)
@@ -207,12 +293,80 @@ class EventsChangeList(ChangeList):
 
         return qset
 
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def _get_keyset_descending(self):
+        """Returns the keyset direction or None if the keyset can't be used"""
+        if not config.admin_keyset_pagination() or ORDER_VAR in self.params:
+            return None
+
+        ordering = self.queryset.query.order_by
+        if ordering and ordering[0] in ("pgh_created_at", "-pgh_created_at"):
+            return ordering[0].startswith("-")
+
+    def _get_cursor(self, request):
+        cursor = request.GET.get(CURSOR_VAR)
+        if not cursor:
+            return None
+
+        created_at, _, model_id = cursor.partition(",")
+        pgh_model, _, pgh_id = model_id.partition(",")
+        try:
+            created_at = parse_datetime(created_at)
+            pgh_id = int(pgh_id)
+        except ValueError:
+            created_at = None
+
+        if not created_at or not pgh_model:
+            raise IncorrectLookupParameters
+
+        return created_at, pgh_model, pgh_id
+
+    def get_results(self, request):
+        descending = self._get_keyset_descending()
+        if descending is None:
+            return super().get_results(request)
+
+        # Fetch one more event than the page to know if there's a next page.
+        # Events are never counted since it requires aggregating all of them.
+        cursor = self._get_cursor(request)
+        result_list = list(
+            self.queryset.after(cursor, descending=descending)[: self.list_per_page + 1]
+        )
+        has_next = len(result_list) > self.list_per_page
+        result_list = result_list[: self.list_per_page]
+
+        self.pgh_keyset = True
+        self.pgh_first_url = self.get_query_string(remove=[CURSOR_VAR]) if cursor else None
+        self.pgh_next_url = None
+        if has_next:
+            last = result_list[-1]
+            self.pgh_next_url = self.get_query_string(
+                {CURSOR_VAR: f"{last.pgh_created_at.isoformat()},{last.pgh_model},{last.pgh_id}"}
+            )
+
+        self.result_count = len(result_list)
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = result_list
+        self.can_show_all = False
+        self.multi_page = bool(cursor or has_next)
+        self.paginator = Paginator(result_list, self.list_per_page)
+
 
 class EventsAdmin(BaseEventAdmin):
     """
     The admin for showing events across all event models
     """
 
+    def estimate_count(self):
+        queryset = config.admin_queryset()
+        return _estimate_count(core.event_models(), queryset.db)
+
     def get_changelist(self, request, **kwargs):
         return EventsChangeList
 
@@ -1,7 +1,22 @@
 import django.apps
+import django.db.backends.postgresql.schema as postgresql_schema
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.migrations import state
+from django.db.models import options
 from django.db.models.signals import class_prepared, post_migrate
+from django.db.utils import load_backend
 
-from pghistory import config
+from pghistory import config, partition, runtime
+
+# Allow event models to be partitioned with Meta.pgh_partition and
+# keep the option in the migration state so that tables are created
+# with partitioning
+if "pgh_partition" not in options.DEFAULT_NAMES:  # pragma: no branch
+    options.DEFAULT_NAMES = tuple(options.DEFAULT_NAMES) + ("pgh_partition",)
+
+if "pgh_partition" not in state.DEFAULT_NAMES:  # pragma: no branch
+    state.DEFAULT_NAMES = tuple(state.DEFAULT_NAMES) + ("pgh_partition",)
 
 
 def pgh_setup(sender, **kwargs):
@@ -9,6 +24,26 @@ def pgh_setup(sender, **kwargs):
         sender.pghistory_setup()
 
 
+def patch_schema_editor():
+    """
+    Patch the schema editor to create partitioned tables for partitioned event models
+    """
+    for db_config in settings.DATABASES.values():
+        backend = load_backend(db_config["ENGINE"])
+        schema_editor_class = backend.DatabaseWrapper.SchemaEditorClass
+
+        if (
+            schema_editor_class
+            and issubclass(schema_editor_class, postgresql_schema.DatabaseSchemaEditor)
+            and not issubclass(schema_editor_class, partition.DatabaseSchemaEditorMixin)
+        ):
+            backend.DatabaseWrapper.SchemaEditorClass = type(
+                "DatabaseSchemaEditor",
+                (partition.DatabaseSchemaEditorMixin, schema_editor_class),
+                {},
+            )
+
+
 def install_on_migrate(using, **kwargs):  # pragma: no cover
     if config.install_context_func_on_migrate():
         Context = django.apps.apps.get_model("pghistory", "Context")
@@ -32,4 +67,6 @@ class PGHistoryConfig(django.apps.AppConfig):
         # Register custom checks
         from pghistory import checks  # noqa
 
+        patch_schema_editor()
         post_migrate.connect(install_on_migrate, sender=self)
+        connection_created.connect(runtime._install_inject_history_context)
@@ -0,0 +1,249 @@
+"""Archiving old events to compressed files"""
+
+import base64
+import datetime
+import gzip
+import json
+import os
+import pathlib
+from typing import Dict, Iterator, Optional, Type, Union
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+from pghistory import config, retention, utils
+
+_MONTH_FORMAT = "%Y-%m"
+_SUFFIX = ".jsonl.gz"
+_CONTEXT_FIELDS = ("created_at", "updated_at", "metadata")
+
+
+class _JSONEncoder(DjangoJSONEncoder):
+    """Encodes values without losing precision so that they can be read by their fields"""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        elif isinstance(o, (bytes, memoryview)):
+            return base64.b64encode(o).decode()
+
+        return super().default(o)
+
+
+def _get_directory(directory: Union[str, os.PathLike, None]) -> pathlib.Path:
+    directory = directory or config.archive_dir()
+    if not directory:
+        raise ValueError("Supply a directory or set settings.PGHISTORY_ARCHIVE_DIR.")
+
+    return pathlib.Path(directory)
+
+
+def _get_model_directory(event_model: Type[models.Model], directory: pathlib.Path):
+    return directory / event_model._meta.app_label / event_model._meta.model_name
+
+
+def _get_month(dt: datetime.datetime) -> str:
+    return dt.astimezone(datetime.timezone.utc).strftime(_MONTH_FORMAT)
+
+
+def _write(path: pathlib.Path, lines: list) -> None:
+    """Append lines to a compressed file and flush them to disk.
+
+    Every write appends a new gzip member, which is read as part of the same file.
+    """
+    with open(path, "ab") as f:
+        with gzip.GzipFile(fileobj=f, mode="ab") as gz:
+            gz.writelines(lines)
+
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _get_context_field(event_model: Type[models.Model]) -> Union[models.Field, None]:
+    """The `pgh_context` field of an event model if it references the context model"""
+    from pghistory.models import Context  # noqa
+
+    return next(
+        (
+            field
+            for field in event_model._meta.concrete_fields
+            if field.name == "pgh_context" and utils.related_model(field) == Context
+        ),
+        None,
+    )
+
+
+def _archive(event_model, *, directory, batch_size, using, **policy):
+    q = retention._get_prune_q(event_model, **policy)
+    fields = event_model._meta.concrete_fields
+    # Contexts are archived with their events since they're pruned once they
+    # aren't referenced by events in the database
+    context_values = (
+        [f"pgh_context__{name}" for name in _CONTEXT_FIELDS]
+        if _get_context_field(event_model)
+        else []
+    )
+    model_directory = _get_model_directory(event_model, directory)
+    model_directory.mkdir(parents=True, exist_ok=True)
+    num_archived = 0
+    after = 0
+
+    while True:
+        # Events are streamed with a server-side cursor and buffered by month until
+        # the batch has been written. Events are only deleted after they're on disk.
+        rows = (
+            event_model.objects.using(using)
+            .filter(q, pgh_id__gt=after)
+            .order_by("pgh_id")
+            .values(*(field.attname for field in fields), *context_values)[:batch_size]
+            .iterator(chunk_size=batch_size)
+        )
+        pgh_ids = []
+        months = {}
+        for row in rows:
+            pgh_ids.append(row["pgh_id"])
+            if context_values:
+                context = {name: row.pop(f"pgh_context__{name}") for name in _CONTEXT_FIELDS}
+                row["pgh_context"] = context if row["pgh_context_id"] is not None else None
+
+            months.setdefault(_get_month(row["pgh_created_at"]), []).append(
+                json.dumps(row, cls=_JSONEncoder).encode() + b"\n"
+            )
+
+        if not pgh_ids:
+            return num_archived
+
+        for month, lines in months.items():
+            _write(model_directory / f"{month}{_SUFFIX}", lines)
+
+        num_archived += retention._delete_events(event_model, pgh_ids, using=using)
+        after = pgh_ids[-1]
+
+
+def archive(
+    *event_models: Type[models.Model],
+    age: datetime.timedelta,
+    keep_latest: bool = True,
+    directory: Union[str, os.PathLike, None] = None,
+    batch_size: int = 1000,
+    using: str = "default",
+) -> Dict[Type[models.Model], int]:
+    """Move events older than an age to compressed files.
+
+    Events are written as JSON lines to gzip-compressed files in
+    `<directory>/<app_label>/<model_name>/<YYYY-MM>.jsonl.gz`, partitioned by
+    the month of `pgh_created_at`. Archived events are deleted from the database
+    in batches. Use [pghistory.archived_events][] to read them.
+
+    Args:
+        *event_models: The event models to archive. Defaults to all event models.
+        age: Archive events older than this age.
+        keep_latest: Never archive the latest event of an object.
+        directory: The archive directory. Defaults to `settings.PGHISTORY_ARCHIVE_DIR`.
+        batch_size: The number of events archived in each transaction.
+        using: The database.
+
+    Returns:
+        The number of archived events of each event model.
+    """
+    directory = _get_directory(directory)
+    policy = {"age": age, "keep_latest": keep_latest}
+
+    return {
+        event_model: _archive(
+            event_model, directory=directory, batch_size=batch_size, using=using, **policy
+        )
+        for event_model, _ in retention._get_policies(list(event_models), policy)
+    }
+
+
+def archived_events(
+    event_model: Type[models.Model],
+    *,
+    obj: Optional[models.Model] = None,
+    after: Optional[datetime.datetime] = None,
+    before: Optional[datetime.datetime] = None,
+    directory: Union[str, os.PathLike, None] = None,
+    include_database: bool = False,
+    using: str = "default",
+) -> Iterator[models.Model]:
+    """Iterate over archived events by the month they were created in and by
+    primary key within each month.
+
+    Only the files of the months between `after` and `before` are read. Events
+    that were archived more than once are only returned once. The context of
+    events that reference the context model is archived with them and is
+    available as `pgh_context` without querying the database.
+
+    Args:
+        event_model: The event model.
+        obj: Only return events of this object.
+        after: Only return events created at or after this time.
+        before: Only return events created before this time.
+        directory: The archive directory. Defaults to `settings.PGHISTORY_ARCHIVE_DIR`.
+        include_database: Fall back to the events in the database after the
+            archived events are returned.
+        using: The database used when including events in the database.
+
+    Returns:
+        Unsaved instances of the event model.
+    """
+    from pghistory.models import Context  # noqa
+
+    fields = event_model._meta.concrete_fields
+    obj_field = next((field for field in fields if field.name == "pgh_obj"), None)
+    if obj is not None and not obj_field:
+        raise ValueError("Event models must have an obj_field to filter by obj.")
+
+    context_field = _get_context_field(event_model)
+    paths = sorted(
+        _get_model_directory(event_model, _get_directory(directory)).glob(f"*{_SUFFIX}")
+    )
+    for path in paths:
+        month = path.name[: -len(_SUFFIX)]
+        if (after and month < _get_month(after)) or (before and month > _get_month(before)):
+            continue
+
+        # Later runs can append events with lower primary keys, such as the latest
+        # events of objects that were kept, so each month is sorted when it's read
+        events = {}
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                event = event_model(
+                    **{field.attname: field.to_python(row[field.attname]) for field in fields}
+                )
+
+                if (
+                    event.pgh_id in events
+                    or (obj is not None and getattr(event, obj_field.attname) != obj.pk)
+                    or (after and event.pgh_created_at < after)
+                    or (before and event.pgh_created_at >= before)
+                ):
+                    continue
+
+                if context_field and row.get("pgh_context"):
+                    event.pgh_context = Context(
+                        id=event.pgh_context_id,
+                        **{
+                            name: Context._meta.get_field(name).to_python(row["pgh_context"][name])
+                            for name in _CONTEXT_FIELDS
+                        },
+                    )
+
+                events[event.pgh_id] = event
+
+        yield from (events[pgh_id] for pgh_id in sorted(events))
+
+    if include_database:
+        events = event_model.objects.using(using).order_by("pgh_id")
+        if context_field:
+            events = events.select_related("pgh_context")
+        if obj is not None:
+            events = events.filter(pgh_obj=obj)
+        if after:
+            events = events.filter(pgh_created_at__gte=after)
+        if before:
+            events = events.filter(pgh_created_at__lt=before)
+
+        yield from events.iterator()
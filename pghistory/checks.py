@@ -1,5 +1,7 @@
 from django.conf import settings
 from django.core import checks
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
 
 
 @checks.register(checks.Tags.compatibility)
@@ -15,3 +17,59 @@ def check_pgtrigger_installed(app_configs, **kwargs):
         )
 
     return errors
+
+
+def _has_leading_index(model, field):
+    """True if a b-tree index on the model leads with the field"""
+    if field.primary_key or field.unique or field.db_index:
+        return True
+
+    return any(
+        type(index) is models.Index and index.fields and index.fields[0].lstrip("-") == field.name
+        for index in model._meta.indexes
+    )
+
+
+@checks.register(checks.Tags.models)
+def check_admin_ordering_indexes(app_configs, **kwargs):
+    from pghistory import config, core
+
+    warnings = []
+
+    if "pghistory.admin" not in settings.INSTALLED_APPS:
+        return warnings
+
+    ordering = config.admin_ordering()
+    if not ordering or not isinstance(ordering[0], str):
+        return warnings
+
+    # A single warning lists every model so that projects with many event
+    # models aren't flooded with warnings
+    field_name = ordering[0].lstrip("-")
+    unindexed = []
+    for event_model in core.event_models():
+        if app_configs is not None and event_model._meta.app_config not in app_configs:
+            continue
+
+        try:
+            field = event_model._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            continue
+
+        if not _has_leading_index(event_model, field):
+            unindexed.append(event_model._meta.label)
+
+    if unindexed:
+        warnings.append(
+            checks.Warning(
+                f'No index supports ordering the events admin by "{field_name}" for'
+                f" {len(unindexed)} event model(s): {', '.join(sorted(unindexed))}.",
+                hint=(
+                    'Set PGHISTORY_INDEXES = "recommended" or add an index that starts'
+                    f' with "{field_name}" to the event models.'
+                ),
+                id="pghistory.W001",
+            )
+        )
+
+    return warnings
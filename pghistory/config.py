@@ -48,6 +48,35 @@ def append_only() -> bool:
     return getattr(settings, "PGHISTORY_APPEND_ONLY", False)
 
 
+def indexes() -> Union[str, None]:
+    """The default indexes added to event models.
+
+    Use "recommended" to index the tracked object and event creation time.
+
+    Returns:
+        The indexes setting or `None` if no indexes are added by default.
+    """
+    return getattr(settings, "PGHISTORY_INDEXES", None)
+
+
+def retention() -> Dict[str, Dict[str, Any]]:
+    """The retention policies used when pruning events.
+
+    Returns:
+        Keyword arguments of [pghistory.prune][] keyed by event model label.
+    """
+    return getattr(settings, "PGHISTORY_RETENTION", {})
+
+
+def archive_dir() -> Union[str, None]:
+    """The directory where events are archived.
+
+    Returns:
+        The directory used by [pghistory.archive][] when no directory is supplied.
+    """
+    return getattr(settings, "PGHISTORY_ARCHIVE_DIR", None)
+
+
 def middleware_methods() -> Tuple[str, ...]:
     """
     Methods tracked by the pghistory middleware.
@@ -71,6 +100,36 @@ def install_context_func_on_migrate() -> bool:
     return getattr(settings, "PGHISTORY_INSTALL_CONTEXT_FUNC_ON_MIGRATE", False)
 
 
+def context_injection() -> str:
+    """How context variables are injected into SQL when using `pghistory.context`.
+
+    "statement" adds the variables to every statement. "transaction" adds them
+    once per transaction and only adds them again when the context metadata
+    changes or after a savepoint is rolled back.
+
+    Returns:
+        Either "statement" or "transaction"
+    """
+    injection = getattr(settings, "PGHISTORY_CONTEXT_INJECTION", "statement")
+    assert injection in ("statement", "transaction")
+    return injection
+
+
+def attach_context_cache() -> str:
+    """How the `_pgh_attach_context()` Postgres function caches attached context.
+
+    "transaction" caches the context for the transaction. "session" caches the
+    context ID and a hash of its metadata for the database session. The function
+    must be reinstalled after changing this setting.
+
+    Returns:
+        Either "transaction" or "session"
+    """
+    cache = getattr(settings, "PGHISTORY_ATTACH_CONTEXT_CACHE", "transaction")
+    assert cache in ("transaction", "session")
+    return cache
+
+
 def json_encoder() -> Type["JSONEncoder"]:
     """The JSON encoder when tracking context
 
@@ -272,6 +331,24 @@ def admin_all_events() -> bool:
     return getattr(settings, "PGHISTORY_ADMIN_ALL_EVENTS", True)
 
 
+def admin_count_limit() -> Union[int, None]:
+    """The maximum number of events counted by event admins.
+
+    Returns:
+        The count limit or `None` if events are counted exactly
+    """
+    return getattr(settings, "PGHISTORY_ADMIN_COUNT_LIMIT", None)
+
+
+def admin_keyset_pagination() -> bool:
+    """True if the events admin paginates with a keyset instead of page numbers.
+
+    Returns:
+        The bool setting
+    """
+    return getattr(settings, "PGHISTORY_ADMIN_KEYSET_PAGINATION", False)
+
+
 def admin_list_display() -> List[str]:
     """The default list display for the events admin.
 
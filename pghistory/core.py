@@ -11,6 +11,8 @@ import django
 import pgtrigger
 import pgtrigger.core
 from django.apps import apps
+from django.contrib.postgres.fields import ArrayField
+from django.core.exceptions import FieldDoesNotExist
 from django.db import connections, models
 from django.db.models import sql
 from django.db.models.fields.related import RelatedField
@@ -18,32 +20,70 @@ from django.db.models.sql import compiler
 from django.utils.module_loading import import_string
 from django.utils.text import slugify
 
-from pghistory import config, constants, runtime, trigger, utils
+from pghistory import config, constants, partition, runtime, trigger, utils
 
 if TYPE_CHECKING:
     from pghistory import ContextForeignKey, ContextJSONField, ContextUUIDField, ObjForeignKey
 
-if utils.psycopg_maj_version == 2:
-    from psycopg2.extensions import AsIs as Literal
-elif utils.psycopg_maj_version == 3:
-    import psycopg.adapt
 
-    class Literal:
-        def __init__(self, val):
-            self.val = val
+class _EventSpec:
+    """
+    The field mappings for manually creating events of a tracker, computed
+    once when the tracker is registered
+    """
+
+    __slots__ = (
+        "event_model",
+        "attnames",
+        "insert_fields",
+        "has_obj",
+        "has_context",
+        "has_denormalized_context",
+        "has_context_id",
+    )
+
+    def __init__(self, event_model: Type[models.Model]):
+        tracked_model_fields = {
+            field.attname for field in event_model.pgh_tracked_model._meta.fields
+        }
+        self.event_model = event_model
+        self.attnames = tuple(
+            field.attname
+            for field in event_model._meta.fields
+            if not field.name.startswith("pgh_") and field.attname in tracked_model_fields
+        )
+        self.insert_fields = [
+            field for field in event_model._meta.fields if not isinstance(field, models.AutoField)
+        ]
+        self.has_obj = hasattr(event_model, "pgh_obj")
+        self.has_context = hasattr(event_model, "pgh_context")
+        self.has_denormalized_context = self.has_context and isinstance(
+            event_model.pgh_context.field, utils.JSONField
+        )
+        self.has_context_id = hasattr(event_model, "pgh_context_id")
+
+    def event_model_kwargs(self, obj: models.Model, label: str) -> Dict[str, Any]:
+        event_model_kwargs = {"pgh_label": label}
+        for attname in self.attnames:
+            event_model_kwargs[attname] = getattr(obj, attname)
 
-    class LiteralDumper(psycopg.adapt.Dumper):
-        def dump(self, obj):
-            return obj.val.encode("utf-8")
+        if self.has_obj:
+            event_model_kwargs["pgh_obj"] = obj
 
-        def quote(self, obj):
-            return self.dump(obj)
+        return event_model_kwargs
 
-else:
-    raise AssertionError
+    def denormalized_context_kwargs(self) -> Dict[str, Any]:
+        kwargs = {}
+        if hasattr(runtime._tracker, "value"):
+            kwargs["pgh_context"] = runtime._tracker.value.metadata
+
+            if self.has_context_id:
+                kwargs["pgh_context_id"] = runtime._tracker.value.id
+
+        return kwargs
 
 
-_registered_trackers = {}
+_registered_trackers: Dict[Any, _EventSpec] = {}
 
 
 class Tracker:
@@ -65,14 +105,15 @@ class Tracker:
         """Registers the tracker for the event model and calls user-defined setup"""
         tracked_model = event_model.pgh_tracked_model
 
-        if _registered_trackers.get((tracked_model, self.label), event_model) != event_model:
+        registered = _registered_trackers.get((tracked_model, self.label))
+        if registered and registered.event_model != event_model:
             raise ValueError(
                 f'Tracker with label "{self.label}" already exists for a different'
                 f' event model of "{tracked_model._meta.label}". Supply a'
                 " different label as the first argument to the tracker."
             )
 
-        _registered_trackers[(tracked_model, self.label)] = event_model
+        _registered_trackers[(tracked_model, self.label)] = _EventSpec(event_model)
 
         self.setup(event_model)
 
@@ -238,11 +279,14 @@ def _get_field_construction(field):
     return cls, args, kwargs
 
 
-def _generate_history_field(tracked_model, field):
+def _generate_history_field(tracked_model, field, null=False):
     """
     When generating a history model from a tracked model, ensure the fields
     are set up properly so that related names and other information
     from the tracked model do not cause errors.
+
+    Fields are nullable when `null` is `True`, which is used by event models
+    that only store changed fields.
     """
     field = tracked_model._meta.get_field(field)
 
@@ -250,10 +294,11 @@ def _generate_history_field(tracked_model, field):
     # need to double-check that it's different before we pass it through
     db_column = field.db_column if field.db_column != field.name else None
 
+    null_kwargs = {"null": True} if null else {}
     if isinstance(field, models.BigAutoField):
-        return models.BigIntegerField(db_column=db_column)
+        return models.BigIntegerField(db_column=db_column, **null_kwargs)
     elif isinstance(field, models.AutoField):
-        return models.IntegerField(db_column=db_column)
+        return models.IntegerField(db_column=db_column, **null_kwargs)
     elif not field.concrete:  # pragma: no cover
         # Django doesn't have any non-concrete fields that appear
         # in ._meta.fields, but packages like django-prices have
@@ -267,7 +312,7 @@ def _generate_history_field(tracked_model, field):
     swappable = getattr(field, "swappable", constants.UNSET)
     field.swappable = False
     cls, args, kwargs = _get_field_construction(field)
-    field = cls(*args, **kwargs)
+    field = cls(*args, **{**kwargs, **null_kwargs})
 
     if swappable is not constants.UNSET:
         field.swappable = swappable
@@ -350,6 +395,39 @@ def _get_append_only(append_only):
     return config.append_only() if append_only is constants.UNSET else append_only
 
 
+def _get_indexes(indexes, *, obj_field):
+    indexes = config.indexes() if indexes is constants.UNSET else indexes
+
+    if indexes is None:
+        return []
+    elif indexes != "recommended":
+        raise ValueError(f'indexes must be "recommended" or None, not {indexes!r}.')
+
+    # Previous events of an object are looked up by pgh_obj and pgh_id, and
+    # the events admin orders and paginates by pgh_created_at
+    return [
+        *([models.Index(fields=["pgh_obj", "pgh_id"])] if obj_field else []),
+        models.Index(fields=["pgh_created_at"]),
+    ]
+
+
+def _validate_partition_field(base_model, class_attrs, name):
+    """Validate the field of a partitioned event model before the model is created"""
+    field = class_attrs.get(name)
+    if not isinstance(field, models.Field):
+        try:
+            field = base_model._meta.get_field(name)
+        except FieldDoesNotExist:
+            raise ValueError(
+                f'partition_by field "{name}" does not exist on the event model.'
+            ) from None
+
+    if not isinstance(field, models.DateField) or field.null:
+        raise ValueError(
+            f'partition_by field "{name}" must be a non-nullable DateField or DateTimeField.'
+        )
+
+
 def create_event_model(
     tracked_model: Type[models.Model],
     *trackers: Tracker,
@@ -361,6 +439,11 @@ def create_event_model(
     ] = constants.UNSET,
     context_id_field: Union["ContextUUIDField", constants.Unset] = constants.UNSET,
     append_only: Union[bool, constants.Unset] = constants.UNSET,
+    store_diff: bool = False,
+    store_changes: Union[int, None] = None,
+    indexes: Union[str, None, constants.Unset] = constants.UNSET,
+    partition_by: Union[str, None] = None,
+    partition_interval: str = "month",
     model_name: Union[str, None] = None,
     app_label: Union[str, None] = None,
     base_model: Optional[Type[models.Model]] = None,
@@ -400,6 +483,19 @@ def create_event_model(
             field is used to track the UUID of the context. Use `None` to avoid using this
             field for denormalized context.
         append_only: True if the event model is protected against updates and deletes.
+        store_diff: True if the diff from the previous event of the tracked object is
+            computed when the event is created and stored in a `pgh_diff` field. Requires
+            an `obj_field`.
+        store_changes: Only store the fields that changed since the previous event of the
+            tracked object. Every `store_changes` events of an object store all fields.
+            Requires an `obj_field`.
+        indexes: Use "recommended" to add indexes for the common event queries. Defaults
+            to `settings.PGHISTORY_INDEXES`.
+        partition_by: Create the event table as a table partitioned by range over this
+            non-nullable date or datetime field of the event model, such as
+            `pgh_created_at`.
+        partition_interval: The interval of each partition when using `partition_by`.
+            One of "day", "week", "month", or "year".
         model_name: Use a custom model name when the event model is generated. Otherwise
             a default name based on the tracked model and fields will be created.
         app_label: The app_label for the generated event model. Defaults to the app_label
@@ -448,6 +544,7 @@ def create_event_model(
     context_field = _get_context_field(context_field)
     context_id_field = _get_context_id_field(context_id_field)
     append_only = _get_append_only(append_only)
+    indexes = _get_indexes(indexes, obj_field=obj_field)
 
     model_name = model_name or _generate_event_model_name(base_model, tracked_model, fields)
     app_label = app_label or tracked_model._meta.app_label
@@ -470,11 +567,53 @@ def create_event_model(
             pgtrigger.Protect(name="append_only", operation=pgtrigger.Update | pgtrigger.Delete),
         ]
 
+    if store_diff:
+        if not obj_field:
+            raise ValueError("Event models must have an obj_field to store diffs.")
+
+        attrs["pgh_diff"] = utils.JSONField(
+            null=True,
+            editable=False,
+            help_text="The diff from the previous event of the object.",
+        )
+        meta["triggers"] = [*meta.get("triggers", []), trigger.StoreDiff()]
+
+    if store_changes:
+        if not obj_field:
+            raise ValueError("Event models must have an obj_field to store changes.")
+        elif store_diff:
+            raise ValueError("Event models can't store both changes and diffs.")
+
+        attrs["pgh_changed"] = ArrayField(
+            models.TextField(),
+            null=True,
+            editable=False,
+            help_text="The columns stored by the event. All columns are stored when null.",
+        )
+        meta["triggers"] = [
+            *meta.get("triggers", []),
+            trigger.StoreChanges(interval=store_changes),
+        ]
+
+    if indexes:
+        meta["indexes"] = [*meta.get("indexes", []), *indexes]
+
+    if partition_by:
+        if partition_interval not in partition.INTERVALS:
+            raise ValueError(
+                f"partition_interval must be one of {', '.join(partition.INTERVALS)}."
+            )
+
+        meta["pgh_partition"] = {"field": partition_by, "interval": partition_interval}
+
     class_attrs = {
         "__module__": models_module,
         "Meta": type("Meta", (), {"abstract": abstract, "app_label": app_label, **meta}),
         "pgh_tracked_model": tracked_model,
-        **{field: _generate_history_field(tracked_model, field) for field in fields},
+        **{
+            field: _generate_history_field(tracked_model, field, null=bool(store_changes))
+            for field in fields
+        },
         **attrs,
     }
 
@@ -487,6 +626,9 @@ def create_event_model(
     if obj_field:
         class_attrs["pgh_obj"] = obj_field
 
+    if partition_by:
+        _validate_partition_field(base_model, class_attrs, partition_by)
+
     event_model = type(model_name, (base_model,), class_attrs)
     if not abstract:
         setattr(sys.modules[models_module], model_name, event_model)
@@ -519,6 +661,11 @@ def track(
     ] = constants.UNSET,
     context_id_field: Union["ContextUUIDField", constants.Unset] = constants.UNSET,
     append_only: Union[bool, constants.Unset] = constants.UNSET,
+    store_diff: bool = False,
+    store_changes: Union[int, None] = None,
+    indexes: Union[str, None, constants.Unset] = constants.UNSET,
+    partition_by: Union[str, None] = None,
+    partition_interval: str = "month",
     model_name: Optional[str] = None,
     app_label: Optional[str] = None,
     base_model: Optional[Type[models.Model]] = None,
@@ -558,6 +705,17 @@ def track(
             track the UUID of the context. Use `None` to avoid using this field for denormalized
             context.
         append_only: True if the event model is protected against updates and deletes.
+        store_diff: True if the diff from the previous event of the tracked object is computed
+            when the event is created and stored in a `pgh_diff` field. Requires an `obj_field`.
+        store_changes: Only store the fields that changed since the previous event of the tracked
+            object. Every `store_changes` events of an object store all fields. Requires an
+            `obj_field`.
+        indexes: Use "recommended" to add indexes for the common event queries. Defaults to
+            `settings.PGHISTORY_INDEXES`.
+        partition_by: Create the event table as a table partitioned by range over this
+            non-nullable datetime field, such as `pgh_created_at`.
+        partition_interval: The interval of each partition when using `partition_by`. One of
+            "day", "week", "month", or "year".
         model_name: Use a custom model name when the event model is generated. Otherwise a default
             name based on the tracked model and fields will be created.
         app_label: The app_label for the generated event model. Defaults to the app_label of the
@@ -580,6 +738,11 @@ def track(
             context_field=context_field,
             context_id_field=context_id_field,
             append_only=append_only,
+            store_diff=store_diff,
+            store_changes=store_changes,
+            indexes=indexes,
+            partition_by=partition_by,
+            partition_interval=partition_interval,
             model_name=model_name,
             app_label=app_label,
             abstract=False,
@@ -595,15 +758,57 @@ def track(
 
 
 class _InsertEventCompiler(compiler.SQLInsertCompiler):
+    """
+    Inserts events, attaching context with the _pgh_attach_context stored procedure.
+
+    The procedure is evaluated once in a CTE and referenced by every inserted
+    row, so a batch of events resolves context with a single call.
+    """
+
     def as_sql(self, *args, **kwargs):
-        ret = super().as_sql(*args, **kwargs)
-        assert len(ret) == 1
-        params = [
-            param if field.name != "pgh_context" else Literal("_pgh_attach_context()")
-            for field, param in zip(self.query.fields, ret[0][1], strict=True)
+        return [
+            (
+                f"WITH _pgh_attached_context AS (SELECT _pgh_attach_context() AS value) {sql}",
+                params,
+            )
+            for sql, params in super().as_sql(*args, **kwargs)
         ]
 
-        return [(ret[0][0], params)]
+
+def _get_event_spec(obj: models.Model, label: str) -> _EventSpec:
+    # Verify that the provided label is tracked
+    try:
+        return _registered_trackers[(obj.__class__, label)]
+    except KeyError:
+        raise ValueError(
+            f'"{label}" is not a registered tracker label for model {obj._meta.object_name}.'
+        ) from None
+
+
+def _insert_events(spec: _EventSpec, event_objs: List[models.Model], using: str) -> None:
+    # The event model is inserted manually with a custom SQL compiler
+    # that attaches the context using the _pgh_attach_context
+    # stored procedure. Django does not allow one to use F()
+    # objects to reference stored procedures, so the value of every
+    # row references the context attached by the compiler's CTE.
+    query = sql.InsertQuery(spec.event_model)
+    if spec.has_context:
+        for event_obj in event_objs:
+            event_obj.pgh_context_id = models.expressions.RawSQL(
+                "(SELECT value FROM _pgh_attached_context)", []
+            )
+
+        insert_compiler = _InsertEventCompiler(query, connections[using], using=using)
+    else:
+        insert_compiler = query.get_compiler(using=using)
+
+    query.insert_values(spec.insert_fields, event_objs)
+    fields = spec.event_model._meta.fields
+    rows = insert_compiler.execute_sql(fields)
+
+    for event_obj, vals in zip(event_objs, rows, strict=True):
+        for field, val in zip(fields, vals, strict=True):
+            setattr(event_obj, field.attname, val)
 
 
 def create_event(obj: models.Model, *, label: str, using: str = "default") -> models.Model:
@@ -623,68 +828,79 @@ def create_event(obj: models.Model, *, label: str, using: str = "default") -> mo
     Returns:
         The created event model object
     """
-    # Verify that the provided label is tracked
-    if (obj.__class__, label) not in _registered_trackers:
-        raise ValueError(
-            f'"{label}" is not a registered tracker label for model {obj._meta.object_name}.'
+    spec = _get_event_spec(obj, label)
+    event_model_kwargs = spec.event_model_kwargs(obj, label)
+
+    if spec.has_denormalized_context:
+        return spec.event_model.objects.create(
+            **event_model_kwargs, **spec.denormalized_context_kwargs()
         )
+    else:
+        event_obj = spec.event_model(**event_model_kwargs)
+        _insert_events(spec, [event_obj], using)
+        return event_obj
 
-    event_model = _registered_trackers[(obj.__class__, label)]
-    tracked_model_fields = {field.attname for field in obj._meta.fields}
-    event_model_kwargs = {
-        "pgh_label": label,
-        **{
-            field.attname: getattr(obj, field.attname)
-            for field in event_model._meta.fields
-            if not field.name.startswith("pgh_") and field.attname in tracked_model_fields
-        },
-    }
-    if hasattr(event_model, "pgh_obj"):
-        event_model_kwargs["pgh_obj"] = obj
 
-    if hasattr(event_model, "pgh_context") and isinstance(
-        event_model.pgh_context.field, utils.JSONField
-    ):
-        if hasattr(runtime._tracker, "value"):
-            event_model_kwargs["pgh_context"] = runtime._tracker.value.metadata
+def bulk_create_events(
+    objs: List[models.Model],
+    *,
+    label: str,
+    using: str = "default",
+    batch_size: Optional[int] = None,
+) -> List[models.Model]:
+    """Manually create events for many objects of the same model.
 
-            if hasattr(event_model, "pgh_context_id"):
-                event_model_kwargs["pgh_context_id"] = runtime._tracker.value.id
+    Events are inserted with multi-row `INSERT` statements, and any context
+    being tracked via [pghistory.context][] is attached once per statement
+    rather than once per event.
 
-        return event_model.objects.create(**event_model_kwargs)
-    else:
-        event_obj = event_model(**event_model_kwargs)
-
-        # The event model is inserted manually with a custom SQL compiler
-        # that attaches the context using the _pgh_attach_context
-        # stored procedure. Django does not allow one to use F()
-        # objects to reference stored procedures, so we have to
-        # inject it with a custom SQL compiler here.
-        query = sql.InsertQuery(event_model)
-        query.insert_values(
-            [
-                field
-                for field in event_model._meta.fields
-                if not isinstance(field, models.AutoField)
-            ],
-            [event_obj],
-        )
+    Args:
+        objs: Instances of a model.
+        label: The event label.
+        using: The database
+        batch_size: The maximum number of events inserted per statement.
+            Defaults to the largest batch supported by the database, like
+            Django's `bulk_create`.
 
-        if utils.psycopg_maj_version == 3:
-            connections[using].connection.adapters.register_dumper(Literal, LiteralDumper)
+    Raises:
+        ValueError: If the event label has not been registered for the model,
+            if the objects are of different models, or if the batch size is
+            not positive.
 
-        vals = _InsertEventCompiler(query, connections[using], using=using).execute_sql(
-            event_model._meta.fields
-        )
+    Returns:
+        The created event model objects, in the order of the provided objects
+    """
+    objs = list(objs)
+    if not objs:
+        return []
 
-        # Django >= 3.1 returns the values as a list of one element
-        if isinstance(vals, list) and len(vals) == 1:  # pragma: no branch
-            vals = vals[0]
+    if batch_size is not None and batch_size <= 0:
+        raise ValueError("Batch size must be a positive integer.")
 
-        for field, val in zip(event_model._meta.fields, vals, strict=True):
-            setattr(event_obj, field.attname, val)
+    if len({obj.__class__ for obj in objs}) > 1:
+        raise ValueError("Events can only be bulk created for objects of the same model.")
 
-        return event_obj
+    spec = _get_event_spec(objs[0], label)
+
+    if spec.has_denormalized_context:
+        context_kwargs = spec.denormalized_context_kwargs()
+        return spec.event_model.objects.using(using).bulk_create(
+            [
+                spec.event_model(**spec.event_model_kwargs(obj, label), **context_kwargs)
+                for obj in objs
+            ],
+            batch_size=batch_size,
+        )
+    else:
+        event_objs = [spec.event_model(**spec.event_model_kwargs(obj, label)) for obj in objs]
+        # Like bulk_create(), batches never exceed what the database supports
+        ops = connections[using].ops
+        max_batch_size = max(ops.bulk_batch_size(spec.insert_fields, event_objs), 1)
+        batch_size = min(batch_size, max_batch_size) if batch_size else max_batch_size
+        for i in range(0, len(event_objs), batch_size):
+            _insert_events(spec, event_objs[i : i + batch_size], using)
+
+        return event_objs
 
 
 def event_models(
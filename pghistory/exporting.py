@@ -0,0 +1,80 @@
+"""Streaming exports of events with COPY"""
+
+from typing import BinaryIO
+
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, models
+
+from pghistory import utils
+
+FORMATS = ("csv", "jsonl", "binary")
+"""The formats in which querysets can be exported"""
+
+_CHUNK_SIZE = 64 * 1024
+
+
+def _get_copy_sql(queryset: models.QuerySet, fmt: str, connection) -> str:
+    """Compile a queryset into a COPY statement.
+
+    COPY doesn't support query parameters, so they are bound by the client. Cursors
+    don't always support binding parameters, such as psycopg 3 cursors with
+    server-side binding, so the parameters are bound by the database backend.
+    """
+    sql, params = queryset.query.get_compiler(connection=connection).as_sql()
+    sql = connection.ops.compose_sql(sql, params)
+
+    if fmt == "csv":
+        return f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)"
+    elif fmt == "jsonl":
+        # JSON escapes control characters, so using them as the quote and delimiter
+        # characters of the CSV format writes each row without escaping it
+        return (
+            f"COPY (SELECT row_to_json(pgh_export) FROM ({sql}) pgh_export) TO STDOUT"
+            " WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')"
+        )
+    else:
+        return f"COPY ({sql}) TO STDOUT WITH (FORMAT binary)"
+
+
+def _copy_to(cursor, sql: str, stream: BinaryIO) -> int:
+    """Run a COPY ... TO STDOUT statement, writing its output to a stream in chunks"""
+    if utils.psycopg_maj_version == 2:
+        cursor.copy_expert(sql, stream, size=_CHUNK_SIZE)
+    elif utils.psycopg_maj_version == 3:
+        with cursor.copy(sql) as copy:
+            for data in copy:
+                stream.write(data)
+    else:
+        raise AssertionError
+
+    return cursor.rowcount
+
+
+def export(queryset: models.QuerySet, stream: BinaryIO, *, fmt: str = "csv") -> int:
+    """Stream the rows of a queryset to a file with `COPY ... TO STDOUT`.
+
+    Rows are streamed by Postgres in chunks and are never loaded by the ORM, so
+    memory stays constant regardless of the size of the export. Any queryset can
+    be exported, including event model querysets, `values()` querysets, and
+    [pghistory.models.Events][] querysets.
+
+    Args:
+        queryset: The queryset to export.
+        stream: A writable binary file-like object.
+        fmt: `csv` for CSV with a header, `jsonl` for a JSON object on each line,
+            or `binary` for the binary COPY format of Postgres.
+
+    Returns:
+        The number of exported rows.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"fmt must be one of {', '.join(FORMATS)}.")
+
+    connection = connections[queryset.db]
+    try:
+        sql = _get_copy_sql(queryset, fmt, connection)
+    except EmptyResultSet:
+        return 0
+
+    with connection.cursor() as cursor:
+        return _copy_to(cursor, sql, stream)
@@ -0,0 +1,62 @@
+import datetime
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from pghistory import archival, retention
+
+
+class Command(BaseCommand):
+    help = "Move old events to compressed files."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "event_models",
+            nargs="*",
+            help="Event model labels, such as app_label.ModelName. Defaults to all.",
+        )
+        parser.add_argument(
+            "--age", type=float, required=True, help="Archive events older than this many days."
+        )
+        parser.add_argument(
+            "--no-keep-latest",
+            action="store_false",
+            dest="keep_latest",
+            help="Allow archiving the latest event of an object.",
+        )
+        parser.add_argument(
+            "--directory",
+            help="The archive directory. Defaults to settings.PGHISTORY_ARCHIVE_DIR.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="The number of events archived in each transaction.",
+        )
+        parser.add_argument(
+            "--database", default=DEFAULT_DB_ALIAS, help="The database to archive."
+        )
+
+    def handle(self, *args, **options):
+        directory = archival._get_directory(options["directory"])
+        event_models = [apps.get_model(label) for label in options["event_models"]]
+        policy = {"age": datetime.timedelta(days=options["age"])}
+        for event_model, _ in retention._get_policies(event_models, policy):
+            start = time.monotonic()
+            num_archived = archival.archive(
+                event_model,
+                age=policy["age"],
+                keep_latest=options["keep_latest"],
+                directory=directory,
+                batch_size=options["batch_size"],
+                using=options["database"],
+            )[event_model]
+            elapsed = time.monotonic() - start
+            rate = num_archived / elapsed if elapsed else num_archived
+            self.stdout.write(
+                f"Archived {num_archived} events from {event_model._meta.label}"
+                f" in {elapsed:.2f}s ({rate:.0f}/s)"
+            )
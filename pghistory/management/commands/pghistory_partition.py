@@ -0,0 +1,53 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from pghistory import partition
+
+
+class Command(BaseCommand):
+    help = "Create upcoming partitions and detach old partitions of partitioned event models."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "event_models",
+            nargs="*",
+            help="Event model labels, such as app_label.ModelName. Defaults to all.",
+        )
+        parser.add_argument(
+            "--premake",
+            type=int,
+            default=partition._PREMAKE,
+            help="The number of future intervals to create partitions for.",
+        )
+        parser.add_argument(
+            "--retain",
+            type=int,
+            help="Detach partitions older than this number of intervals.",
+        )
+        parser.add_argument(
+            "--drop", action="store_true", help="Drop partitions after detaching them."
+        )
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS, help="The database to manage.")
+
+    def handle(self, *args, **options):
+        event_models = partition._get_event_models(
+            [apps.get_model(label) for label in options["event_models"]]
+        )
+
+        for event_model in event_models:
+            for name in partition.create_partitions(
+                event_model, premake=options["premake"], using=options["database"]
+            ):
+                self.stdout.write(f"Created {name}")
+
+            if options["retain"] is not None:
+                interval = partition._get_partition(event_model)["interval"]
+                before = partition._shift(
+                    partition._truncate(timezone.now(), interval), interval, -options["retain"]
+                )
+                for name in partition.detach_partitions(
+                    event_model, before=before, drop=options["drop"], using=options["database"]
+                ):
+                    self.stdout.write(f"{'Dropped' if options['drop'] else 'Detached'} {name}")
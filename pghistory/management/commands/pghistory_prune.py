@@ -0,0 +1,91 @@
+import datetime
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from pghistory import retention
+
+
+class Command(BaseCommand):
+    help = "Delete events based on retention policies."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "event_models",
+            nargs="*",
+            help="Event model labels, such as app_label.ModelName. Defaults to all.",
+        )
+        parser.add_argument("--age", type=float, help="Delete events older than this many days.")
+        parser.add_argument(
+            "--max-events",
+            type=int,
+            help="Delete events that aren't one of the latest events of their object.",
+        )
+        parser.add_argument(
+            "--no-keep-latest",
+            action="store_false",
+            dest="keep_latest",
+            help="Allow deleting the latest event of an object.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="The number of events deleted in each transaction.",
+        )
+        parser.add_argument(
+            "--contexts",
+            action="store_true",
+            help="Delete contexts that aren't referenced by any events.",
+        )
+        parser.add_argument(
+            "--contexts-min-age",
+            type=float,
+            default=1,
+            help="Only delete contexts that haven't been updated for this many days.",
+        )
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS, help="The database to prune.")
+
+    def _write_pruned(self, num, name, label, start):
+        elapsed = time.monotonic() - start
+        rate = num / elapsed if elapsed else num
+        self.stdout.write(f"Pruned {num} {name} from {label} in {elapsed:.2f}s ({rate:.0f}/s)")
+
+    def handle(self, *args, **options):
+        policy = {}
+        if options["age"] is not None or options["max_events"] is not None:
+            policy = {
+                "age": (
+                    datetime.timedelta(days=options["age"]) if options["age"] is not None else None
+                ),
+                "max_events": options["max_events"],
+                "keep_latest": options["keep_latest"],
+            }
+
+        event_models = [apps.get_model(label) for label in options["event_models"]]
+        for event_model, model_policy in retention._get_policies(event_models, policy):
+            start = time.monotonic()
+            num_deleted = retention.prune(
+                event_model,
+                batch_size=options["batch_size"],
+                using=options["database"],
+                **model_policy,
+            )[event_model]
+            self._write_pruned(num_deleted, "events", event_model._meta.label, start)
+
+        if options["contexts"]:
+            start = time.monotonic()
+            num_scanned = num_deleted = 0
+            for batch_scanned, batch_deleted in retention._prune_contexts(
+                min_age=datetime.timedelta(days=options["contexts_min_age"]),
+                batch_size=options["batch_size"],
+                using=options["database"],
+            ):
+                num_scanned += batch_scanned
+                num_deleted += batch_deleted
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"Scanned {num_scanned} contexts, pruned {num_deleted}")
+
+            self._write_pruned(num_deleted, "contexts", "pghistory.Context", start)
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:00
+
+
+from django.db import migrations
+
+from pghistory.models import Context
+
+
+def install_pgh_attach_context_func(apps, schema_editor):
+    # Re-install the context tracking function that caches context for the transaction
+    Context.install_pgh_attach_context_func(using=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("pghistory", "0007_auto_20250421_0444"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            install_pgh_attach_context_func, reverse_code=migrations.RunPython.noop
+        )
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:14
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Context tables can be large, so the index is created without locking writes
+    atomic = False
+
+    dependencies = [
+        ("pghistory", "0008_auto_20261018_1200"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="context",
+            index=models.Index(fields=["created_at", "id"], name="pghistory_context_created"),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:00
+
+
+from django.db import migrations
+
+from pghistory.models import Context
+
+
+def install_pgh_attach_context_func(apps, schema_editor):
+    # Re-install the context tracking function so that the session cache verifies
+    # that cached contexts haven't been pruned
+    Context.install_pgh_attach_context_func(using=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("pghistory", "0009_context_created_at_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            install_pgh_attach_context_func, reverse_code=migrations.RunPython.noop
+        )
+    ]
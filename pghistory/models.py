@@ -1,16 +1,26 @@
+import copy
+import functools
 import uuid
 import warnings
-from typing import TYPE_CHECKING, TypeVar
+from typing import TYPE_CHECKING, Optional, TypeVar
 
 import django
+import pgtrigger
 from django.apps import apps
 from django.conf import settings
 from django.db import DEFAULT_DB_ALIAS, connections, models
-from django.db.models.functions import Cast
+from django.db.models import Max
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.expressions import Col, OrderBy, RawSQL
+from django.db.models.functions import Cast, Coalesce
+from django.db.models.lookups import Lookup
+from django.db.models.query import ModelIterable
 from django.db.models.sql import Query
 from django.db.models.sql.compiler import SQLCompiler
+from django.db.models.sql.constants import LOUTER
+from django.db.models.sql.where import AND, WhereNode
 
-from pghistory import core, utils
+from pghistory import config, core, trigger, utils
 
 _M = TypeVar("_M", bound=models.Model)
 
@@ -24,19 +34,63 @@ class Context(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     metadata = utils.JSONField(default=dict)
 
+    class Meta:
+        # Used to scan contexts in batches when pruning
+        indexes = [models.Index(fields=["created_at", "id"], name="pghistory_context_created")]
+
     @classmethod
-    def install_pgh_attach_context_func(cls, using: str = DEFAULT_DB_ALIAS) -> None:
+    def install_pgh_attach_context_func(
+        cls, using: str = DEFAULT_DB_ALIAS, cache: Optional[str] = None
+    ) -> None:
         """
         Installs a custom store procedure for upserting context
         for historical events. The upsert is aware of when tracking is
         enabled in the app (i.e. using pghistory.context())
 
+        The attached context is cached so that subsequent calls return the
+        context ID without touching the context table until the metadata changes.
+        With the "transaction" cache, the context ID and metadata are cached
+        in transaction-local variables. With the "session" cache, the context ID
+        and a hash of the metadata are cached for the session, which also skips
+        the upsert in later transactions of the same context. Later transactions only
+        share a lock on the context row and upsert it again if it was deleted.
+        In both cases the cache is set in the same (sub)transaction as the upsert,
+        so rolling back reverts both.
+
         This stored procedure is automatically installed in pghistory migration 0004.
+
+        Args:
+            using: The database.
+            cache: Either "transaction" or "session". Defaults to
+                `settings.PGHISTORY_ATTACH_CONTEXT_CACHE`.
         """
         connection = connections[using]
         if not connection.vendor.startswith("postgres"):  # pragma: no cover
             return
 
+        cache = cache or config.attach_context_cache()
+        if cache == "transaction":
+            cache_key_clause = "_pgh_context_id::TEXT || ':' || _pgh_context_metadata"
+            cache_setting = "pghistory.attached_context"
+            cache_is_local = "TRUE"
+            cache_hit_clause = "RETURN _pgh_context_id;"
+        elif cache == "session":
+            cache_key_clause = "_pgh_context_id::TEXT || ':' || MD5(_pgh_context_metadata)"
+            cache_setting = "pghistory.written_context"
+            cache_is_local = "FALSE"
+            # The context may have been pruned since it was cached. Sharing a lock on the
+            # context doesn't block other writers, but keeps it from being pruned until
+            # the transaction ends.
+            cache_hit_clause = f"""
+                PERFORM 1 FROM {cls._meta.db_table}
+                    WHERE id = _pgh_context_id FOR KEY SHARE;
+                IF FOUND THEN
+                    RETURN _pgh_context_id;
+                END IF;
+            """
+        else:
+            raise ValueError(f'Invalid cache "{cache}". Must be "transaction" or "session".')
+
         with connection.cursor() as cursor:
             cursor.execute(
                 f"""
@@ -44,26 +98,32 @@ class Context(models.Model):
                 RETURNS {cls._meta.db_table}.id%TYPE AS $$
                     DECLARE
                         _pgh_context_id UUID;
-                        _pgh_context_metadata JSONB;
+                        _pgh_context_metadata TEXT;
+                        _pgh_cache_key TEXT;
                     BEGIN
-                        BEGIN
-                            SELECT INTO _pgh_context_id
-                                CURRENT_SETTING('pghistory.context_id');
-                            SELECT INTO _pgh_context_metadata
-                                CURRENT_SETTING('pghistory.context_metadata');
-                            EXCEPTION WHEN OTHERS THEN
-                        END;
-                        IF _pgh_context_id IS NOT NULL AND _pgh_context_metadata IS NOT NULL THEN
-                            INSERT INTO {cls._meta.db_table} (id, metadata, created_at, updated_at)
-                                VALUES (_pgh_context_id, _pgh_context_metadata, NOW(), NOW())
-                                ON CONFLICT (id) DO UPDATE
-                                    SET metadata = EXCLUDED.metadata,
-                                        updated_at = EXCLUDED.updated_at
-                                    WHERE {cls._meta.db_table}.metadata != EXCLUDED.metadata;
-                            RETURN _pgh_context_id;
-                        ELSE
+                        _pgh_context_id := NULLIF(
+                            CURRENT_SETTING('pghistory.context_id', TRUE), ''
+                        );
+                        _pgh_context_metadata := NULLIF(
+                            CURRENT_SETTING('pghistory.context_metadata', TRUE), ''
+                        );
+                        IF _pgh_context_id IS NULL OR _pgh_context_metadata IS NULL THEN
                             RETURN NULL;
                         END IF;
+
+                        _pgh_cache_key := {cache_key_clause};
+                        IF CURRENT_SETTING('{cache_setting}', TRUE) = _pgh_cache_key THEN
+                            {cache_hit_clause}
+                        END IF;
+
+                        INSERT INTO {cls._meta.db_table} (id, metadata, created_at, updated_at)
+                            VALUES (_pgh_context_id, _pgh_context_metadata::JSONB, NOW(), NOW())
+                            ON CONFLICT (id) DO UPDATE
+                                SET metadata = EXCLUDED.metadata,
+                                    updated_at = EXCLUDED.updated_at
+                                WHERE {cls._meta.db_table}.metadata != EXCLUDED.metadata;
+                        PERFORM set_config('{cache_setting}', _pgh_cache_key, {cache_is_local});
+                        RETURN _pgh_context_id;
                     END;
                 $$ LANGUAGE plpgsql;
                 """
@@ -133,6 +193,49 @@ class EventQuery(Query):
         return compiler
 
 
+def _get_cursor_values(cursor, fields):
+    """Returns the values of a keyset pagination cursor"""
+    if isinstance(cursor, (list, tuple)):
+        if len(cursor) != len(fields):
+            raise ValueError(f"Cursor must be a tuple of {', '.join(fields)}.")
+
+        return tuple(cursor)
+    else:
+        return tuple(getattr(cursor, field) for field in fields)
+
+
+class _TrackedModelIterable(ModelIterable):
+    """Yields instances of the tracked model from the fields of events"""
+
+    def __iter__(self):
+        event_model = self.queryset.model
+        tracked_model = event_model.pgh_tracked_model
+        event_fields = {field.name: field for field in event_model._meta.concrete_fields}
+        fields = [
+            (field, event_fields[field.name])
+            for field in tracked_model._meta.concrete_fields
+            if field.name in event_fields
+        ]
+
+        for event in super().__iter__():
+            # Fields that weren't stored by the event are reconstructed in the query
+            changes_data = getattr(event, "_pgh_changes_data", None) or {}
+            values = {}
+            for field, event_field in fields:
+                value = getattr(event, event_field.attname)
+                if event_field.column in changes_data and (
+                    event.pgh_changed is not None and event_field.column not in event.pgh_changed
+                ):
+                    value = event_field.to_python(changes_data[event_field.column])
+
+                values[field.attname] = value
+
+            instance = tracked_model(**values)
+            instance._state.adding = False
+            instance._state.db = self.queryset.db
+            yield instance
+
+
 if TYPE_CHECKING:
     _EventQuerySetBase = models.QuerySet[_M]
 else:
@@ -148,6 +251,108 @@ class EventQuerySet(_EventQuerySetBase):
 
         super().__init__(model, query, using, hints)
 
+    def after(self, cursor=None, *, descending=False):
+        """Paginate events with a keyset over `(pgh_created_at, pgh_id)`.
+
+        Orders events by the keyset and returns the events after the cursor.
+        Unlike slicing with an offset, the database doesn't have to read the
+        events of earlier pages.
+
+        Args:
+            cursor: The last event of the previous page or a tuple of its
+                `(pgh_created_at, pgh_id)`. Events are not filtered when `None`.
+            descending: Paginate from the most recent events.
+        """
+        direction = "-" if descending else ""
+        qs = self.order_by(f"{direction}pgh_created_at", f"{direction}pgh_id")
+        if cursor is not None:
+            created_at, pgh_id = _get_cursor_values(cursor, ("pgh_created_at", "pgh_id"))
+            op = "lt" if descending else "gt"
+            qs = qs.filter(
+                models.Q(**{f"pgh_created_at__{op}e": created_at}),
+                models.Q(**{f"pgh_created_at__{op}": created_at})
+                | models.Q(pgh_created_at=created_at, **{f"pgh_id__{op}": pgh_id}),
+            )
+
+        return qs
+
+    def as_of(self, timestamp=None, *, context_id=None):
+        """Returns the tracked objects as they were at a point in time.
+
+        The latest event of each object at the time is found with a single
+        `DISTINCT ON` query and converted to an instance of the tracked model.
+        Objects are excluded when their latest event was created by a
+        [pghistory.DeleteEvent][]. Fields that aren't tracked by the event
+        model have their default values.
+
+        Args:
+            timestamp: Use the events created at or before the timestamp.
+            context_id: Use the events created up to the last transaction of
+                the context instead of a timestamp.
+
+        Returns:
+            A queryset that yields instances of the tracked model.
+        """
+        if (timestamp is None) == (context_id is None):
+            raise ValueError("Provide either a timestamp or a context_id.")
+
+        if not hasattr(self.model, "pgh_obj"):
+            raise ValueError(f"{self.model._meta.label} doesn't have a pgh_obj field.")
+
+        if context_id is not None:
+            timestamp = Context.objects.filter(id=context_id).values("updated_at")
+            if hasattr(self.model, "pgh_context_id"):
+                # Prefer the events of the context since their creation time can be configured
+                context_events = (
+                    models.QuerySet(model=self.model).filter(pgh_context_id=context_id).order_by()
+                )
+                timestamp = Coalesce(
+                    models.Subquery(
+                        context_events.values("pgh_context_id")
+                        .annotate(max=Max("pgh_created_at"))
+                        .values("max")
+                    ),
+                    models.Subquery(timestamp),
+                )
+
+        # Events of the old row of updates don't store the state after the update.
+        # Delete events are used to exclude deleted objects
+        trackers = self.model.pgh_trackers or []
+        delete_labels = [
+            tracker.label
+            for tracker in trackers
+            if getattr(tracker, "operation", None) == pgtrigger.Delete
+        ]
+        old_row_labels = [
+            tracker.label
+            for tracker in trackers
+            if getattr(tracker, "row", None) == "OLD" and tracker.label not in delete_labels
+        ]
+        latest_events = (
+            self.filter(pgh_created_at__lte=timestamp)
+            .exclude(pgh_label__in=old_row_labels)
+            .order_by("pgh_obj_id", "-pgh_id")
+            .distinct("pgh_obj_id")
+            .values("pgh_id")
+        )
+        qs = (
+            self.model._default_manager.using(self.db)
+            .filter(pgh_id__in=latest_events)
+            .exclude(pgh_label__in=delete_labels)
+            .order_by("pgh_obj_id")
+        )
+        if _stores_changes(self.model):
+            qs = qs.annotate(
+                _pgh_changes_data=RawSQL(
+                    trigger.get_changes_data_sql(self.model, f'"{self.model._meta.db_table}"'),
+                    [],
+                    output_field=utils.JSONField(),
+                )
+            )
+
+        qs._iterable_class = _TrackedModelIterable
+        return qs
+
 
 class PghEventModel:
     "A descriptor for accessing the pgh_event_model field on a tracked model"
@@ -187,6 +392,37 @@ class Event(models.Model):
         tracked_fields = {f.name for f in self._meta.fields}
         return model_fields.issubset(tracked_fields)
 
+    def reconstruct(self, using=DEFAULT_DB_ALIAS):
+        """
+        Returns the event with every tracked field.
+
+        Event models created with `store_changes` only store the fields that
+        changed. The other fields are filled in from the previous events of
+        the tracked object. Other events are returned as is.
+        """
+        if not _stores_changes(self.__class__) or self.pgh_changed is None:
+            return self
+
+        qset = models.QuerySet(model=self.__class__, using=using).filter(
+            pgh_obj_id=self.pgh_obj_id, pgh_id__lt=self.pgh_id
+        )
+        last_full_event = qset.filter(pgh_changed__isnull=True).order_by("-pgh_id")
+        qset = qset.filter(pgh_id__gte=models.Subquery(last_full_event.values("pgh_id")[:1]))
+
+        event = copy.copy(self)
+        missing = {
+            field.column: field
+            for field in self._meta.concrete_fields
+            if not field.name.startswith("pgh_") and field.column not in self.pgh_changed
+        }
+        for prev_event in qset.order_by("-pgh_id"):
+            for column in list(missing):
+                if prev_event.pgh_changed is None or column in prev_event.pgh_changed:
+                    field = missing.pop(column)
+                    setattr(event, field.attname, getattr(prev_event, field.attname))
+
+        return event
+
     def revert(self, using=DEFAULT_DB_ALIAS):
         """
         Reverts the tracked model based on the event fields.
@@ -200,13 +436,14 @@ class Event(models.Model):
                 " doesn't track every field."
             )
 
+        event = self.reconstruct(using=using)
         qset = models.QuerySet(model=self.pgh_tracked_model, using=using)
 
-        pk = getattr(self, self.pgh_tracked_model._meta.pk.name)
+        pk = getattr(event, self.pgh_tracked_model._meta.pk.name)
         return qset.update_or_create(
             pk=pk,
             defaults={
-                field.name: getattr(self, field.name)
+                field.name: getattr(event, field.name)
                 for field in self.pgh_tracked_model._meta.fields
                 if field != self.pgh_tracked_model._meta.pk
             },
@@ -255,7 +492,45 @@ class Event(models.Model):
             return errors
 
 
+class _BranchColumn(models.Expression):
+    """
+    The SQL of an Events column in one branch of the aggregate event CTE.
+    Used to compile filters and ordering of the Events query in each branch
+    """
+
+    def __init__(self, sql, output_field):
+        super().__init__(output_field=output_field)
+        self.sql = sql
+
+    def as_sql(self, compiler, connection):
+        return self.sql, []
+
+
+def _stores_diff(event_model):
+    """True if the event model stores diffs when events are created"""
+    return any(field.name == "pgh_diff" for field in event_model._meta.concrete_fields)
+
+
+def _stores_changes(event_model):
+    """True if the event model only stores changed fields"""
+    return any(field.name == "pgh_changed" for field in event_model._meta.concrete_fields)
+
+
 class EventsQueryCompiler(SQLCompiler):
+    # Events fields that have an equivalent in every event table. Filters,
+    # ordering, and limits on these fields can be pushed into each branch of
+    # the aggregate event CTE
+    pushdown_fields = (
+        "pgh_slug",
+        "pgh_id",
+        "pgh_created_at",
+        "pgh_label",
+        "pgh_model",
+        "pgh_obj_model",
+        "pgh_obj_id",
+        "pgh_context_id",
+    )
+
     def _get_empty_select(self):
         """
         When targetting a model that has no event tables, there are
@@ -326,7 +601,8 @@ class EventsQueryCompiler(SQLCompiler):
             tracks_model=self.tracks_model,
         )
 
-    def _get_context_clauses(self, event_model):
+    @classmethod
+    def _get_context_clauses(cls, model, event_model, connection):
         """
         Get the clauses for obtaining context based on the event model
 
@@ -337,7 +613,7 @@ class EventsQueryCompiler(SQLCompiler):
         4. A pgh_context JSON is used without pgh_context_id
         """
         proxy_fields = []
-        for field in self.query.model._meta.fields:
+        for field in model._meta.fields:
             if hasattr(field, "pgh_proxy"):
                 if not field.pgh_proxy.startswith("pgh_context__"):  # pragma: no cover
                     raise RuntimeError(
@@ -347,13 +623,8 @@ class EventsQueryCompiler(SQLCompiler):
 
                 proxy_fields.append((field, field.pgh_proxy.split("__", 1)[1]))
             elif not field.attname.startswith("pgh_"):
-                warnings.warn(
-                    f"django-pghistory extra field '{field}' in event model"
-                    f" '{self.query.model._meta.label}' declared. Use"
-                    " 'pghistory.ProxyField' to define a proxy fields instead.",
-                    DeprecationWarning,
-                    stacklevel=2,
-                )
+                # Deprecated extra fields are pulled from the context by name.
+                # See Events.pghistory_setup()
                 proxy_fields.append((field, field.name))
 
         context_join_clause = ""
@@ -369,7 +640,7 @@ class EventsQueryCompiler(SQLCompiler):
             # make them null since there is no context on this event
             annotated_context_columns_clause = "".join(
                 [
-                    f"NULL::{field.rel_db_type(self.connection)} AS {field.column},\n"
+                    f"NULL::{field.rel_db_type(connection)} AS {field.column},\n"
                     for field, _ in proxy_fields
                 ]
             )
@@ -382,7 +653,7 @@ class EventsQueryCompiler(SQLCompiler):
             annotated_context_columns_clause = "".join(
                 [
                     f"(_pgh_context.metadata->>'{attr}')::"
-                    f"{field.rel_db_type(self.connection)} AS {field.column},\n"
+                    f"{field.rel_db_type(connection)} AS {field.column},\n"
                     for field, attr in proxy_fields
                 ]
             )
@@ -395,7 +666,7 @@ class EventsQueryCompiler(SQLCompiler):
             annotated_context_columns_clause = "".join(
                 [
                     f"(pgh_context->>'{attr}')::"
-                    f"{field.rel_db_type(self.connection)} AS {field.column},\n"
+                    f"{field.rel_db_type(connection)} AS {field.column},\n"
                     for field, attr in proxy_fields
                 ]
             )
@@ -416,71 +687,274 @@ class EventsQueryCompiler(SQLCompiler):
         )
 
     def _get_where_clause(self, event_model):
-        if self.references:
+        if self.references_model:
             rows = self.references
             cols = [
                 field.column
                 for field in event_model._meta.fields
                 if utils.related_model(field) == self.references_model
             ]
-        elif self.tracks:
+        elif self.tracks_model:
             rows = self.tracks
             cols = [event_model._meta.get_field("pgh_obj").column]
         else:
-            return ""
+            return "", []
+
+        # Querysets are filtered with a subquery so that they are never
+        # evaluated. Lists of objects are filtered with a single array parameter
+        if isinstance(rows, models.QuerySet):
+            query = rows.values("pk").query
+            query.clear_ordering(force=False)
+            sql, params = query.get_compiler(connection=self.connection).as_sql()
+            opt = f"IN ({sql})"
+        elif len(rows) > 1:
+            opt = "= ANY(%s)"
+            params = [[o._meta.pk.get_db_prep_value(o.pk, self.connection) for o in rows]]
+        else:
+            opt = "= %s"
+            params = [rows[0]._meta.pk.get_db_prep_value(rows[0].pk, self.connection)]
 
-        with self.connection.cursor() as cursor:
-            if isinstance(rows, models.QuerySet) or len(rows) > 1:
-                opt = "IN"
-                # TODO: Use a subquery
-                fmt = ",".join(["%s"] * len(rows))
-                val = [o._meta.pk.get_db_prep_value(o.pk, self.connection) for o in rows]
-                pks = cursor.mogrify(f"({fmt})", val)
+        return (
+            "WHERE (" + " OR ".join(f"_event.{col} {opt}" for col in cols) + ")",
+            [param for _ in cols for param in params],
+        )
+
+    def _is_pushdown_filter(self, node):
+        return (
+            isinstance(node, Lookup)
+            and isinstance(node.lhs, Col)
+            and node.lhs.alias == self.query.base_table
+            and node.lhs.target.name in self.pushdown_fields
+            and not hasattr(node.rhs, "resolve_expression")
+            and not (
+                isinstance(node.rhs, (list, tuple, set))
+                and any(hasattr(val, "resolve_expression") for val in node.rhs)
+            )
+        )
+
+    def _get_pushdown_ordering(self):
+        if self.query.extra_order_by:
+            return None
+
+        if self.query.order_by:
+            ordering = self.query.order_by
+        elif self.query.default_ordering:
+            ordering = self.query.get_meta().ordering
+        else:
+            ordering = []
+
+        pk_name = self.query.get_meta().pk.name
+        pushdown_ordering = []
+        for order in ordering:
+            if isinstance(order, OrderBy) and isinstance(order.expression, models.F):
+                if order.nulls_first or order.nulls_last:
+                    return None
+
+                name, descending = order.expression.name, order.descending
+            elif isinstance(order, str):
+                name, descending = order.removeprefix("-"), order.startswith("-")
             else:
-                opt = "="
-                val = rows[0]._meta.pk.get_db_prep_value(rows[0].pk, self.connection)
-                pks = cursor.mogrify("%s", [val])
+                return None
+
+            name = pk_name if name == "pk" else name
+            if name not in self.pushdown_fields:
+                return None
+
+            pushdown_ordering.append((name, descending))
+
+        return pushdown_ordering
+
+    def _get_pushdown(self):
+        """
+        Returns the filters, ordering, and limit of the Events query that can be
+        applied in each branch of the aggregate event CTE.
+
+        Filters are AND-ed lookups on the pushdown fields. Since they are
+        also applied on the CTE, other filters are left to the outer query.
+        Ordering and a limit are only pushed down when every filter was pushed
+        and no join can remove rows, otherwise branches could drop rows that
+        the outer query would return.
+        """
+        where = self.query.where
+        if where.connector != AND or where.negated:
+            return [], [], None
 
-        if isinstance(pks, bytes):  # psycopg2 returns bytes
-            pks = pks.decode("utf-8")
+        filters = [child for child in where.children if self._is_pushdown_filter(child)]
+        ordering = self._get_pushdown_ordering()
+        if (
+            self.query.high_mark is None
+            or ordering is None
+            or len(filters) != len(where.children)
+            or self.query.distinct
+            or self.query.group_by is not None
+            or self.query.combinator
+            or any(
+                getattr(join, "join_type", None) not in (None, LOUTER)
+                for join in self.query.alias_map.values()
+            )
+            or any(
+                annotation.contains_aggregate or annotation.contains_over_clause
+                for annotation in self.query.annotations.values()
+            )
+        ):
+            return filters, [], None
+
+        return filters, ordering, self.query.high_mark
+
+    @staticmethod
+    def _get_branch_columns(event_model):
+        return {
+            "pgh_slug": f"CONCAT('{event_model._meta.label}', ':', _event.pgh_id)",
+            "pgh_id": "_event.pgh_id",
+            "pgh_created_at": "_event.pgh_created_at",
+            "pgh_label": "_event.pgh_label",
+            "pgh_model": f"'{event_model._meta.label}'",
+            "pgh_obj_model": f"'{event_model.pgh_tracked_model._meta.label}'",
+            "pgh_obj_id": (
+                "_event.pgh_obj_id::TEXT" if hasattr(event_model, "pgh_obj_id") else "NULL::TEXT"
+            ),
+            "pgh_context_id": (
+                "_event.pgh_context_id" if hasattr(event_model, "pgh_context_id") else "NULL::UUID"
+            ),
+        }
+
+    def _compile_branch_filter(self, lookup, branch_columns):
+        lookup = copy.copy(lookup)
+        lookup.lhs = _BranchColumn(branch_columns[lookup.lhs.target.name], lookup.lhs.output_field)
+        return self.compile(lookup)
+
+    def _get_keyset_filter(self, event_model, cursor, descending):
+        # The bound on pgh_created_at can use an index, while the row
+        # comparison orders models the same way as the outer query
+        created_at, pgh_model, pgh_id = cursor
+        op = "<" if descending else ">"
+        return (
+            f"_event.pgh_created_at {op}= %s AND"
+            f" (_event.pgh_created_at, '{event_model._meta.label}'::TEXT, _event.pgh_id)"
+            f" {op} (%s, %s::TEXT, %s)",
+            [created_at, created_at, pgh_model, pgh_id],
+        )
+
+    @staticmethod
+    def _and_where_clause(where_clause, filters):
+        if not filters:
+            return where_clause
+
+        filters_clause = " AND ".join(f"({sql})" for sql in filters)
+        return (
+            f"{where_clause} AND {filters_clause}" if where_clause else f"WHERE {filters_clause}"
+        )
 
-        return "WHERE " + " OR ".join(f"_event.{col} {opt} {pks}" for col in cols)
+    def _get_select(self, event_model, filters=(), ordering=(), limit=None, data=True, diff=True):
+        where_clause, where_params = self._get_where_clause(event_model)
+        branch_columns = self._get_branch_columns(event_model)
+        filters = [self._compile_branch_filter(lookup, branch_columns) for lookup in filters]
+        if self.query.keyset and self.query.keyset[0] is not None:
+            filters.append(self._get_keyset_filter(event_model, *self.query.keyset))
+
+        sql = self._get_select_sql(
+            self.query.model,
+            event_model,
+            self.connection.alias,
+            where_clause,
+            tuple(sql for sql, _ in filters),
+            tuple(ordering),
+            limit,
+            data,
+            diff,
+        )
+        params = [*where_params, *(param for _, params in filters for param in params)]
+        return sql, params
 
-    def _get_select(self, event_model):
-        where_clause = self._get_where_clause(event_model)
+    @staticmethod
+    def _get_data_sql(event_model, alias):
+        """Returns the SQL of the JSON of every field of an event"""
+        if _stores_changes(event_model):
+            return f"""
+                (
+                    TO_JSONB({alias})
+                    || COALESCE(
+                        {trigger.get_changes_data_sql(event_model, alias)},
+                        JSONB_BUILD_OBJECT()
+                    )
+                )::JSON
+            """
 
+        return f"row_to_json({alias})"
+
+    @classmethod
+    @functools.lru_cache(maxsize=1024)
+    def _get_select_sql(
+        cls,
+        model,
+        event_model,
+        using,
+        where_clause,
+        filters,
+        ordering,
+        limit,
+        data,
+        diff,
+    ):
+        """
+        Returns the SQL of the CTE branch for an event model.
+
+        The SQL only depends on the structure of the query. Values are passed
+        as params, so the SQL is cached and reused across queries.
+        """
         (
             final_context_columns_clause,
             context_column_clause,
             context_id_column_clause,
             context_join_clause,
             annotated_context_columns_clause,
-        ) = self._get_context_clauses(event_model)
-
+        ) = cls._get_context_clauses(model, event_model, connections[using])
+        branch_columns = cls._get_branch_columns(event_model)
         event_table = event_model._meta.db_table
-        prev_data_clause = f"""
-            (
-              SELECT row_to_json(_prev_event) FROM "{event_table}" _prev_event
-              WHERE _prev_event.pgh_obj_id = _event.pgh_obj_id
-                AND _prev_event.pgh_id < _event.pgh_id
-              ORDER BY _prev_event.pgh_id DESC LIMIT 1
-            ) AS _prev_data
+
+        # Events are filtered, ordered, and limited before they are serialized,
+        # so the previous event of an object is only looked up for the events
+        # that are returned. The lookup uses the (pgh_obj, pgh_id) index
+        prev_data_clause = "_prev._prev_data"
+        prev_data_join_clause = f"""
+            LEFT JOIN LATERAL (
+              SELECT {cls._get_data_sql(event_model, "_prev")} AS _prev_data
+              FROM "{event_table}" _prev
+              WHERE _prev.pgh_obj_id = _event.pgh_obj_id AND _prev.pgh_id < _event.pgh_id
+              ORDER BY _prev.pgh_id DESC LIMIT 1
+            ) _prev ON TRUE
         """
         pgh_obj_id_column_clause = "pgh_obj_id::TEXT"
         if not hasattr(event_model, "pgh_obj_id"):
-            prev_data_clause = "NULL::JSONB AS _prev_data"
             pgh_obj_id_column_clause = "NULL::TEXT AS pgh_obj_id"
 
-        return f"""
-            SELECT
-              CONCAT('{event_model._meta.label}', ':', _pgh_obj_event.pgh_id) AS pgh_slug,
-              _pgh_obj_event.pgh_id,
-              _pgh_obj_event.pgh_created_at,
-              _pgh_obj_event.pgh_label,
-              {final_context_columns_clause}
-              _pgh_obj_event.pgh_obj_id,
-              '{event_model._meta.label}' AS pgh_model,
-              '{event_model.pgh_tracked_model._meta.label}' AS pgh_obj_model,
+        stored_diff_column_clause = ""
+        if not diff or not hasattr(event_model, "pgh_obj_id") or _stores_diff(event_model):
+            prev_data_clause = "NULL::JSONB"
+            prev_data_join_clause = ""
+
+        where_clause = cls._and_where_clause(where_clause, filters)
+
+        # The model columns are constant in a branch and can't be ordered
+        ordering = [
+            (name, descending)
+            for name, descending in ordering
+            if name not in ("pgh_model", "pgh_obj_model")
+        ]
+        order_by_clause = "ORDER BY _event.pgh_id"
+        if ordering:
+            order_by_clause = "ORDER BY " + ", ".join(
+                f"{branch_columns[name]} {'DESC' if descending else 'ASC'}"
+                for name, descending in ordering
+            )
+        if limit is not None:
+            order_by_clause += f" LIMIT {int(limit)}"
+
+        # Only serialize rows and compute the data and diffs when the outer query uses them
+        curr_data_clause = (
+            cls._get_data_sql(event_model, "_event") if data or diff else "NULL::JSON"
+        )
+        data_clause = """
               (
                   SELECT JSONB_OBJECT_AGG(filtered.key, filtered.value)
                   FROM
@@ -489,7 +963,12 @@ class EventsQueryCompiler(SQLCompiler):
                         FROM JSONB_EACH(_pgh_obj_event._curr_data::JSONB)
                     ) filtered
                   WHERE filtered.key NOT LIKE 'pgh_%%'
-              ) AS pgh_data,
+              ) AS pgh_data
+        """
+        if not data:
+            data_clause = "NULL::JSONB AS pgh_data"
+
+        diff_clause = """
               (
                 SELECT JSONB_OBJECT_AGG(curr.key, array[prev.value, curr.value])
                 FROM
@@ -506,7 +985,28 @@ class EventsQueryCompiler(SQLCompiler):
                 WHERE curr.key NOT LIKE 'pgh_%%'
                   AND curr.value != prev.value
                   AND prev IS NOT NULL
-              ) AS pgh_diff,
+              ) AS pgh_diff
+        """
+        if not diff:
+            diff_clause = "NULL::JSONB AS pgh_diff"
+        elif _stores_diff(event_model):
+            # The diff was computed when the event was created
+            curr_data_clause = "row_to_json(_event)" if data else "NULL::JSON"
+            diff_clause = "_pgh_obj_event.pgh_diff"
+            stored_diff_column_clause = "pgh_diff,"
+
+        return f"""
+            SELECT
+              CONCAT('{event_model._meta.label}', ':', _pgh_obj_event.pgh_id) AS pgh_slug,
+              _pgh_obj_event.pgh_id,
+              _pgh_obj_event.pgh_created_at,
+              _pgh_obj_event.pgh_label,
+              {final_context_columns_clause}
+              _pgh_obj_event.pgh_obj_id,
+              '{event_model._meta.label}' AS pgh_model,
+              '{event_model.pgh_tracked_model._meta.label}' AS pgh_obj_model,
+              {data_clause},
+              {diff_clause},
               _pgh_obj_event.pgh_context_id,
               _pgh_obj_event.pgh_context
             FROM (
@@ -514,31 +1014,108 @@ class EventsQueryCompiler(SQLCompiler):
                 pgh_id,
                 pgh_created_at,
                 pgh_label,
-                row_to_json(_event) AS _curr_data,
+                {curr_data_clause} AS _curr_data,
                 {annotated_context_columns_clause}
-                {prev_data_clause},
+                {prev_data_clause} AS _prev_data,
+                {stored_diff_column_clause}
                 {context_id_column_clause},
                 {context_column_clause},
                 {pgh_obj_id_column_clause}
-              FROM "{event_table}" _event
+              FROM (
+                SELECT _event.*
+                FROM "{event_table}" _event
+                {where_clause}
+                {order_by_clause}
+              ) _event
+              {prev_data_join_clause}
               {context_join_clause}
-              {where_clause}
-              ORDER BY _event.pgh_id
             ) _pgh_obj_event
         """
 
-    def _get_cte(self):
+    def _get_cte(self, data=True, diff=True):
         """
-        Returns the CTE clause for the aggregate event query
+        Returns the CTE clause and params for the aggregate event query
         """
         events_table = self.query.model._meta.db_table
-        inner_cte = "UNION ALL ".join(
-            [self._get_select(event_model) for event_model in self.across]
-        )
+        filters, ordering, limit = self._get_pushdown()
+        selects = [
+            self._get_select(
+                event_model,
+                filters=filters,
+                ordering=ordering,
+                limit=limit,
+                data=data,
+                diff=diff,
+            )
+            for event_model in self.across
+        ]
+        inner_cte = "UNION ALL ".join(sql for sql, _ in selects)
+        params = [param for _, params in selects for param in params]
         if not inner_cte:
             inner_cte = self._get_empty_select()
 
-        return f"WITH {events_table} AS (\n{inner_cte}\n)\n"
+        return f"WITH {events_table} AS (\n{inner_cte}\n)\n", params
+
+    def _get_column_refs(self, expression):
+        """Returns the names of the Events fields referenced by an expression"""
+        if isinstance(expression, Col):
+            return {expression.target.name} if expression.alias == self.query.base_table else set()
+        elif isinstance(expression, WhereNode):
+            expressions = expression.children
+        elif isinstance(expression, Query):
+            expressions = [
+                expression.where,
+                *expression.select,
+                *expression.annotations.values(),
+            ]
+        else:
+            expressions = getattr(expression, "get_source_expressions", list)()
+
+        return {
+            name
+            for expr in expressions
+            if expr is not None
+            for name in self._get_column_refs(expr)
+        }
+
+    def _get_used_fields(self):
+        """
+        Returns the names of the Events fields used by the query, or `None`
+        if they can't be determined, such as for raw SQL of `extra()`
+        """
+        query = self.query
+        if query.extra or query.extra_order_by or query.extra_tables or query.combinator:
+            return None
+
+        opts = query.get_meta()
+        names = set()
+        if query.default_cols:
+            deferred_names, defer = query.deferred_loading
+            deferred_names = {name.split(LOOKUP_SEP, 1)[0] for name in deferred_names}
+            names |= {
+                field.name
+                for field in opts.concrete_fields
+                if (field.name in deferred_names) != defer or field.primary_key
+            }
+
+        ordering = query.order_by or (opts.ordering if query.default_ordering else ())
+        expressions = [
+            query.where,
+            *query.select,
+            *query.annotations.values(),
+            *(query.group_by if isinstance(query.group_by, tuple) else ()),
+            *(order for order in ordering if not isinstance(order, str)),
+        ]
+        names |= {
+            name
+            for order in (*ordering, *query.distinct_fields)
+            if isinstance(order, str)
+            for name in [order.lstrip("-").split(LOOKUP_SEP, 1)[0]]
+        }
+        for expression in expressions:
+            names |= self._get_column_refs(expression)
+
+        return names
 
     def as_sql(self, *args, **kwargs):
         self._validate()
@@ -546,10 +1123,15 @@ class EventsQueryCompiler(SQLCompiler):
         base_sql, base_params = super().as_sql(*args, **kwargs)
 
         # Create the CTE that will be queried and insert it into the
-        # main query
-        cte = self._get_cte()
+        # main query. The data and diffs are expensive to compute, so
+        # they are only computed when referenced by the main query
+        used_fields = self._get_used_fields()
+        cte, cte_params = self._get_cte(
+            data=used_fields is None or "pgh_data" in used_fields,
+            diff=used_fields is None or "pgh_diff" in used_fields,
+        )
 
-        return cte + base_sql, base_params
+        return cte + base_sql, (*cte_params, *base_params)
 
 
 class EventsQuery(Query):
@@ -560,6 +1142,7 @@ class EventsQuery(Query):
         self.references = []
         self.tracks = []
         self.across = []
+        self.keyset = None
 
     def get_compiler(self, *args, **kwargs):
         compiler = super().get_compiler(*args, **kwargs)
@@ -571,6 +1154,7 @@ class EventsQuery(Query):
         clone.references = self.references
         clone.tracks = self.tracks
         clone.across = self.across
+        clone.keyset = self.keyset
         return clone
 
     def chain(self, klass=None):
@@ -624,6 +1208,32 @@ class EventsQuerySet(models.QuerySet):
         qs.query.tracks = objs
         return qs
 
+    def after(self, cursor=None, *, descending=False):
+        """Paginate events with a keyset over `(pgh_created_at, pgh_model, pgh_id)`.
+
+        Orders events by the keyset and returns the events after the cursor.
+        The cursor is applied in each event table, so the database doesn't
+        have to aggregate the events of earlier pages like it does when
+        slicing with an offset.
+
+        Args:
+            cursor: The last event of the previous page or a tuple of its
+                `(pgh_created_at, pgh_model, pgh_id)`. Events are not
+                filtered when `None`.
+            descending: Paginate from the most recent events.
+        """
+        direction = "-" if descending else ""
+        qs = self.order_by(
+            f"{direction}pgh_created_at", f"{direction}pgh_model", f"{direction}pgh_id"
+        )
+        qs.query.keyset = (
+            _get_cursor_values(cursor, ("pgh_created_at", "pgh_model", "pgh_id"))
+            if cursor is not None
+            else None,
+            descending,
+        )
+        return qs
+
 
 class NoObjectsManager(models.Manager):
     """
@@ -682,6 +1292,22 @@ class Events(models.Model):
         errors = super().check(**kwargs)
         return [error for error in errors if error.id != "models.E017"]
 
+    @classmethod
+    def pghistory_setup(cls):
+        """
+        Called when the model class is prepared. Warns once about extra
+        fields that aren't declared with `pghistory.ProxyField`
+        """
+        for field in cls._meta.fields:
+            if not hasattr(field, "pgh_proxy") and not field.attname.startswith("pgh_"):
+                warnings.warn(
+                    f"django-pghistory extra field '{field}' in event model"
+                    f" '{cls._meta.label}' declared. Use"
+                    " 'pghistory.ProxyField' to define a proxy fields instead.",
+                    DeprecationWarning,
+                    stacklevel=2,
+                )
+
 
 class MiddlewareEvents(Events):
     """
@@ -0,0 +1,48 @@
+"""Migration operations"""
+
+from typing import Optional
+
+from django.db import migrations
+
+
+class InstallAttachContextFunc(migrations.operations.base.Operation):
+    """Install the `_pgh_attach_context()` function in a migration.
+
+    Use this operation after changing `settings.PGHISTORY_ATTACH_CONTEXT_CACHE`
+    to install the function with the new cache. The migration must run after
+    pghistory's migrations.
+
+    Args:
+        cache: Either "transaction" or "session". Defaults to
+            `settings.PGHISTORY_ATTACH_CONTEXT_CACHE`.
+        reverse_cache: The cache of the function that's installed when the
+            migration is reversed.
+    """
+
+    reversible = True
+    reduces_to_sql = False
+
+    def __init__(self, cache: Optional[str] = None, reverse_cache: str = "transaction"):
+        self.cache = cache
+        self.reverse_cache = reverse_cache
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def _install(self, schema_editor, cache):
+        from pghistory.models import Context  # noqa
+
+        Context.install_pgh_attach_context_func(using=schema_editor.connection.alias, cache=cache)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        self._install(schema_editor, self.cache)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        self._install(schema_editor, self.reverse_cache)
+
+    def describe(self):
+        return f'Install _pgh_attach_context() with the "{self.cache or "default"}" cache'
+
+    @property
+    def migration_name_fragment(self):
+        return "install_attach_context_func"
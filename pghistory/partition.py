@@ -0,0 +1,273 @@
+"""Native Postgres partitioning of event tables"""
+
+import datetime
+from typing import List, Type, Union
+
+from django.db import connections, models, transaction
+from django.db.backends.utils import names_digest
+from django.utils import timezone
+
+INTERVALS = ("day", "week", "month", "year")
+"""The intervals over which event tables can be partitioned"""
+
+_PREMAKE = 3
+
+_SUFFIX_FORMATS = {"day": "%Y%m%d", "week": "%Y%m%d", "month": "%Y%m", "year": "%Y"}
+
+
+def _get_partition(model: Type[models.Model]) -> Union[dict, None]:
+    return getattr(model._meta, "pgh_partition", None)
+
+
+def _truncate(dt: datetime.datetime, interval: str) -> datetime.datetime:
+    """Truncate a datetime to the start of its interval in UTC"""
+    dt = dt.astimezone(datetime.timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    if interval == "week":
+        dt -= datetime.timedelta(days=dt.weekday())
+    elif interval == "month":
+        dt = dt.replace(day=1)
+    elif interval == "year":
+        dt = dt.replace(month=1, day=1)
+
+    return dt
+
+
+def _shift(dt: datetime.datetime, interval: str, n: int) -> datetime.datetime:
+    """Shift a truncated datetime by n intervals"""
+    if interval == "day":
+        return dt + datetime.timedelta(days=n)
+    elif interval == "week":
+        return dt + datetime.timedelta(weeks=n)
+    elif interval == "month":
+        month = dt.year * 12 + dt.month - 1 + n
+        return dt.replace(year=month // 12, month=month % 12 + 1)
+    else:
+        return dt.replace(year=dt.year + n)
+
+
+def _get_partition_name(model, lower, connection):
+    """The name of the partition starting at lower or the default partition if lower is None"""
+    table = model._meta.db_table
+    if lower is None:
+        suffix = "default"
+    else:
+        suffix = "p" + lower.strftime(_SUFFIX_FORMATS[_get_partition(model)["interval"]])
+
+    name = f"{table}_{suffix}"
+    max_length = connection.ops.max_name_length()
+
+    if len(name) > max_length:
+        name = f"{table[: max_length - len(suffix) - 10]}_{names_digest(table, length=8)}_{suffix}"
+
+    return name
+
+
+def _get_range_sql(lower, upper):
+    return f"FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+
+
+def _get_create_partitions_sql(model, connection, premake=_PREMAKE):
+    """The SQL for creating the default partition and the upcoming partitions of a new table"""
+    qn = connection.ops.quote_name
+    table = model._meta.db_table
+    interval = _get_partition(model)["interval"]
+    default = _get_partition_name(model, None, connection)
+    sql = [f"CREATE TABLE {qn(default)} PARTITION OF {qn(table)} DEFAULT"]
+
+    lower = _truncate(timezone.now(), interval)
+    for _ in range(premake + 1):
+        upper = _shift(lower, interval, 1)
+        sql.append(
+            f"CREATE TABLE {qn(_get_partition_name(model, lower, connection))}"
+            f" PARTITION OF {qn(table)} FOR VALUES {_get_range_sql(lower, upper)}"
+        )
+        lower = upper
+
+    return sql
+
+
+def _get_partitions(cursor, model):
+    """Return the name, lower bound, upper bound, and if it's the default partition for
+    every partition of an event table
+    """
+    cursor.execute(
+        """
+        SELECT
+            c.relname,
+            (regexp_match(pg_get_expr(c.relpartbound, c.oid), 'FROM \\(''(.*)''\\) TO'))[1]
+                ::TIMESTAMPTZ,
+            (regexp_match(pg_get_expr(c.relpartbound, c.oid), 'TO \\(''(.*)''\\)'))[1]
+                ::TIMESTAMPTZ,
+            pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT'
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        ORDER BY c.relname
+        """,
+        [cursor.db.ops.quote_name(model._meta.db_table)],
+    )
+    return cursor.fetchall()
+
+
+def _create_partition(cursor, model, lower, upper, default):
+    """Create a partition, moving any events in the default partition to it"""
+    qn = cursor.db.ops.quote_name
+    table = qn(model._meta.db_table)
+    name = _get_partition_name(model, lower, cursor.db)
+    key = qn(model._meta.get_field(_get_partition(model)["field"]).column)
+    range_sql = _get_range_sql(lower, upper)
+    where_sql = f"{key} >= '{lower.isoformat()}' AND {key} < '{upper.isoformat()}'"
+
+    has_default_rows = False
+    if default:  # pragma: no branch
+        cursor.execute(f"SELECT EXISTS (SELECT FROM {qn(default)} WHERE {where_sql})")
+        has_default_rows = cursor.fetchone()[0]
+
+    if not has_default_rows:
+        cursor.execute(f"CREATE TABLE {qn(name)} PARTITION OF {table} FOR VALUES {range_sql}")
+    else:
+        # Postgres can't create a partition when the default partition has rows
+        # in its range. Detaching the default partition drops its triggers, which
+        # allows us to move the rows without firing the triggers of the event model.
+        columns = ", ".join(qn(field.column) for field in model._meta.concrete_fields)
+        cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {qn(default)}")
+        cursor.execute(
+            f"CREATE TABLE {qn(name)} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(
+            f"INSERT INTO {qn(name)} ({columns})"
+            f" SELECT {columns} FROM {qn(default)} WHERE {where_sql}"
+        )
+        cursor.execute(f"DELETE FROM {qn(default)} WHERE {where_sql}")
+        cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {qn(name)} FOR VALUES {range_sql}")
+        cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {qn(default)} DEFAULT")
+
+    return name
+
+
+def _get_event_models(event_models):
+    from pghistory import core  # noqa
+
+    return [
+        event_model
+        for event_model in (event_models or core.event_models())
+        if _get_partition(event_model)
+    ]
+
+
+def create_partitions(
+    *event_models: Type[models.Model], premake: int = _PREMAKE, using: str = "default"
+) -> List[str]:
+    """Create the upcoming partitions of partitioned event models.
+
+    Partitions are created for the current interval and the next `premake` intervals.
+    Events in the default partition are moved to the new partitions.
+
+    Args:
+        *event_models: The event models. Defaults to all partitioned event models.
+        premake: The number of future intervals to create partitions for.
+        using: The database.
+
+    Returns:
+        The names of the created partitions.
+    """
+    created = []
+
+    for event_model in _get_event_models(event_models):
+        interval = _get_partition(event_model)["interval"]
+        with transaction.atomic(using=using), connections[using].cursor() as cursor:
+            partitions = _get_partitions(cursor, event_model)
+            default = next((name for name, *_, is_default in partitions if is_default), None)
+
+            lower = _truncate(timezone.now(), interval)
+            for _ in range(premake + 1):
+                upper = _shift(lower, interval, 1)
+                if not any(
+                    p_lower is not None
+                    and p_upper is not None
+                    and p_lower < upper
+                    and p_upper > lower
+                    for _, p_lower, p_upper, _ in partitions
+                ):
+                    created.append(_create_partition(cursor, event_model, lower, upper, default))
+
+                lower = upper
+
+    return created
+
+
+def detach_partitions(
+    *event_models: Type[models.Model],
+    before: datetime.datetime,
+    drop: bool = False,
+    using: str = "default",
+) -> List[str]:
+    """Detach the partitions of partitioned event models that end before a time.
+
+    Detached partitions are regular tables that are no longer queried by the event
+    models. The default partition is never detached.
+
+    Args:
+        *event_models: The event models. Defaults to all partitioned event models.
+        before: Detach partitions that only have events before this time.
+        drop: Drop the detached partitions.
+        using: The database.
+
+    Returns:
+        The names of the detached partitions.
+    """
+    detached = []
+
+    for event_model in _get_event_models(event_models):
+        with transaction.atomic(using=using), connections[using].cursor() as cursor:
+            qn = cursor.db.ops.quote_name
+            for name, _, upper, _ in _get_partitions(cursor, event_model):
+                if upper is not None and upper <= before:
+                    cursor.execute(
+                        f"ALTER TABLE {qn(event_model._meta.db_table)} DETACH PARTITION {qn(name)}"
+                    )
+                    if drop:
+                        cursor.execute(f"DROP TABLE {qn(name)}")
+
+                    detached.append(name)
+
+    return detached
+
+
+class DatabaseSchemaEditorMixin:
+    """Creates partitioned tables for partitioned event models.
+
+    The primary key of a partitioned table must include the partition key, so the
+    table is created with a primary key over the primary key column and the partition key.
+    A default partition and the upcoming partitions are created with the table.
+    """
+
+    def column_sql(self, model, field, include_default=False):
+        sql, params = super().column_sql(model, field, include_default=include_default)
+        if sql and field.primary_key and _get_partition(model):
+            sql = sql.replace(" PRIMARY KEY", "", 1)
+
+        return sql, params
+
+    def table_sql(self, model):
+        partition = _get_partition(model)
+        if not partition:
+            return super().table_sql(model)
+
+        pk = self.quote_name(model._meta.pk.column)
+        key = self.quote_name(model._meta.get_field(partition["field"]).column)
+        self.sql_create_table = (
+            f"CREATE TABLE %(table)s (%(definition)s, PRIMARY KEY ({pk}, {key}))"
+            f" PARTITION BY RANGE ({key})"
+        )
+        try:
+            return super().table_sql(model)
+        finally:
+            del self.sql_create_table
+
+    def create_model(self, model):
+        super().create_model(model)
+
+        if _get_partition(model):
+            for sql in _get_create_partitions_sql(model, self.connection):
+                self.execute(sql)
@@ -0,0 +1,298 @@
+"""Pruning old events and contexts"""
+
+import contextlib
+import datetime
+import functools
+import operator
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+import pgtrigger
+from django.apps import apps
+from django.db import connections, models, transaction
+from django.db.models import Exists, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from pghistory import config, utils
+
+
+def _has_obj(event_model: Type[models.Model]) -> bool:
+    return "pgh_obj" in (field.name for field in event_model._meta.fields)
+
+
+def _get_policy_q(
+    event_model: Type[models.Model],
+    *,
+    age: Optional[datetime.timedelta] = None,
+    max_events: Optional[int] = None,
+    keep_latest: bool = True,
+) -> Q:
+    """Filter the events that are pruned by a retention policy"""
+    expired = []
+
+    if age is not None:
+        expired.append(Q(pgh_created_at__lt=timezone.now() - age))
+
+    if max_events is not None:
+        if not _has_obj(event_model):
+            raise ValueError("Event models must have an obj_field to prune by max_events.")
+        elif max_events < 1:
+            raise ValueError("max_events must be at least 1.")
+
+        # Events older than the nth latest event of the object are pruned
+        nth_latest = (
+            event_model.objects.filter(pgh_obj=OuterRef("pgh_obj"))
+            .order_by("-pgh_id")
+            .values("pgh_id")[max_events - 1 : max_events]
+        )
+        expired.append(
+            Q(pgh_id__lt=Coalesce(Subquery(nth_latest), 0, output_field=models.BigIntegerField()))
+        )
+
+    if not expired:
+        raise ValueError("Supply an age or max_events to prune events.")
+
+    q = functools.reduce(operator.or_, expired)
+
+    if keep_latest and _has_obj(event_model):
+        q &= Q(
+            Exists(
+                event_model.objects.filter(
+                    pgh_obj=OuterRef("pgh_obj"), pgh_id__gt=OuterRef("pgh_id")
+                )
+            )
+        )
+
+    return q
+
+
+def _get_prune_q(event_model: Type[models.Model], **policy: Any) -> Q:
+    """Filter the events that can be pruned by a retention policy.
+
+    When storing changes, an event is only pruned when a later event that stores all
+    fields is also pruned or is the first event that's kept. Otherwise the kept
+    events of the object could no longer be reconstructed.
+    """
+    from pghistory.models import _stores_changes  # noqa
+
+    q = _get_policy_q(event_model, **policy)
+
+    if _stores_changes(event_model):
+        kept_between = event_model.objects.exclude(q).filter(
+            pgh_obj=OuterRef(OuterRef("pgh_obj")),
+            pgh_id__gt=OuterRef(OuterRef("pgh_id")),
+            pgh_id__lt=OuterRef("pgh_id"),
+        )
+        q &= Q(
+            Exists(
+                event_model.objects.filter(
+                    ~Exists(kept_between),
+                    pgh_obj=OuterRef("pgh_obj"),
+                    pgh_id__gt=OuterRef("pgh_id"),
+                    pgh_changed__isnull=True,
+                )
+            )
+        )
+
+    return q
+
+
+def _get_policies(
+    event_models: List[Type[models.Model]], policy: Optional[Dict[str, Any]]
+) -> List[Tuple[Type[models.Model], Dict[str, Any]]]:
+    """Return the event models and their retention policies.
+
+    The supplied policy is used for all event models, otherwise the policies
+    come from `settings.PGHISTORY_RETENTION`.
+    """
+    from pghistory import core  # noqa
+
+    if policy:
+        # Event models without objects can't be pruned by max_events by default
+        event_models = event_models or [
+            event_model
+            for event_model in core.event_models()
+            if _has_obj(event_model) or policy.get("max_events") is None
+        ]
+        return [(event_model, policy) for event_model in event_models]
+
+    policies = config.retention()
+    event_models = event_models or [apps.get_model(label) for label in policies]
+    return [
+        (event_model, policies[event_model._meta.label])
+        for event_model in event_models
+        if event_model._meta.label in policies
+    ]
+
+
+def _delete_events(event_model, pgh_ids, *, using):
+    """Delete events in a transaction, ignoring the triggers of the event model"""
+    uris = [
+        f"{model._meta.label}:{trigger.name}"
+        for model, trigger in pgtrigger.registered()
+        if model == event_model
+    ]
+
+    with pgtrigger.ignore(*uris) if uris else contextlib.nullcontext():
+        with transaction.atomic(using=using):
+            _, deleted = event_model.objects.using(using).filter(pgh_id__in=pgh_ids).delete()
+
+    return deleted.get(event_model._meta.label, 0)
+
+
+def _prune(event_model, *, batch_size, using, **policy):
+    q = _get_prune_q(event_model, **policy)
+    num_deleted = 0
+    after = 0
+
+    while True:
+        # Batches are ordered by the primary key so that each batch continues
+        # where the previous one left off
+        pgh_ids = list(
+            event_model.objects.using(using)
+            .filter(q, pgh_id__gt=after)
+            .order_by("pgh_id")
+            .values_list("pgh_id", flat=True)[:batch_size]
+        )
+        if not pgh_ids:
+            return num_deleted
+
+        num_deleted += _delete_events(event_model, pgh_ids, using=using)
+        after = pgh_ids[-1]
+
+
+def prune(
+    *event_models: Type[models.Model],
+    age: Optional[datetime.timedelta] = None,
+    max_events: Optional[int] = None,
+    keep_latest: bool = True,
+    batch_size: int = 1000,
+    using: str = "default",
+) -> Dict[Type[models.Model], int]:
+    """Delete events based on a retention policy.
+
+    Events are deleted if they are older than `age` or if they aren't one of the latest
+    `max_events` events of their object. If neither is supplied, the retention policies
+    of `settings.PGHISTORY_RETENTION` are used.
+
+    Events are deleted in batches. Triggers of the event model, such as the
+    `append_only` trigger, are ignored while deleting.
+
+    Args:
+        *event_models: The event models to prune. Defaults to all event models or the
+            event models in `settings.PGHISTORY_RETENTION`.
+        age: Delete events older than this age.
+        max_events: Delete events that aren't one of the latest `max_events` events of
+            their object. Requires an `obj_field`.
+        keep_latest: Never delete the latest event of an object.
+        batch_size: The number of events deleted in each transaction.
+        using: The database.
+
+    Returns:
+        The number of deleted events of each event model.
+    """
+    policy = {}
+    if age is not None or max_events is not None:
+        policy = {"age": age, "max_events": max_events, "keep_latest": keep_latest}
+
+    return {
+        event_model: _prune(event_model, batch_size=batch_size, using=using, **model_policy)
+        for event_model, model_policy in _get_policies(list(event_models), policy)
+    }
+
+
+def _prune_contexts(*, min_age, batch_size, using):
+    """Delete contexts that aren't referenced by any events, yielding the number of scanned
+    and deleted contexts of each batch.
+
+    Contexts are scanned in batches ordered by creation time. Each batch is locked and
+    then deleted with an anti-join against every event table that references contexts.
+    Contexts that are locked by writers are skipped, and contexts that were updated
+    within `min_age` are kept.
+    """
+    from pghistory import core  # noqa
+    from pghistory.models import Context  # noqa
+
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    table = qn(Context._meta.db_table)
+    pk = qn(Context._meta.pk.column)
+    not_referenced_sql = "".join(
+        f" AND NOT EXISTS (SELECT FROM {qn(event_model._meta.db_table)}"
+        f" WHERE {qn(field.column)} = {table}.{pk})"
+        for event_model in core.event_models(references_model=Context)
+        for field in event_model._meta.fields
+        if utils.related_model(field) == Context
+    )
+    cutoff = timezone.now() - min_age
+    after = None
+
+    while True:
+        # Keyset pagination over (created_at, id) uses the index of the context table
+        after_sql = f"AND (created_at, {pk}) > (%s, %s)" if after else ""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT created_at, {pk} FROM {table}
+                WHERE created_at < %s {after_sql}
+                ORDER BY created_at, {pk}
+                LIMIT %s
+                """,
+                [cutoff, *(after or []), batch_size],
+            )
+            batch = cursor.fetchall()
+
+        if not batch:
+            return
+
+        # Contexts are locked first, skipping the ones that writers have locked while
+        # attaching them. In READ COMMITTED, the delete runs with a new snapshot, so it
+        # sees every event committed by writers that attached a context before it was
+        # locked. Writers that attach a locked context wait until it's deleted.
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT {pk} FROM {table}
+                WHERE {pk} = ANY(%s) AND updated_at < %s
+                FOR UPDATE SKIP LOCKED
+                """,
+                [[row[1] for row in batch], cutoff],
+            )
+            locked = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                f"DELETE FROM {table} WHERE {pk} = ANY(%s){not_referenced_sql}", [locked]
+            )
+            num_deleted = cursor.rowcount
+
+        yield len(batch), num_deleted
+        after = batch[-1]
+
+
+def prune_contexts(
+    *,
+    min_age: datetime.timedelta = datetime.timedelta(days=1),
+    batch_size: int = 1000,
+    using: str = "default",
+) -> int:
+    """Delete contexts that aren't referenced by any events.
+
+    Contexts are deleted in batches and can be pruned while events are written.
+    Writers lock a context from when they attach it until they commit, and locked
+    contexts are never deleted. Contexts that were updated within `min_age` are
+    never deleted either. This protects events that reference a context without
+    attaching it in the same transaction, such as events that are created with the
+    id of a context attached by an earlier transaction. `min_age` should be longer
+    than the time between attaching a context and writing such events.
+
+    Args:
+        min_age: Only delete contexts that haven't been updated for this long.
+        batch_size: The number of contexts scanned in each transaction.
+        using: The database.
+
+    Returns:
+        The number of deleted contexts.
+    """
+    return sum(
+        num_deleted
+        for _, num_deleted in _prune_contexts(min_age=min_age, batch_size=batch_size, using=using)
+    )
@@ -1,12 +1,13 @@
-import collections
 import contextlib
+import contextvars
+import functools
+import inspect
 import json
-import threading
+import re
 import uuid
-from typing import Any, Dict, Tuple, Union
+from typing import Any, Dict, Optional, Tuple, Union
 
-from asgiref.sync import sync_to_async
-from django.db import connection
+from django.db import DEFAULT_DB_ALIAS, connection, connections
 
 from pghistory import config, utils
 
@@ -18,10 +19,93 @@ else:
     raise AssertionError
 
 
-_tracker = threading.local()
+class Context:
+    """
+    The context that is active while inside [pghistory.context][].
+
+    The metadata is serialized lazily and re-serialized only when it has been
+    updated with [pghistory.context][]. `version` is bumped on every update so that
+    callers can cheaply tell if the metadata changed.
+    """
+
+    __slots__ = ("id", "metadata", "version", "per_transaction", "_json_encoder", "_serialized")
+
+    def __init__(self, id: uuid.UUID, metadata: Dict[str, Any]):
+        self.id = id
+        self.metadata = metadata
+        self.version = 0
+        self.per_transaction = config.context_injection() == "transaction"
+        self._json_encoder = config.json_encoder()
+        self._serialized = None
+
+    def update(self, **metadata: Any) -> None:
+        """Update the metadata of the context"""
+        self.metadata.update(**metadata)
+        self.version += 1
+        self._serialized = None
+
+    @property
+    def serialized_metadata(self) -> str:
+        """The metadata serialized as JSON"""
+        if self._serialized is None:
+            self._serialized = json.dumps(self.metadata, cls=self._json_encoder)
+
+        return self._serialized
+
+
+class _Tracker:
+    """
+    Holds the active context.
+
+    The context is stored in a context variable. Context variables are local
+    to threads and follow asyncio tasks, so concurrent tasks on the same event
+    loop each track their own context. Accessing `value` raises an
+    `AttributeError` when no context is active.
+
+    Every entrance of [pghistory.context][] pushes the token of the context
+    variable, or `None` if a parent already entered it, onto a stack that is
+    also stored in a context variable. Exits reset the context variable with
+    the popped token, so instances of [pghistory.context][] can be shared
+    across tasks and threads.
+    """
+
+    def __init__(self):
+        self._context = contextvars.ContextVar("pghistory_context", default=None)
+        self._tokens = contextvars.ContextVar("pghistory_context_tokens", default=())
+
+    def get(self) -> Optional[Context]:
+        """Return the active context or `None`"""
+        return self._context.get()
+
+    @property
+    def value(self) -> Context:
+        value = self._context.get()
+        if value is None:
+            raise AttributeError("No pghistory context is active")
+
+        return value
+
+    def enter(self, metadata: Dict[str, Any]) -> Context:
+        """Create the context if none is active and return the active context"""
+        token = None
+        if self._context.get() is None:
+            token = self._context.set(Context(id=uuid.uuid4(), metadata=metadata))
+
+        # The stack is immutable since child tasks share it with their parent
+        self._tokens.set((*self._tokens.get(), token))
+        return self._context.get()
+
+    def exit(self) -> None:
+        """Exit the latest entrance, removing the context if it was created by it"""
+        *tokens, token = self._tokens.get()
+        self._tokens.set(tuple(tokens))
+        if token is not None:
+            self._context.reset(token)
+
+
+_tracker = _Tracker()
 
 
-Context = collections.namedtuple("Context", ["id", "metadata"])
 IGNORED_SQL_PREFIXES = (
     "select",
     "vacuum",
@@ -39,6 +123,76 @@ IGNORED_SQL_PREFIXES = (
     "begin",
     "start",
 )
+TRANSACTION_END_SQL_PREFIXES = ("commit", "rollback", "end", "abort")
+
+
+# Statements are only classified by looking at a bounded prefix of the SQL.
+# This avoids copying large statements, such as bulk inserts, when classifying them.
+SQL_HEAD_LENGTH = 256
+# CTEs are scanned further to find the main statement. If it is not found
+# within this prefix, the statement is not ignored.
+SQL_CTE_HEAD_LENGTH = 4096
+CTE_STATEMENT_KEYWORDS = ("select", "insert", "update", "delete", "merge", "values", "table")
+CTE_MODIFYING_KEYWORDS = ("insert", "update", "delete", "merge")
+_LEADING_SQL_RE = re.compile(r"(?:\s+|--[^\n]*(?:\n|$)|/\*.*?\*/)*", re.S)
+_CTE_TOKEN_RE = re.compile(
+    r"""
+    (?P<skip>\s+|--[^\n]*|/\*.*?\*/|'(?:[^']|'')*'|"(?:[^"]|"")*"|\$(?P<tag>\w*)\$.*?\$(?P=tag)\$)
+    |(?P<open>\()
+    |(?P<close>\))
+    |(?P<word>[a-z_][a-z0-9_$]*)
+    |(?P<quote>['"$])
+    |(?P<other>.)
+    """,
+    re.S | re.X,
+)
+
+
+def _sql_head(sql: Union[str, bytes], length: int = SQL_HEAD_LENGTH) -> str:
+    """
+    Returns the lowercased beginning of a statement, starting at its first keyword.
+
+    Leading whitespace and comments are skipped. Only the first `length` characters
+    of the statement are ever copied or decoded.
+    """
+    head = sql[:length]
+    head = head.decode(errors="ignore") if isinstance(head, bytes) else head
+    return head[_LEADING_SQL_RE.match(head).end() :].lower()
+
+
+def _is_read_only_cte(head: str) -> bool:
+    """
+    True if a statement starting with WITH is a SELECT whose CTEs don't modify data.
+
+    The CTE definitions are tokenized only until the main statement is found.
+    Anything that can't be classified within the prefix is treated as a write.
+    """
+    depth = 0
+    body_start = False
+    for match in _CTE_TOKEN_RE.finditer(head, len("with")):
+        kind = match.lastgroup
+        if kind == "skip":
+            continue
+        elif kind == "word":
+            word = match.group()
+            if body_start and word in CTE_MODIFYING_KEYWORDS:
+                return False
+            elif depth == 0 and word in CTE_STATEMENT_KEYWORDS:
+                return word == "select"
+        elif kind == "open":
+            depth += 1
+        elif kind == "close":
+            depth -= 1
+        elif kind == "quote":
+            # An unterminated string or identifier. It continues past the prefix
+            return False
+
+        body_start = kind == "open" and depth == 1
+
+        if depth < 0:
+            return False
+
+    return False
 
 
 def _is_ignored_statement(sql: Union[str, bytes]):
@@ -46,14 +200,23 @@ def _is_ignored_statement(sql: Union[str, bytes]):
     True if the sql statement is ignored for context tracking.
     This includes select statements and other statements like vacuum.
 
-    Note: SQL is very complex. We may still inject context variables into
-    SQL that has CTEs, for example. Generally this should handle most cases
+    Leading whitespace and comments are skipped. Statements with CTEs are
+    ignored only if the main statement is a SELECT and none of the CTEs
+    modify data.
+
+    Note: SQL is very complex. Generally this should handle most cases
     where it's impossible to even put a variable in the SQL, such as statements
-    that cannot be ran in a transaction (vacuum, etc).
+    that cannot be ran in a transaction (vacuum, etc). When in doubt,
+    statements are not ignored.
     """
-    sql = sql.strip().lower() if sql else ""
-    sql = sql.decode() if isinstance(sql, bytes) else sql
-    return sql.startswith(IGNORED_SQL_PREFIXES)
+    if not sql:
+        return False
+
+    head = _sql_head(sql)
+    if head.startswith("with") and not head[4:5].isalnum():
+        return _is_read_only_cte(_sql_head(sql, SQL_CTE_HEAD_LENGTH))
+    else:
+        return head.startswith(IGNORED_SQL_PREFIXES)
 
 
 def _is_transaction_errored(cursor):
@@ -71,6 +234,29 @@ def _is_transaction_errored(cursor):
         raise AssertionError
 
 
+def _is_transaction_idle(cursor):
+    """
+    True if there is no open transaction, meaning the next statement starts a new one
+    """
+    if utils.psycopg_maj_version == 2:
+        return (
+            cursor.connection.get_transaction_status()
+            == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        )
+    elif utils.psycopg_maj_version == 3:
+        return cursor.connection.info.transaction_status == psycopg.pq.TransactionStatus.IDLE
+    else:
+        raise AssertionError
+
+
+def _is_transaction_end_statement(sql: Union[str, bytes]):
+    """
+    True if the statement commits or rolls back the transaction or a savepoint.
+    Context variables set with set_config(..., true) may not survive these.
+    """
+    return _sql_head(sql).startswith(TRANSACTION_END_SQL_PREFIXES)
+
+
 def _can_inject_variable(cursor, sql):
     """True if we can inject a SQL variable into a statement.
 
@@ -100,19 +286,41 @@ def _execute_wrapper(execute_result):
 
 
 def _inject_history_context(
-    execute, sql: Union[str, bytes], params: Union[Dict[str, Any], Tuple[Any, ...]], many, context
+    execute,
+    sql: Union[str, bytes],
+    params: Union[Dict[str, Any], Tuple[Any, ...]],
+    many,
+    context,
 ):
-    is_bytes = isinstance(sql, bytes)
-    sql = sql.decode() if is_bytes else sql
+    tracked_context = _tracker.get()
+    if tracked_context is None:
+        return execute(sql, params, many, context)
+
     inject_vars = ""
+    cursor = context["cursor"]
+    connection = context["connection"]
+    injected_context = None
+    current_context = None
+    per_transaction = tracked_context.per_transaction
 
-    if _can_inject_variable(context["cursor"], sql):
+    if per_transaction:
+        # Context variables are local to the transaction. If no transaction is open
+        # or the statement ends the transaction or a savepoint, the variables may
+        # no longer be set and must be injected again.
+        if _is_transaction_idle(cursor) or _is_transaction_end_statement(sql):
+            connection.pghistory_injected_context = None
+
+        injected_context = getattr(connection, "pghistory_injected_context", None)
+
+    if _can_inject_variable(cursor, sql) and not _is_transaction_end_statement(sql):
+        current_context = (tracked_context.id, tracked_context.version)
+
+    if current_context and current_context != injected_context:
         # Metadata is stored as a serialized JSON string with escaped
         # single quotes
-        serialized_metadata = json.dumps(_tracker.value.metadata, cls=config.json_encoder())
         context_params = {
-            "pghistory__context_id": str(_tracker.value.id),
-            "pghistory__context_metadata": serialized_metadata,
+            "pghistory__context_id": str(tracked_context.id),
+            "pghistory__context_metadata": tracked_context.serialized_metadata,
         }
 
         # psycopg does not allow params to be mixed (named and series), so we
@@ -131,9 +339,34 @@ def _inject_history_context(
             f"set_config('pghistory.context_metadata', {metadata_placeholder}, true); "
         )
 
-    sql = inject_vars + sql
-    sql = sql.encode() if is_bytes else sql
-    return _execute_wrapper(execute(sql, params, many, context))
+    # Avoid decoding the statement, which can be large for bulk operations
+    sql = (inject_vars.encode() + sql) if isinstance(sql, bytes) else (inject_vars + sql)
+    result = _execute_wrapper(execute(sql, params, many, context))
+
+    # Only remember the injected variables once the statement succeeded. If it
+    # failed, the transaction is errored and must be rolled back anyways
+    if per_transaction and inject_vars:
+        connection.pghistory_injected_context = current_context
+
+    return result
+
+
+def _install_inject_history_context(connection, **kwargs):
+    """
+    Installs the execute wrapper that injects context on the default connection.
+
+    The wrapper is a no-op unless [pghistory.context][] is active. It is installed
+    when connections are created so that it is present on the connection of
+    whichever thread runs the queries, such as the threads used by Django's
+    async ORM methods.
+    """
+    if (
+        connection.alias == DEFAULT_DB_ALIAS
+        and _inject_history_context not in connection.execute_wrappers
+    ):
+        # Insert first so that popping the most recent wrapper in
+        # connection.execute_wrapper() never removes this one
+        connection.execute_wrappers.insert(0, _inject_history_context)
 
 
 class context(contextlib.ContextDecorator):
@@ -144,7 +377,9 @@ class context(contextlib.ContextDecorator):
     Context is added as variables at the beginning of every SQL statement.
     By default, all variables are localized to the transaction (i.e
     SET LOCAL), meaning they will only persist for the statement/transaction
-    and not across the session.
+    and not across the session. When `settings.PGHISTORY_CONTEXT_INJECTION`
+    is "transaction", variables are only added to the first statement of
+    each transaction and again whenever the metadata changes.
 
     Once any code has entered [pghistory.context][], all subsequent
     entrances of [pghistory.context][] will be grouped under the same
@@ -156,6 +391,11 @@ class context(contextlib.ContextDecorator):
     [pghistory.context][] has previously been entered. Otherwise it will
     be ignored.
 
+    [pghistory.context][] can also be used as an async context manager
+    and as a decorator of coroutine functions. Context is stored in context
+    variables, so concurrent asyncio tasks that enter [pghistory.context][],
+    even the same instance, each have their own context.
+
     Attributes:
         **metadata: Metadata that should be attached to the tracking
             context
@@ -180,31 +420,103 @@ class context(contextlib.ContextDecorator):
         does not work for named cursors. Django uses named cursors for
         the .iterator() operator, which has no effect on history tracking.
         However, there may be other usages of named cursors in Django where
-        history context is ignored.
+        history context is ignored. Context is also not attached to operations
+        that bypass Django's cursor, such as `COPY` through psycopg. Use
+        [pghistory.context.bind][pghistory.runtime.context.bind] for these cases.
     """
 
     def __init__(self, **metadata: Any):
         self.metadata = metadata
-        self._pre_execute_hook = None
 
         if hasattr(_tracker, "value"):
-            _tracker.value.metadata.update(**self.metadata)
+            _tracker.value.update(**self.metadata)
+
+    @staticmethod
+    def bind(using: str = DEFAULT_DB_ALIAS) -> Optional[Context]:
+        """
+        Attach the active context to the current transaction.
+
+        Context is injected into statements executed through Django's cursors.
+        Operations that bypass them, such as psycopg's `cursor.copy()`,
+        `copy_expert()`, or named cursors, do not receive context. Call this
+        inside a transaction before running them so that their events
+        reference the active context.
+
+        Like [pghistory.context][], the variables are local to the transaction.
+        When `settings.PGHISTORY_CONTEXT_INJECTION` is "transaction", they are
+        only set if they haven't been set for the current transaction already.
+
+        Args:
+            using: The database.
+
+        Raises:
+            RuntimeError: If the connection is not in a transaction.
+
+        Returns:
+            The active context, or `None` if no context is active.
+
+        Example:
+            Bulk load rows with `COPY` while attaching context:
+
+                with pghistory.context(job="import"), transaction.atomic():
+                    pghistory.context.bind()
+                    with connection.cursor() as cursor:
+                        with cursor.copy("COPY my_table (col) FROM STDIN") as copy:
+                            ...
+        """
+        tracked_context = _tracker.get()
+        if tracked_context is None:
+            return None
+
+        bound_connection = connections[using]
+        if bound_connection.get_autocommit():
+            raise RuntimeError("pghistory.context.bind() must be called inside a transaction.")
+
+        current_context = (tracked_context.id, tracked_context.version)
+        with bound_connection.cursor() as cursor:
+            # Only the "transaction" injection mode keeps track of the injected context
+            if (
+                not tracked_context.per_transaction
+                or _is_transaction_idle(cursor)
+                or getattr(bound_connection, "pghistory_injected_context", None) != current_context
+            ):
+                cursor.execute(
+                    "SELECT set_config('pghistory.context_id', %s, true), "
+                    "set_config('pghistory.context_metadata', %s, true)",
+                    [str(tracked_context.id), tracked_context.serialized_metadata],
+                )
+                bound_connection.pghistory_injected_context = current_context
+
+        return tracked_context
+
+    def __call__(self, func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def inner(*args, **kwargs):
+                async with self._recreate_cm():
+                    return await func(*args, **kwargs)
+
+            return inner
+
+        return super().__call__(func)
+
+    def _enter(self):
+        # The metadata is copied so that updates to the context don't change
+        # the metadata of instances that are entered again, such as decorators
+        return _tracker.enter(dict(self.metadata))
 
     def __enter__(self):
-        if not hasattr(_tracker, "value"):
-            self._pre_execute_hook = connection.execute_wrapper(_inject_history_context)
-            self._pre_execute_hook.__enter__()
-            _tracker.value = Context(id=uuid.uuid4(), metadata=self.metadata)
-
-        return _tracker.value
+        _install_inject_history_context(connection)
+        return self._enter()
 
     async def __aenter__(self):
-        return await sync_to_async(self.__enter__)()
+        # Queries from async code run on connections of other threads, which
+        # install the execute wrapper when they are created
+        return self._enter()
 
     def __exit__(self, *exc):
-        if self._pre_execute_hook:
-            delattr(_tracker, "value")
-            self._pre_execute_hook.__exit__(*exc)
+        _tracker.exit()
 
     async def __aexit__(self, *exc):
-        return await sync_to_async(self.__exit__)(*exc)
+        return self.__exit__(*exc)
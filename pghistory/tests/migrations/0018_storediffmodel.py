@@ -0,0 +1,211 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:51
+
+import django.db.models.deletion
+import pgtrigger.compiler
+import pgtrigger.migrations
+from django.db import migrations, models
+
+import pghistory.utils
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("pghistory", "0008_auto_20261018_1200"),
+        ("tests", "0017_merge_20250421_2036"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoreDiffModel",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("int_field", models.IntegerField()),
+                ("char_field", models.CharField(max_length=16)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="StoreDiffModelEvent",
+            fields=[
+                ("pgh_id", models.AutoField(primary_key=True, serialize=False)),
+                ("pgh_created_at", models.DateTimeField(auto_now_add=True)),
+                ("pgh_label", models.TextField(help_text="The event label.")),
+                (
+                    "pgh_diff",
+                    pghistory.utils.JSONField(
+                        editable=False,
+                        help_text="The diff from the previous event of the object.",
+                        null=True,
+                    ),
+                ),
+                ("id", models.IntegerField()),
+                ("int_field", models.IntegerField()),
+                ("char_field", models.CharField(max_length=16)),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="StoreDiffModelUnstoredEvent",
+            fields=[
+                ("pgh_id", models.AutoField(primary_key=True, serialize=False)),
+                ("pgh_created_at", models.DateTimeField(auto_now_add=True)),
+                ("pgh_label", models.TextField(help_text="The event label.")),
+                ("id", models.IntegerField()),
+                ("int_field", models.IntegerField()),
+                ("char_field", models.CharField(max_length=16)),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name="storediffmodel",
+            trigger=pgtrigger.compiler.Trigger(
+                name="unstored_insert_insert",
+                sql=pgtrigger.compiler.UpsertTriggerSql(
+                    func='INSERT INTO "tests_storediffmodelunstoredevent" ("char_field", "id", "int_field", "pgh_context_id", "pgh_created_at", "pgh_label", "pgh_obj_id") VALUES (NEW."char_field", NEW."id", NEW."int_field", _pgh_attach_context(), NOW(), \'unstored_insert\', NEW."id"); RETURN NULL;',  # noqa: E501
+                    hash="6668118e252c1e27046cd10795f40b06a0859cbe",
+                    operation="INSERT",
+                    pgid="pgtrigger_unstored_insert_insert_539ad",
+                    table="tests_storediffmodel",
+                    when="AFTER",
+                ),
+            ),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name="storediffmodel",
+            trigger=pgtrigger.compiler.Trigger(
+                name="unstored_update_update",
+                sql=pgtrigger.compiler.UpsertTriggerSql(
+                    condition="WHEN (OLD.* IS DISTINCT FROM NEW.*)",
+                    func='INSERT INTO "tests_storediffmodelunstoredevent" ("char_field", "id", "int_field", "pgh_context_id", "pgh_created_at", "pgh_label", "pgh_obj_id") VALUES (NEW."char_field", NEW."id", NEW."int_field", _pgh_attach_context(), NOW(), \'unstored_update\', NEW."id"); RETURN NULL;',  # noqa: E501
+                    hash="d2a2d39fb7cac01f9b118ee5a8613c2f50548cf1",
+                    operation="UPDATE",
+                    pgid="pgtrigger_unstored_update_update_f20e2",
+                    table="tests_storediffmodel",
+                    when="AFTER",
+                ),
+            ),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name="storediffmodel",
+            trigger=pgtrigger.compiler.Trigger(
+                name="unstored_int_field_updated_update",
+                sql=pgtrigger.compiler.UpsertTriggerSql(
+                    condition='WHEN (OLD."int_field" IS DISTINCT FROM (NEW."int_field"))',
+                    func='INSERT INTO "tests_storediffmodelunstoredevent" ("char_field", "id", "int_field", "pgh_context_id", "pgh_created_at", "pgh_label", "pgh_obj_id") VALUES (NEW."char_field", NEW."id", NEW."int_field", _pgh_attach_context(), NOW(), \'unstored_int_field_updated\', NEW."id"); RETURN NULL;',  # noqa: E501
+                    hash="ef7267eb2dfef92de23dbc8662ab87ee9c4bb3e6",
+                    operation="UPDATE",
+                    pgid="pgtrigger_unstored_int_field_updated_update_62af3",
+                    table="tests_storediffmodel",
+                    when="AFTER",
+                ),
+            ),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name="storediffmodel",
+            trigger=pgtrigger.compiler.Trigger(
+                name="insert_insert",
+                sql=pgtrigger.compiler.UpsertTriggerSql(
+                    func='INSERT INTO "tests_storediffmodelevent" ("char_field", "id", "int_field", "pgh_context_id", "pgh_created_at", "pgh_label", "pgh_obj_id") VALUES (NEW."char_field", NEW."id", NEW."int_field", _pgh_attach_context(), NOW(), \'insert\', NEW."id"); RETURN NULL;',  # noqa: E501
+                    hash="0f3e0020c5dd97d32cb7b12909cd234f5fecba6a",
+                    operation="INSERT",
+                    pgid="pgtrigger_insert_insert_fb8d8",
+                    table="tests_storediffmodel",
+                    when="AFTER",
+                ),
+            ),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name="storediffmodel",
+            trigger=pgtrigger.compiler.Trigger(
+                name="update_update",
+                sql=pgtrigger.compiler.UpsertTriggerSql(
+                    condition="WHEN (OLD.* IS DISTINCT FROM NEW.*)",
+                    func='INSERT INTO "tests_storediffmodelevent" ("char_field", "id", "int_field", "pgh_context_id", "pgh_created_at", "pgh_label", "pgh_obj_id") VALUES (NEW."char_field", NEW."id", NEW."int_field", _pgh_attach_context(), NOW(), \'update\', NEW."id"); RETURN NULL;',  # noqa: E501
+                    hash="4ddcf9e63386ecda0a222f211eaee3a0892408d2",
+                    operation="UPDATE",
+                    pgid="pgtrigger_update_update_f65b9",
+                    table="tests_storediffmodel",
+                    when="AFTER",
+                ),
+            ),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name="storediffmodel",
+            trigger=pgtrigger.compiler.Trigger(
+                name="int_field_updated_update",
+                sql=pgtrigger.compiler.UpsertTriggerSql(
+                    condition='WHEN (OLD."int_field" IS DISTINCT FROM (NEW."int_field"))',
+                    func='INSERT INTO "tests_storediffmodelevent" ("char_field", "id", "int_field", "pgh_context_id", "pgh_created_at", "pgh_label", "pgh_obj_id") VALUES (NEW."char_field", NEW."id", NEW."int_field", _pgh_attach_context(), NOW(), \'int_field_updated\', NEW."id"); RETURN NULL;',  # noqa: E501
+                    hash="4b59e9968df71c7d2db19d1faedfb3d765fa5602",
+                    operation="UPDATE",
+                    pgid="pgtrigger_int_field_updated_update_ef186",
+                    table="tests_storediffmodel",
+                    when="AFTER",
+                ),
+            ),
+        ),
+        migrations.AddField(
+            model_name="storediffmodelevent",
+            name="pgh_context",
+            field=models.ForeignKey(
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="pghistory.context",
+            ),
+        ),
+        migrations.AddField(
+            model_name="storediffmodelevent",
+            name="pgh_obj",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="events",
+                to="tests.storediffmodel",
+            ),
+        ),
+        migrations.AddField(
+            model_name="storediffmodelunstoredevent",
+            name="pgh_context",
+            field=models.ForeignKey(
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="pghistory.context",
+            ),
+        ),
+        migrations.AddField(
+            model_name="storediffmodelunstoredevent",
+            name="pgh_obj",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="unstored_events",
+                to="tests.storediffmodel",
+            ),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name="storediffmodelevent",
+            trigger=pgtrigger.compiler.Trigger(
+                name="store_diff",
+                sql=pgtrigger.compiler.UpsertTriggerSql(
+                    func='SELECT JSONB_OBJECT_AGG(curr.key, ARRAY[prev.value, curr.value]) INTO NEW.pgh_diff FROM JSONB_EACH(TO_JSONB(NEW)) curr JOIN JSONB_EACH(( SELECT TO_JSONB(_event) FROM "tests_storediffmodelevent" _event WHERE _event."pgh_obj_id" = NEW."pgh_obj_id" AND _event.pgh_id < NEW.pgh_id ORDER BY _event.pgh_id DESC LIMIT 1 )) prev ON curr.key = prev.key WHERE LEFT(curr.key, 4) != \'pgh_\' AND curr.value != prev.value; RETURN NEW;',  # noqa: E501
+                    hash="5d7c2b98aa80cc9735d75a01aa8dc00ca9bdfcb0",
+                    operation="INSERT",
+                    pgid="pgtrigger_store_diff_7ed3a",
+                    table="tests_storediffmodelevent",
+                    when="BEFORE",
+                ),
+            ),
+        ),
+    ]
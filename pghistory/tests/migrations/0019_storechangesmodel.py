@@ -0,0 +1,211 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:54
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+import pgtrigger.compiler
+import pgtrigger.migrations
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("pghistory", "0008_auto_20261018_1200"),
+        ("tests", "0018_storediffmodel"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StoreChangesModel",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),  # noqa: E501
+                ("int_field", models.IntegerField()),
+                ("char_field", models.CharField(max_length=16)),
+                (
+                    "fk_field",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),  # noqa: E501
+            ],
+        ),
+        migrations.CreateModel(
+            name="StoreChangesModelEvent",
+            fields=[
+                ("pgh_id", models.AutoField(primary_key=True, serialize=False)),
+                ("pgh_created_at", models.DateTimeField(auto_now_add=True)),
+                ("pgh_label", models.TextField(help_text="The event label.")),
+                (
+                    "pgh_changed",
+                    django.contrib.postgres.fields.ArrayField(
+                        base_field=models.TextField(),
+                        editable=False,
+                        help_text="The columns stored by the event. All columns are stored when null.",  # noqa: E501
+                        null=True,
+                        size=None,
+                    ),
+                ),  # noqa: E501
+                ("id", models.IntegerField(null=True)),
+                ("int_field", models.IntegerField(null=True)),
+                ("char_field", models.CharField(max_length=16, null=True)),
+                (
+                    "fk_field",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        related_query_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),  # noqa: E501
+                (
+                    "pgh_context",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="pghistory.context",
+                    ),
+                ),  # noqa: E501
+                (
+                    "pgh_obj",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="events",
+                        to="tests.storechangesmodel",
+                    ),
+                ),  # noqa: E501
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.CreateModel(
+            name="StoreChangesModelUnstoredEvent",
+            fields=[
+                ("pgh_id", models.AutoField(primary_key=True, serialize=False)),
+                ("pgh_created_at", models.DateTimeField(auto_now_add=True)),
+                ("pgh_label", models.TextField(help_text="The event label.")),
+                ("id", models.IntegerField()),
+                ("int_field", models.IntegerField()),
+                ("char_field", models.CharField(max_length=16)),
+                (
+                    "fk_field",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        related_query_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),  # noqa: E501
+                (
+                    "pgh_context",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="pghistory.context",
+                    ),
+                ),  # noqa: E501
+                (
+                    "pgh_obj",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="unstored_events",
+                        to="tests.storechangesmodel",
+                    ),
+                ),  # noqa: E501
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name="storechangesmodel",
+            trigger=pgtrigger.compiler.Trigger(
+                name="unstored_insert_insert",
+                sql=pgtrigger.compiler.UpsertTriggerSql(
+                    func='INSERT INTO "tests_storechangesmodelunstoredevent" ("char_field", "fk_field_id", "id", "int_field", "pgh_context_id", "pgh_created_at", "pgh_label", "pgh_obj_id") VALUES (NEW."char_field", NEW."fk_field_id", NEW."id", NEW."int_field", _pgh_attach_context(), NOW(), \'unstored_insert\', NEW."id"); RETURN NULL;',  # noqa: E501
+                    hash="d721effe9aab87cf432cce272b29ab93cf2174c6",
+                    operation="INSERT",
+                    pgid="pgtrigger_unstored_insert_insert_77199",
+                    table="tests_storechangesmodel",
+                    when="AFTER",
+                ),
+            ),  # noqa: E501
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name="storechangesmodel",
+            trigger=pgtrigger.compiler.Trigger(
+                name="unstored_update_update",
+                sql=pgtrigger.compiler.UpsertTriggerSql(
+                    condition="WHEN (OLD.* IS DISTINCT FROM NEW.*)",
+                    func='INSERT INTO "tests_storechangesmodelunstoredevent" ("char_field", "fk_field_id", "id", "int_field", "pgh_context_id", "pgh_created_at", "pgh_label", "pgh_obj_id") VALUES (NEW."char_field", NEW."fk_field_id", NEW."id", NEW."int_field", _pgh_attach_context(), NOW(), \'unstored_update\', NEW."id"); RETURN NULL;',  # noqa: E501
+                    hash="1a6b58657a63ce59e29c92ef5f223d9130b0c450",
+                    operation="UPDATE",
+                    pgid="pgtrigger_unstored_update_update_5bde5",
+                    table="tests_storechangesmodel",
+                    when="AFTER",
+                ),
+            ),  # noqa: E501
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name="storechangesmodel",
+            trigger=pgtrigger.compiler.Trigger(
+                name="insert_insert",
+                sql=pgtrigger.compiler.UpsertTriggerSql(
+                    func='INSERT INTO "tests_storechangesmodelevent" ("char_field", "fk_field_id", "id", "int_field", "pgh_context_id", "pgh_created_at", "pgh_label", "pgh_obj_id") VALUES (NEW."char_field", NEW."fk_field_id", NEW."id", NEW."int_field", _pgh_attach_context(), NOW(), \'insert\', NEW."id"); RETURN NULL;',  # noqa: E501
+                    hash="c3b3a23426e520e59f6b5ffc4aa1c79fae58ec32",
+                    operation="INSERT",
+                    pgid="pgtrigger_insert_insert_c7018",
+                    table="tests_storechangesmodel",
+                    when="AFTER",
+                ),
+            ),  # noqa: E501
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name="storechangesmodel",
+            trigger=pgtrigger.compiler.Trigger(
+                name="update_update",
+                sql=pgtrigger.compiler.UpsertTriggerSql(
+                    condition="WHEN (OLD.* IS DISTINCT FROM NEW.*)",
+                    func='INSERT INTO "tests_storechangesmodelevent" ("char_field", "fk_field_id", "id", "int_field", "pgh_context_id", "pgh_created_at", "pgh_label", "pgh_obj_id") VALUES (NEW."char_field", NEW."fk_field_id", NEW."id", NEW."int_field", _pgh_attach_context(), NOW(), \'update\', NEW."id"); RETURN NULL;',  # noqa: E501
+                    hash="4b88c5ff249049dbf79334e5152d353c6985b5c0",
+                    operation="UPDATE",
+                    pgid="pgtrigger_update_update_0e560",
+                    table="tests_storechangesmodel",
+                    when="AFTER",
+                ),
+            ),  # noqa: E501
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name="storechangesmodelevent",
+            trigger=pgtrigger.compiler.Trigger(
+                name="store_changes",
+                sql=pgtrigger.compiler.UpsertTriggerSql(
+                    declare="DECLARE _depth INTEGER; _prev JSONB; _changed TEXT[];",
+                    func='NEW.pgh_changed := NULL; SELECT COUNT(*) INTO _depth FROM "tests_storechangesmodelevent" _chain WHERE _chain."pgh_obj_id" = NEW."pgh_obj_id" AND _chain.pgh_id < NEW.pgh_id AND _chain.pgh_id >= ( SELECT MAX(_full.pgh_id) FROM "tests_storechangesmodelevent" _full WHERE _full."pgh_obj_id" = NEW."pgh_obj_id" AND _full.pgh_id < NEW.pgh_id AND _full.pgh_changed IS NULL ) ; IF _depth = 0 OR _depth >= 3 THEN RETURN NEW; END IF; _prev := ( SELECT JSONB_OBJECT_AGG(_field.key, _field.value) FROM ( SELECT DISTINCT ON (_field.key) _field.key, _field.value FROM "tests_storechangesmodelevent" _chain , JSONB_EACH(TO_JSONB(_chain)) _field WHERE _chain."pgh_obj_id" = NEW."pgh_obj_id" AND _chain.pgh_id < NEW.pgh_id AND _chain.pgh_id >= ( SELECT MAX(_full.pgh_id) FROM "tests_storechangesmodelevent" _full WHERE _full."pgh_obj_id" = NEW."pgh_obj_id" AND _full.pgh_id < NEW.pgh_id AND _full.pgh_changed IS NULL ) AND (_chain.pgh_changed IS NULL OR _field.key = ANY(_chain.pgh_changed)) AND LEFT(_field.key, 4) != \'pgh_\' ORDER BY _field.key, _chain.pgh_id DESC ) _field ) ; SELECT COALESCE(ARRAY_AGG(_field.key ORDER BY _field.key), ARRAY[]::TEXT[]) INTO _changed FROM JSONB_EACH(TO_JSONB(NEW)) _field WHERE LEFT(_field.key, 4) != \'pgh_\' AND _field.value IS DISTINCT FROM _prev -> _field.key; NEW := JSONB_POPULATE_RECORD(NEW, ( SELECT COALESCE(JSONB_OBJECT_AGG(_field.key, NULL), JSONB_BUILD_OBJECT()) FROM JSONB_EACH(TO_JSONB(NEW)) _field WHERE LEFT(_field.key, 4) != \'pgh_\' AND _field.key != ALL(_changed) )); NEW.pgh_changed := _changed; RETURN NEW;',  # noqa: E501
+                    hash="296b33c13d7b839b750e26174c8a82d00716f7da",
+                    operation="INSERT",
+                    pgid="pgtrigger_store_changes_3e0a5",
+                    table="tests_storechangesmodelevent",
+                    when="BEFORE",
+                ),
+            ),  # noqa: E501
+        ),
+    ]
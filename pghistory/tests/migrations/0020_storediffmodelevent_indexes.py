@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("pghistory", "0008_auto_20261018_1200"),
+        ("tests", "0019_storechangesmodel"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="storediffmodelevent",
+            index=models.Index(
+                fields=["pgh_obj", "pgh_id"], name="tests_store_pgh_obj_25c607_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="storediffmodelevent",
+            index=models.Index(fields=["pgh_created_at"], name="tests_store_pgh_cre_0b0658_idx"),
+        ),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 5.2.18 on 2026-10-18 21:06
+
+import django.db.models.deletion
+import pgtrigger.compiler
+import pgtrigger.migrations
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("pghistory", "0008_auto_20261018_1200"),
+        ("tests", "0020_storediffmodelevent_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PartitionModel",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("int_field", models.IntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="PartitionModelEvent",
+            fields=[
+                ("pgh_id", models.AutoField(primary_key=True, serialize=False)),
+                ("pgh_created_at", models.DateTimeField(auto_now_add=True)),
+                ("pgh_label", models.TextField(help_text="The event label.")),
+                ("id", models.IntegerField()),
+                ("int_field", models.IntegerField()),
+            ],
+            options={
+                "abstract": False,
+                "pgh_partition": {"field": "pgh_created_at", "interval": "month"},
+            },
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name="partitionmodel",
+            trigger=pgtrigger.compiler.Trigger(
+                name="insert_insert",
+                sql=pgtrigger.compiler.UpsertTriggerSql(
+                    func='INSERT INTO "tests_partitionmodelevent" ("id", "int_field", "pgh_context_id", "pgh_created_at", "pgh_label", "pgh_obj_id") VALUES (NEW."id", NEW."int_field", _pgh_attach_context(), NOW(), \'insert\', NEW."id"); RETURN NULL;',  # noqa: E501
+                    hash="fb72d5380cb5f4cf80282b575a36d4fe3100de89",
+                    operation="INSERT",
+                    pgid="pgtrigger_insert_insert_7a678",
+                    table="tests_partitionmodel",
+                    when="AFTER",
+                ),
+            ),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name="partitionmodel",
+            trigger=pgtrigger.compiler.Trigger(
+                name="update_update",
+                sql=pgtrigger.compiler.UpsertTriggerSql(
+                    condition="WHEN (OLD.* IS DISTINCT FROM NEW.*)",
+                    func='INSERT INTO "tests_partitionmodelevent" ("id", "int_field", "pgh_context_id", "pgh_created_at", "pgh_label", "pgh_obj_id") VALUES (NEW."id", NEW."int_field", _pgh_attach_context(), NOW(), \'update\', NEW."id"); RETURN NULL;',  # noqa: E501
+                    hash="d7a1a0cb4213191b213c53a1f13543af0493139b",
+                    operation="UPDATE",
+                    pgid="pgtrigger_update_update_6ae77",
+                    table="tests_partitionmodel",
+                    when="AFTER",
+                ),
+            ),
+        ),
+        migrations.AddField(
+            model_name="partitionmodelevent",
+            name="pgh_context",
+            field=models.ForeignKey(
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="pghistory.context",
+            ),
+        ),
+        migrations.AddField(
+            model_name="partitionmodelevent",
+            name="pgh_obj",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="events",
+                to="tests.partitionmodel",
+            ),
+        ),
+        pgtrigger.migrations.AddTrigger(
+            model_name="partitionmodelevent",
+            trigger=pgtrigger.compiler.Trigger(
+                name="append_only",
+                sql=pgtrigger.compiler.UpsertTriggerSql(
+                    func="RAISE EXCEPTION 'pgtrigger: Cannot update or delete rows from % table', TG_TABLE_NAME;",  # noqa: E501
+                    hash="0a500acdf57c862c986215ca5624fa231b8b1195",
+                    operation="UPDATE OR DELETE",
+                    pgid="pgtrigger_append_only_b4a71",
+                    table="tests_partitionmodelevent",
+                    when="BEFORE",
+                ),
+            ),
+        ),
+    ]
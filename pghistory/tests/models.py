@@ -230,6 +230,70 @@ class CondStatement(models.Model):
     int_field2 = models.IntegerField()
 
 
+@pghistory.track(
+    pghistory.InsertEvent(),
+    pghistory.UpdateEvent(),
+    pghistory.UpdateEvent("int_field_updated", condition=pghistory.AnyChange("int_field")),
+    pghistory.ManualEvent("manual"),
+    store_diff=True,
+    indexes="recommended",
+)
+@pghistory.track(
+    pghistory.InsertEvent("unstored_insert"),
+    pghistory.UpdateEvent("unstored_update"),
+    pghistory.UpdateEvent(
+        "unstored_int_field_updated", condition=pghistory.AnyChange("int_field")
+    ),
+    pghistory.ManualEvent("unstored_manual"),
+    obj_field=pghistory.ObjForeignKey(related_name="unstored_events"),
+    model_name="StoreDiffModelUnstoredEvent",
+)
+class StoreDiffModel(models.Model):
+    """
+    For testing diffs that are stored when events are created
+    """
+
+    int_field = models.IntegerField()
+    char_field = models.CharField(max_length=16)
+
+
+@pghistory.track(
+    pghistory.InsertEvent(),
+    pghistory.UpdateEvent(),
+    pghistory.ManualEvent("manual"),
+    store_changes=3,
+)
+@pghistory.track(
+    pghistory.InsertEvent("unstored_insert"),
+    pghistory.UpdateEvent("unstored_update"),
+    pghistory.ManualEvent("unstored_manual"),
+    obj_field=pghistory.ObjForeignKey(related_name="unstored_events"),
+    model_name="StoreChangesModelUnstoredEvent",
+)
+class StoreChangesModel(models.Model):
+    """
+    For testing event models that only store changed fields
+    """
+
+    int_field = models.IntegerField()
+    char_field = models.CharField(max_length=16)
+    fk_field = models.ForeignKey("auth.User", on_delete=models.SET_NULL, null=True)
+
+
+@pghistory.track(
+    pghistory.InsertEvent(),
+    pghistory.UpdateEvent(),
+    append_only=True,
+    partition_by="pgh_created_at",
+)
+class PartitionModel(models.Model):
+    """
+    For testing event models with partitioned tables
+    """
+
+    int_field = models.IntegerField()
+
+
 class CustomEventModel(
     pghistory.create_event_model(
         EventModel,
@@ -1,7 +1,12 @@
+import json
+
 import bs4
 import ddf
 import pytest
 from django import urls
+from django.contrib import admin as django_admin
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 import pghistory.tests.models as test_models
 from pghistory import models
@@ -155,3 +160,169 @@ def test_event_links(authed_client):
     soup = bs4.BeautifulSoup(resp.content, "html.parser")
     back_url = soup.find("a", href=True, class_="back")["href"]
     assert back_url == url
+
+
+@pytest.mark.django_db
+def test_events_page_keyset_pagination(authed_client, settings, mocker):
+    """Verify the events page paginates with a keyset when configured"""
+    settings.PGHISTORY_ADMIN_KEYSET_PAGINATION = True
+    mocker.patch.object(admin.EventsAdmin, "list_per_page", 2)
+    snapshot = ddf.G(test_models.SnapshotModel)
+    for i in range(4):
+        snapshot.int_field = i + 10
+        snapshot.save()
+
+    changelist_url = urls.reverse("admin:pghistory_events_changelist")
+    url = (
+        f"{changelist_url}?obj=tests.SnapshotModel:{snapshot.pk}"
+        "&method=tracks&event_model=tests.snapshotmodelsnapshot"
+    )
+    expected = list(
+        models.Events.objects.tracks(snapshot)
+        .across("tests.SnapshotModelSnapshot")
+        .order_by("-pgh_created_at", "-pgh_model", "-pgh_id")
+        .values_list("pgh_id", flat=True)
+    )
+    assert len(expected) == 5
+
+    pgh_ids = []
+    num_pages = 0
+    while url:
+        resp = authed_client.get(url)
+        assert resp.status_code == 200
+        cl = resp.context["cl"]
+        assert cl.pgh_keyset
+        assert cl.full_result_count is None
+        pgh_ids.extend(event.pgh_id for event in cl.result_list)
+        num_pages += 1
+
+        soup = bs4.BeautifulSoup(resp.content, "html.parser")
+        assert bool(soup.find("a", href=True, class_="first")) == (num_pages > 1)
+        next_link = soup.find("a", href=True, class_="next")
+        url = changelist_url + next_link["href"] if next_link else None
+
+    assert num_pages == 3
+    assert pgh_ids == expected
+
+    # Sorting by a column uses page numbers
+    resp = authed_client.get(changelist_url + "?o=1")
+    assert resp.status_code == 200
+    assert not resp.context["cl"].pgh_keyset
+
+    # Other default orderings also use page numbers
+    settings.PGHISTORY_ADMIN_ORDERING = "-pgh_id"
+    resp = authed_client.get(changelist_url)
+    assert resp.status_code == 200
+    assert not resp.context["cl"].pgh_keyset
+    del settings.PGHISTORY_ADMIN_ORDERING
+
+    # Invalid cursors are treated like invalid filters
+    resp = authed_client.get(changelist_url + "?cursor=invalid")
+    assert resp.status_code == 302
+    assert "e=1" in resp["Location"]
+
+
+@pytest.mark.django_db
+def test_events_page_keyset_pagination_plan(authed_client, settings, mocker):
+    """
+    Verify keyset pages only look up the previous events of the page with
+    indices instead of computing them for every event before the cursor
+    """
+    settings.PGHISTORY_ADMIN_KEYSET_PAGINATION = True
+    mocker.patch.object(admin.EventsAdmin, "list_per_page", 2)
+    snapshot = ddf.G(test_models.SnapshotModel)
+    for i in range(4):
+        snapshot.int_field = i + 10
+        snapshot.save()
+
+    table = test_models.SnapshotModelSnapshot._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE INDEX ON "{table}" (pgh_obj_id, pgh_id)')
+        cursor.execute(f'CREATE INDEX ON "{table}" (pgh_created_at)')
+        cursor.execute("SET LOCAL enable_seqscan = off")
+
+    changelist_url = urls.reverse("admin:pghistory_events_changelist")
+    resp = authed_client.get(f"{changelist_url}?event_model=tests.snapshotmodelsnapshot")
+    next_link = bs4.BeautifulSoup(resp.content, "html.parser").find("a", class_="next")
+    with CaptureQueriesContext(connection) as queries:
+        resp = authed_client.get(changelist_url + next_link["href"])
+        assert resp.status_code == 200
+        assert resp.context["cl"].pgh_keyset
+
+    (sql,) = [query["sql"] for query in queries if "pghistory_events" in query["sql"]]
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+        plan = cursor.fetchone()[0]
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+
+    def node_types(node):
+        return [node["Node Type"]] + [
+            node_type for child in node.get("Plans", []) for node_type in node_types(child)
+        ]
+
+    assert "WindowAgg" not in node_types(plan[0]["Plan"])
+    assert "Seq Scan" not in node_types(plan[0]["Plan"])
+
+
+@pytest.mark.django_db
+def test_events_page_count_limit(authed_client, settings, mocker):
+    """Verify event admins stop counting events at the count limit"""
+    settings.PGHISTORY_ADMIN_COUNT_LIMIT = 3
+    mocker.patch.object(admin.BaseEventAdmin, "list_per_page", 2)
+    snapshot = ddf.G(test_models.SnapshotModel)
+    for i in range(4):
+        snapshot.int_field = i + 10
+        snapshot.save()
+
+    # There are five events, but only four are counted. The estimate of all
+    # events is under the limit, so the full count is still shown
+    mocker.patch.object(admin.EventsAdmin, "estimate_count", return_value=0)
+    changelist_url = urls.reverse("admin:pghistory_events_changelist")
+    resp = authed_client.get(changelist_url + "?event_model=tests.snapshotmodelsnapshot")
+    assert resp.status_code == 200
+    cl = resp.context["cl"]
+    assert cl.pgh_count_capped
+    assert cl.result_count == 4
+    assert cl.show_full_result_count
+    assert not cl.can_show_all
+    soup = bs4.BeautifulSoup(resp.content, "html.parser")
+    paginator = soup.find("p", class_="paginator").get_text(" ", strip=True)
+    assert paginator == "1 2 3+ events"
+
+    # Per-model event admins are also limited
+    url = urls.reverse("admin:tests_snapshotmodelsnapshot_changelist")
+    resp = authed_client.get(url)
+    assert resp.status_code == 200
+    assert resp.context["cl"].pgh_count_capped
+
+    # Full counts are skipped once the estimate passes the limit
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE tests_snapshotmodelsnapshot")
+    assert (
+        admin.EventModelAdmin(
+            test_models.SnapshotModelSnapshot, django_admin.site
+        ).estimate_count()
+        == 5
+    )
+    resp = authed_client.get(url)
+    assert resp.status_code == 200
+    assert not resp.context["cl"].show_full_result_count
+    assert resp.context["cl"].full_result_count is None
+
+    # Filtered results under the limit are counted exactly
+    resp = authed_client.get(changelist_url + "?event_model=tests.customeventmodel")
+    assert resp.status_code == 200
+    assert not resp.context["cl"].pgh_count_capped
+
+
+@pytest.mark.django_db
+def test_events_admin_estimate_count():
+    """Verify the events admin estimates the events of every event table"""
+    snapshot = ddf.G(test_models.SnapshotModel)
+    snapshot.int_field = 10
+    snapshot.save()
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE tests_snapshotmodelsnapshot")
+
+    events_admin = admin.EventsAdmin(models.Events, django_admin.site)
+    assert events_admin.estimate_count() >= 2
@@ -0,0 +1,227 @@
+import datetime as dt
+import re
+
+import ddf
+import pytest
+from django.core.management import call_command
+
+import pghistory
+from pghistory import archival
+from pghistory.models import Context
+from pghistory.tests import models as test_models
+
+
+def _make_events(model, num_updates, **kwargs):
+    obj = ddf.G(model, int_field=0, **kwargs)
+    for i in range(num_updates):
+        obj.int_field = i + 1
+        obj.save()
+
+    return obj
+
+
+def _get_values(events):
+    return [
+        {field.attname: getattr(event, field.attname) for field in event._meta.concrete_fields}
+        for event in events
+    ]
+
+
+@pytest.mark.django_db
+def test_archive(tmp_path):
+    with pghistory.context(key="value"):
+        obj = _make_events(
+            test_models.SnapshotModel,
+            2,
+            dt_field=dt.datetime(2030, 1, 1, 12, 0, 0, 123456, tzinfo=dt.timezone.utc),
+        )
+    other = _make_events(test_models.SnapshotModel, 0)
+    events = _get_values(test_models.SnapshotModelSnapshot.objects.order_by("pgh_id"))
+    obj_events = [event for event in events if event["pgh_obj_id"] == obj.id]
+
+    assert pghistory.archive(
+        test_models.SnapshotModelSnapshot, age=dt.timedelta(0), directory=tmp_path, batch_size=1
+    ) == {test_models.SnapshotModelSnapshot: 2}
+
+    # The latest event of each object is kept
+    assert list(obj.snapshot.values_list("int_field", flat=True)) == [2]
+    assert other.snapshot.count() == 1
+
+    month = archival._get_month(events[0]["pgh_created_at"])
+    assert [path.name for path in (tmp_path / "tests" / "snapshotmodelsnapshot").iterdir()] == [
+        f"{month}.jsonl.gz"
+    ]
+
+    # Archived events are read with the values of their fields
+    archived = list(
+        pghistory.archived_events(test_models.SnapshotModelSnapshot, obj=obj, directory=tmp_path)
+    )
+    assert _get_values(archived) == obj_events[:2]
+    assert archived[0].pgh_context_id is not None
+    assert archived[0]._state.adding
+
+    # Events in the database can be included
+    assert (
+        _get_values(
+            pghistory.archived_events(
+                test_models.SnapshotModelSnapshot,
+                obj=obj,
+                directory=tmp_path,
+                include_database=True,
+            )
+        )
+        == obj_events
+    )
+    assert (
+        _get_values(
+            pghistory.archived_events(
+                test_models.SnapshotModelSnapshot,
+                after=obj_events[0]["pgh_created_at"],
+                before=obj_events[0]["pgh_created_at"] + dt.timedelta(seconds=1),
+                directory=tmp_path,
+                include_database=True,
+            )
+        )
+        == events
+    )
+    assert not list(
+        pghistory.archived_events(
+            test_models.SnapshotModelSnapshot,
+            after=dt.datetime(2000, 1, 1, tzinfo=dt.timezone.utc),
+            before=dt.datetime(2000, 2, 1, tzinfo=dt.timezone.utc),
+            directory=tmp_path,
+        )
+    )
+    assert not list(
+        pghistory.archived_events(
+            test_models.SnapshotModelSnapshot,
+            after=obj_events[0]["pgh_created_at"] + dt.timedelta(seconds=1),
+            directory=tmp_path,
+        )
+    )
+
+    # Events that are archived again, such as after a failed delete, are only read once
+    archival._write(
+        tmp_path / "tests" / "snapshotmodelsnapshot" / f"{month}.jsonl.gz",
+        [
+            b'{"pgh_id": %d, "pgh_created_at": "2000-01-01T00:00:00+00:00", "pgh_label": "x",'
+            b' "pgh_obj_id": %d, "pgh_context_id": null, "dt_field": null, "int_field": 5,'
+            b' "fk_field_id": null, "id": %d}\n' % (events[0]["pgh_id"], obj.id, obj.id)
+        ],
+    )
+    assert (
+        len(list(pghistory.archived_events(test_models.SnapshotModelSnapshot, directory=tmp_path)))
+        == 2
+    )
+
+
+@pytest.mark.django_db
+def test_archive_ordering(tmp_path):
+    """Verify archived events are read by primary key when runs archive them out of order"""
+    first = _make_events(test_models.SnapshotModel, 1)
+    second = _make_events(test_models.SnapshotModel, 1)
+    pghistory.archive(test_models.SnapshotModelSnapshot, age=dt.timedelta(0), directory=tmp_path)
+
+    # The latest event of the first object is archived after an event of the second object
+    first.int_field = 2
+    first.save()
+    assert pghistory.archive(
+        test_models.SnapshotModelSnapshot, age=dt.timedelta(0), directory=tmp_path
+    ) == {test_models.SnapshotModelSnapshot: 1}
+
+    archived = list(
+        pghistory.archived_events(test_models.SnapshotModelSnapshot, directory=tmp_path)
+    )
+    assert [(event.pgh_obj_id, event.int_field) for event in archived] == [
+        (first.id, 0),
+        (first.id, 1),
+        (second.id, 0),
+    ]
+    assert [event.pgh_id for event in archived] == sorted(event.pgh_id for event in archived)
+
+
+@pytest.mark.django_db
+def test_archive_context(tmp_path, django_assert_num_queries):
+    """Verify contexts are archived with their events and survive pruning contexts"""
+    no_context_obj = _make_events(test_models.PartitionModel, 0)
+    with pghistory.context(key="value"):
+        obj = _make_events(test_models.PartitionModel, 1)
+    context = Context.objects.get()
+
+    pghistory.archive(
+        test_models.PartitionModelEvent,
+        age=dt.timedelta(0),
+        keep_latest=False,
+        directory=tmp_path,
+    )
+    assert pghistory.prune_contexts(min_age=dt.timedelta(0)) == 1
+
+    with django_assert_num_queries(0):
+        archived = list(
+            pghistory.archived_events(test_models.PartitionModelEvent, obj=obj, directory=tmp_path)
+        )
+        assert [event.pgh_context.metadata for event in archived] == [{"key": "value"}] * 2
+        assert archived[0].pgh_context.id == context.id
+        assert archived[0].pgh_context.created_at == context.created_at
+        assert archived[0].pgh_context.updated_at == context.updated_at
+
+        # Events without context are archived without it
+        (event,) = pghistory.archived_events(
+            test_models.PartitionModelEvent, obj=no_context_obj, directory=tmp_path
+        )
+        assert event.pgh_context is None
+
+
+@pytest.mark.django_db
+def test_archive_without_context_field(tmp_path):
+    obj = _make_events(test_models.SnapshotModel, 1)
+
+    assert pghistory.archive(
+        test_models.CustomSnapshotModel, age=dt.timedelta(0), directory=tmp_path
+    ) == {test_models.CustomSnapshotModel: 1}
+    assert [
+        (event.int_field, event.pgh_obj_id)
+        for event in pghistory.archived_events(
+            test_models.CustomSnapshotModel, directory=tmp_path, include_database=True
+        )
+    ] == [(0, obj.id), (1, obj.id)]
+
+
+def test_archive_errors(settings):
+    settings.PGHISTORY_ARCHIVE_DIR = None
+    with pytest.raises(ValueError, match="Supply a directory"):
+        pghistory.archive(test_models.SnapshotModelSnapshot, age=dt.timedelta(0))
+
+    with pytest.raises(ValueError, match="obj_field to filter"):
+        next(
+            pghistory.archived_events(
+                test_models.NoPghObjSnapshot, obj=test_models.SnapshotModel(), directory="."
+            )
+        )
+
+
+def test_json_encoder():
+    assert (
+        archival._JSONEncoder().encode(
+            {"time": dt.time(1, 2, 3, 456789), "bytes": b"value", "none": None}
+        )
+        == '{"time": "01:02:03.456789", "bytes": "dmFsdWU=", "none": null}'
+    )
+
+
+@pytest.mark.django_db
+def test_pghistory_archive_command(settings, tmp_path, capsys):
+    _make_events(test_models.PartitionModel, 2)
+    settings.PGHISTORY_ARCHIVE_DIR = str(tmp_path)
+
+    call_command("pghistory_archive", "tests.PartitionModelEvent", "--age=0", "--no-keep-latest")
+    out = capsys.readouterr().out
+    assert re.match(r"Archived 3 events from tests.PartitionModelEvent in .*s \(\d+/s\)\n$", out)
+    assert not test_models.PartitionModelEvent.objects.exists()
+    assert [
+        event.int_field for event in pghistory.archived_events(test_models.PartitionModelEvent)
+    ] == [0, 1, 2]
+
+    call_command("pghistory_archive", "--age=1")
+    out = capsys.readouterr().out
+    assert "Archived 0 events from tests.PartitionModelEvent" in out
@@ -1,7 +1,11 @@
 import pytest
+from django.apps import apps
 from django.core.management import call_command
 from django.core.management.base import SystemCheckError
 
+from pghistory import checks
+from pghistory.tests import models as test_models
+
 
 @pytest.mark.django_db
 def test_checks(settings):
@@ -16,3 +20,38 @@ def test_checks(settings):
     # and fails
     with pytest.raises(SystemCheckError, match='Add "pgtrigger" to settings.INSTALLED_APPS'):
         call_command("check")
+
+
+def test_check_admin_ordering_indexes(settings):
+    # Every model without an index is listed in a single warning
+    (warning,) = checks.check_admin_ordering_indexes(None)
+    assert warning.id == "pghistory.W001"
+    assert warning.msg.startswith(
+        'No index supports ordering the events admin by "pgh_created_at"'
+    )
+    warned = warning.msg.split(": ", 1)[1].rstrip(".").split(", ")
+    assert warned == sorted(warned)
+    assert test_models.SnapshotModelSnapshot._meta.label in warned
+    assert test_models.StoreDiffModel.events.rel.related_model._meta.label not in warned
+    assert test_models.StoreDiffModel.unstored_events.rel.related_model._meta.label in warned
+
+    # Only check the supplied apps
+    assert not checks.check_admin_ordering_indexes([apps.get_app_config("pghistory")])
+
+    # Primary keys, foreign keys, and unique fields have indexes
+    settings.PGHISTORY_ADMIN_ORDERING = "pgh_id"
+    assert not checks.check_admin_ordering_indexes(None)
+    settings.PGHISTORY_ADMIN_ORDERING = "-pgh_obj"
+    assert not checks.check_admin_ordering_indexes(None)
+
+    # Orderings over fields that aren't on the event model are ignored
+    settings.PGHISTORY_ADMIN_ORDERING = "pgh_obj_model"
+    assert not checks.check_admin_ordering_indexes(None)
+
+    settings.PGHISTORY_ADMIN_ORDERING = None
+    assert not checks.check_admin_ordering_indexes(None)
+
+    settings.INSTALLED_APPS = [
+        app for app in settings.INSTALLED_APPS if app not in ("pghistory.admin",)
+    ]
+    assert not checks.check_admin_ordering_indexes(None)
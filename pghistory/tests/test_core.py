@@ -7,7 +7,8 @@ import django
 import pgtrigger
 import pytest
 from django.apps import apps
-from django.db import DatabaseError, models
+from django.db import DatabaseError, connection, models
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
 import pghistory
@@ -49,6 +50,21 @@ def test_duplicate_registration():
         pghistory.InsertEvent("snapshot_insert").pghistory_setup(test_models.CustomModelSnapshot)
 
 
+def test_registered_event_spec():
+    """Verifies the field mappings of manual events are computed at registration"""
+    spec = pghistory.core._registered_trackers[(test_models.EventModel, "manual_event")]
+    assert spec.event_model == test_models.EventModel.pgh_event_models["manual_event"]
+    assert spec.attnames == ("id", "dt_field", "int_field")
+    assert "pgh_id" not in [field.attname for field in spec.insert_fields]
+    assert spec.has_obj and spec.has_context and not spec.has_denormalized_context
+
+    spec = pghistory.core._registered_trackers[(test_models.EventModel, "no_pgh_obj_manual_event")]
+    assert not spec.has_obj
+
+    spec = pghistory.core._registered_trackers[(test_models.DenormContext, "insert")]
+    assert spec.has_denormalized_context and spec.has_context_id
+
+
 def test_update_event_condition_none_overrides_default():
     tracker = pghistory.UpdateEvent(condition=None)
     assert tracker.condition is None
@@ -90,6 +106,27 @@ def test_get_obj_field(settings):
     assert obj_field.remote_field.related_name == "hello"
 
 
+def test_get_indexes(settings):
+    assert pghistory.core._get_indexes(constants.UNSET, obj_field=True) == []
+
+    settings.PGHISTORY_INDEXES = "recommended"
+    indexes = pghistory.core._get_indexes(constants.UNSET, obj_field=True)
+    assert [index.fields for index in indexes] == [["pgh_obj", "pgh_id"], ["pgh_created_at"]]
+
+    indexes = pghistory.core._get_indexes(constants.UNSET, obj_field=None)
+    assert [index.fields for index in indexes] == [["pgh_created_at"]]
+    assert pghistory.core._get_indexes(None, obj_field=True) == []
+
+    with pytest.raises(ValueError, match="must be"):
+        pghistory.core._get_indexes("invalid", obj_field=True)
+
+    event_model = test_models.StoreDiffModel.events.rel.related_model
+    assert [index.fields for index in event_model._meta.indexes] == [
+        ["pgh_obj", "pgh_id"],
+        ["pgh_created_at"],
+    ]
+
+
 @pytest.mark.django_db
 @pytest.mark.parametrize(
     "denorm_context_model", [test_models.DenormContext, test_models.DenormContextStatement]
@@ -275,6 +312,78 @@ def test_create_event_no_context():
         assert pghistory.create_event(dc, label="custom_snapshot_insert")
 
 
+@pytest.mark.django_db
+def test_bulk_create_events(mocker):
+    """
+    Verifies events can be created in bulk and are linked with the context
+    attached once per statement
+    """
+    assert pghistory.bulk_create_events([], label="manual_event") == []
+
+    ms = ddf.G("tests.EventModel", n=5)
+    with pytest.raises(ValueError, match="not a registered tracker"):
+        pghistory.bulk_create_events(ms, label="invalid_event")
+
+    with pytest.raises(ValueError, match="same model"):
+        pghistory.bulk_create_events([*ms, ddf.G("tests.SnapshotModel")], label="manual_event")
+
+    with pytest.raises(ValueError, match="positive"):
+        pghistory.bulk_create_events(ms, label="manual_event", batch_size=0)
+
+    events = pghistory.bulk_create_events(ms, label="manual_event")
+    assert [(e.pgh_obj_id, e.int_field, e.pgh_context_id) for e in events] == [
+        (m.id, m.int_field, None) for m in ms
+    ]
+    assert all(e.pgh_id and e.pgh_created_at for e in events)
+
+    events = pghistory.bulk_create_events(ms, label="no_pgh_obj_manual_event")
+    assert [(e.int_field, e.pgh_context_id) for e in events] == [(m.int_field, None) for m in ms]
+
+    with pghistory.context(hello="world") as ctx:
+        with CaptureQueriesContext(connection) as queries:
+            events = pghistory.bulk_create_events(ms, label="manual_event", batch_size=2)
+
+    inserts = [q["sql"] for q in queries if "_pgh_attach_context()" in q["sql"]]
+    assert len(inserts) == 3
+    assert all(q.count("_pgh_attach_context()") == 1 for q in inserts)
+    assert [(e.pgh_obj_id, e.pgh_context_id) for e in events] == [(m.id, ctx.id) for m in ms]
+    assert events[0].pgh_context.metadata == {"hello": "world"}
+    assert test_models.EventModel.pgh_event_models["manual_event"].objects.filter(
+        pgh_context_id=ctx.id
+    ).count() == len(ms)
+
+    # Batches are limited by the database by default
+    mocker.patch.object(connection.ops, "bulk_batch_size", return_value=3)
+    with CaptureQueriesContext(connection) as queries:
+        events = pghistory.bulk_create_events(ms, label="manual_event")
+        assert len(events) == len(ms)
+        events = pghistory.bulk_create_events(ms, label="manual_event", batch_size=4)
+        assert len(events) == len(ms)
+
+    assert len([q for q in queries if "INSERT INTO" in q["sql"]]) == 4
+
+
+@pytest.mark.django_db
+def test_bulk_create_events_denormed_context():
+    """
+    Test creating events in bulk with denormalized context
+    """
+    user = ddf.G("auth.User")
+    dcs = ddf.G(test_models.DenormContext, n=3, int_field=1, fk_field=user)
+    events = pghistory.bulk_create_events(dcs, label="insert")
+    assert [(e.pgh_context, e.pgh_context_id) for e in events] == [(None, None)] * 3
+
+    with pghistory.context(user=user.id):
+        events = pghistory.bulk_create_events(dcs, label="insert", batch_size=2)
+        assert [(e.pgh_obj_id, e.pgh_context, e.pgh_context_id) for e in events] == [
+            (dc.id, {"user": user.id}, pghistory.runtime._tracker.value.id) for dc in dcs
+        ]
+
+        events = pghistory.bulk_create_events(dcs, label="snapshot_no_id_update")
+        assert [e.pgh_context for e in events] == [{"user": user.id}] * 3
+        assert all(e.pgh_id for e in events)
+
+
 @pytest.mark.django_db
 def test_events_on_event_model(mocker):
     """
@@ -1,11 +1,15 @@
 import datetime as dt
+import json
+import warnings
+from unittest import mock
 
 import ddf
 import django
 import pytest
 from django.core.management import call_command
-from django.db import models
-from django.db.models import F
+from django.db import connection, models
+from django.db.models import Exists, F, OuterRef, Q
+from django.db.models.functions import Lower
 
 import pghistory.runtime
 import pghistory.tests.models as test_models
@@ -254,6 +258,434 @@ def test_events_references_joining_filtering(django_assert_num_queries, mocker):
     ) == {"https://url.com", None}
 
 
+@pytest.mark.django_db
+def test_events_references_diff_with_unreferenced_previous_event():
+    """
+    Verifies the diff of an event is computed against the previous event of
+    the object even when the previous event doesn't reference the filtered row
+    """
+    user1 = ddf.G("auth.User")
+    user2 = ddf.G("auth.User")
+    sm = ddf.G(test_models.SnapshotModel, int_field=1, fk_field=user2)
+    sm.fk_field = user1
+    sm.save()
+
+    assert list(
+        pghistory.models.Events.objects.references(user1)
+        .filter(pgh_model="tests.SnapshotModelSnapshot")
+        .values_list("pgh_diff", flat=True)
+    ) == [{"fk_field_id": [user2.id, user1.id]}]
+
+
+@pytest.mark.django_db
+def test_events_prev_data_is_not_a_subplan():
+    """
+    Verifies previous events are found with a lateral join on the event table
+    instead of a subquery that scans the event table for every event
+    """
+    sm = ddf.G(test_models.SnapshotModel, int_field=1)
+    sm.int_field = 2
+    sm.save()
+
+    # Event models that store changes look up the previous events of each
+    # event to reconstruct the fields that weren't stored
+    event_tables = {
+        model._meta.db_table
+        for model in pghistory.core.event_models()
+        if model is not test_models.StoreChangesModelEvent
+    }
+    for qs in (
+        pghistory.models.Events.objects.all(),
+        pghistory.models.Events.objects.tracks(sm),
+        pghistory.models.Events.objects.references(sm),
+    ):
+        sql, params = qs.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+
+        def subplan_relations(node, in_subplan=False):
+            in_subplan = in_subplan or node.get("Parent Relationship") == "SubPlan"
+            relations = (
+                {node["Relation Name"]} if in_subplan and "Relation Name" in node else set()
+            )
+            for child in node.get("Plans", []):
+                relations |= subplan_relations(child, in_subplan)
+
+            return relations
+
+        assert not subplan_relations(plan[0]["Plan"]) & event_tables
+
+
+def _count_limits(sql):
+    """Counts the limits of a query, ignoring the ones of previous event lookups"""
+    return sql.count(" LIMIT ") - sql.count("_prev.pgh_id DESC LIMIT 1")
+
+
+def _get_plan_node_types(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+        plan = json.loads(plan) if isinstance(plan, str) else plan
+
+    def node_types(node):
+        return [node["Node Type"]] + [
+            node_type for child in node.get("Plans", []) for node_type in node_types(child)
+        ]
+
+    return node_types(plan[0]["Plan"])
+
+
+@pytest.mark.django_db
+def test_events_limit_prev_data_plan():
+    """
+    Verifies a limited query of diffs only looks up the previous events of the
+    returned events with an index instead of computing them for every event
+    """
+    sm = ddf.G(test_models.SnapshotModel, int_field=1)
+    sm.int_field = 2
+    sm.save()
+
+    table = test_models.SnapshotModelSnapshot._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE INDEX ON "{table}" (pgh_obj_id, pgh_id)')
+        cursor.execute(f'CREATE INDEX ON "{table}" (pgh_created_at)')
+        cursor.execute("SET LOCAL enable_seqscan = off")
+
+    qs = (
+        pghistory.models.Events.objects.across(test_models.SnapshotModelSnapshot)
+        .filter(pgh_label="snapshot_update")
+        .order_by("-pgh_created_at")
+        .values("pgh_diff")[:10]
+    )
+    node_types = _get_plan_node_types(*qs.query.sql_with_params())
+    assert "WindowAgg" not in node_types
+    assert "Seq Scan" not in node_types
+    assert list(qs) == [{"pgh_diff": {"int_field": [1, 2]}}]
+
+
+@pytest.mark.django_db
+def test_events_pushdown():
+    """
+    Verifies filters, ordering, and limits are pushed into each branch of the
+    aggregate event CTE without changing the results
+    """
+    with pghistory.context(key="value1") as ctx:
+        sm1 = ddf.G(test_models.SnapshotModel, int_field=1)
+        sm2 = ddf.G(test_models.SnapshotModel, int_field=1)
+
+    for i in range(2, 5):
+        sm1.int_field = sm2.int_field = i
+        sm1.save()
+        sm2.save()
+
+    num_branches = len(pghistory.core.event_models())
+    events = pghistory.models.Events.objects
+    querysets = [
+        # Everything is pushed down
+        (
+            events.filter(pgh_label="snapshot_update").order_by("-pgh_created_at", "-pk")[:3],
+            num_branches + 1,
+        ),
+        (
+            events.filter(
+                pgh_obj_id=str(sm1.pk),
+                pgh_model="tests.SnapshotModelSnapshot",
+                pgh_created_at__lte=dt.datetime.now(dt.timezone.utc),
+            ).order_by(F("pgh_id").asc())[1:3],
+            num_branches + 1,
+        ),
+        (events.filter(pgh_context_id=ctx.id).order_by("pgh_slug")[:1], num_branches + 1),
+        # Only filters are pushed down
+        (events.filter(pgh_obj_id__in=[str(sm2.pk)]).order_by("pgh_id"), 0),
+        (events.filter(pgh_data__int_field=3).order_by("pgh_slug")[:1], 1),
+        (events.filter(pgh_label="snapshot_update").order_by("pgh_diff", "pgh_slug")[:1], 1),
+        (
+            events.filter(pgh_label="snapshot_update").order_by(
+                F("pgh_id").desc(nulls_last=True), "pgh_slug"
+            )[:1],
+            1,
+        ),
+        (
+            events.filter(pgh_label="snapshot_update").order_by(Lower("pgh_label"), "pgh_slug")[
+                :1
+            ],
+            1,
+        ),
+        (
+            events.filter(pgh_label="snapshot_update").extra(order_by=["-pgh_id", "pgh_slug"])[:1],
+            1,
+        ),
+        # Nothing is pushed down
+        (
+            (
+                events.filter(pgh_label="snapshot_update") | events.filter(pgh_obj_id=str(sm1.pk))
+            ).order_by("pgh_slug"),
+            0,
+        ),
+        (
+            events.filter(Q(pgh_obj_id=str(sm1.pk)) | Q(pgh_label="snapshot_insert")).order_by(
+                "pgh_slug"
+            )[:10],
+            1,
+        ),
+    ]
+
+    for qs, num_limits in querysets:
+        sql, _ = qs.query.sql_with_params()
+        assert _count_limits(sql) == num_limits
+
+        with mock.patch.object(
+            pghistory.models.EventsQueryCompiler, "_get_pushdown", return_value=([], [], None)
+        ):
+            expected = list(qs.values_list("pgh_slug", "pgh_data", "pgh_diff"))
+
+        assert list(qs.values_list("pgh_slug", "pgh_data", "pgh_diff")) == expected
+        assert expected
+
+
+@pytest.mark.django_db
+def test_events_lazy_data_and_diff(django_assert_num_queries):
+    """
+    Verifies pgh_data and pgh_diff are only computed when the query uses them
+    """
+    sm = ddf.G(test_models.SnapshotModel, int_field=1)
+    sm.int_field = 2
+    sm.save()
+
+    events = pghistory.models.Events.objects.across("tests.SnapshotModelSnapshot").tracks(sm)
+    for qs, data, diff in [
+        (events.values("pgh_label"), False, False),
+        (events.filter(pgh_data__int_field=2).values("pgh_label"), True, False),
+        (events.values("pgh_diff"), False, True),
+        (events.all(), True, True),
+        (events.defer("pgh_data"), False, True),
+        (events.only("pgh_label"), False, False),
+        (events.order_by("-pgh_diff").values("pgh_label"), False, True),
+        (events.annotate(pgh_data_label=F("pgh_label")).values("pgh_data_label"), False, False),
+        (
+            events.filter(
+                Exists(
+                    test_models.SnapshotModelSnapshot.objects.filter(
+                        int_field=OuterRef("pgh_data__int_field")
+                    )
+                )
+            ).values("pgh_label"),
+            True,
+            False,
+        ),
+        # Raw SQL can reference any field
+        (events.extra(select={"one": "1"}).values("pgh_label"), True, True),
+    ]:
+        sql, _ = qs.query.sql_with_params()
+        assert ("JSONB_EACH(_pgh_obj_event._curr_data::JSONB)" in sql) == (data or diff)
+        assert ("row_to_json(_event)" in sql) == (data or diff)
+        assert ("LEFT JOIN LATERAL" in sql) == diff
+
+    with django_assert_num_queries(1) as queries:
+        assert events.count() == 2
+
+    assert "JSONB_EACH" not in queries[0]["sql"]
+    assert "row_to_json" not in queries[0]["sql"]
+    assert list(events.order_by("pgh_id").values_list("pgh_label", "pgh_diff")) == [
+        ("snapshot_insert", None),
+        ("snapshot_update", {"int_field": [1, 2]}),
+    ]
+
+
+@pytest.mark.django_db
+def test_events_stored_diff():
+    """
+    Verifies diffs stored when events are created match the ones computed by Events
+    """
+    obj = test_models.StoreDiffModel.objects.create(int_field=1, char_field="a")
+    obj.char_field = "b"
+    obj.save()
+    obj.int_field = 2
+    obj.save()
+    obj.char_field = "c"
+    pghistory.create_event(obj, label="manual")
+    pghistory.create_event(obj, label="unstored_manual")
+    other = test_models.StoreDiffModel.objects.create(int_field=10, char_field="z")
+
+    stored = list(
+        test_models.StoreDiffModelEvent.objects.order_by("pgh_id").values_list(
+            "pgh_label", "pgh_diff"
+        )
+    )
+    assert stored == [
+        ("insert", None),
+        ("update", {"char_field": ["a", "b"]}),
+        ("int_field_updated", {"int_field": [1, 2]}),
+        ("update", None),
+        ("manual", {"char_field": ["b", "c"]}),
+        ("insert", None),
+    ]
+
+    # The diffs are read from the event table and match the computed ones
+    events = pghistory.models.Events.objects.tracks(obj, other).order_by("pgh_model", "pgh_id")
+    stored_events = events.across(test_models.StoreDiffModelEvent)
+    sql, _ = stored_events.query.sql_with_params()
+    assert "LATERAL" not in sql
+    assert "_pgh_obj_event.pgh_diff" in sql
+    assert list(stored_events.values_list("pgh_diff", flat=True)) == [diff for _, diff in stored]
+    assert list(
+        events.across(test_models.StoreDiffModelUnstoredEvent).values_list("pgh_diff", flat=True)
+    ) == [diff for _, diff in stored]
+    assert [event.pgh_data["char_field"] for event in stored_events] == [
+        "a",
+        "b",
+        "b",
+        "b",
+        "c",
+        "z",
+    ]
+
+    with pytest.raises(ValueError, match="obj_field"):
+        pghistory.create_event_model(test_models.StoreDiffModel, obj_field=None, store_diff=True)
+
+
+@pytest.mark.django_db
+def test_events_stored_changes():
+    """
+    Verifies event models that only store changed fields can be reconstructed
+    """
+    user = ddf.G("auth.User")
+    obj = test_models.StoreChangesModel.objects.create(int_field=1, char_field="a")
+    obj.char_field = "b"
+    obj.save()
+    obj.int_field = 2
+    obj.fk_field = user
+    obj.save()
+    obj.char_field = "c"
+    obj.save()
+    obj.fk_field = None
+    pghistory.create_event(obj, label="manual")
+    pghistory.create_event(obj, label="unstored_manual")
+    other = test_models.StoreChangesModel.objects.create(int_field=10, char_field="z")
+
+    # Every third event of an object stores all fields
+    stored = list(
+        test_models.StoreChangesModelEvent.objects.order_by("pgh_id").values_list(
+            "pgh_changed", "id", "int_field", "char_field", "fk_field"
+        )
+    )
+    assert stored == [
+        (None, obj.id, 1, "a", None),
+        (["char_field"], None, None, "b", None),
+        (["fk_field_id", "int_field"], None, 2, None, user.id),
+        (None, obj.id, 2, "c", user.id),
+        (["fk_field_id"], None, None, None, None),
+        (None, other.id, 10, "z", None),
+    ]
+
+    # Events reconstructs data and diffs the same way as when every field is stored
+    events = pghistory.models.Events.objects.tracks(obj, other).order_by("pgh_id")
+    changes_events = events.across(test_models.StoreChangesModelEvent)
+    unstored_events = events.across(test_models.StoreChangesModelUnstoredEvent)
+    assert list(changes_events.values_list("pgh_data", "pgh_diff")) == list(
+        unstored_events.values_list("pgh_data", "pgh_diff")
+    )
+    assert changes_events.values_list("pgh_diff", flat=True)[4] == {"fk_field_id": [user.id, None]}
+
+    # Events are reconstructed for reverting
+    reconstructed = [
+        (event.id, event.int_field, event.char_field, event.fk_field_id)
+        for event in (
+            event.reconstruct()
+            for event in test_models.StoreChangesModelEvent.objects.order_by("pgh_id")
+        )
+    ]
+    assert reconstructed == [
+        (obj.id, 1, "a", None),
+        (obj.id, 1, "b", None),
+        (obj.id, 2, "b", user.id),
+        (obj.id, 2, "c", user.id),
+        (obj.id, 2, "c", None),
+        (other.id, 10, "z", None),
+    ]
+
+    event = test_models.StoreChangesModelEvent.objects.get(pgh_changed=["char_field"])
+    assert event.revert().char_field == "b"
+    obj.refresh_from_db()
+    assert (obj.int_field, obj.char_field, obj.fk_field) == (1, "b", None)
+
+    with pytest.raises(ValueError, match="obj_field"):
+        pghistory.create_event_model(
+            test_models.StoreChangesModel, obj_field=None, store_changes=3
+        )
+
+    with pytest.raises(ValueError, match="changes and diffs"):
+        pghistory.create_event_model(
+            test_models.StoreChangesModel, store_changes=3, store_diff=True
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_as_of(django_assert_num_queries):
+    """
+    Verifies tracked objects are reconstructed at a point in time
+    """
+    d1, d2, d3, d4 = (dt.datetime(2020, 1, day, tzinfo=dt.timezone.utc) for day in range(1, 5))
+    obj1 = test_models.EventModel.objects.create(dt_field=d1, int_field=1)
+    obj2 = test_models.EventModel.objects.create(dt_field=d1, int_field=5)
+    obj2_id = obj2.id
+    event_model = test_models.EventModel.pgh_event_models["model.create"]
+    created_at = event_model.objects.get(pgh_obj=obj2, pgh_label="model.create").pgh_created_at
+
+    obj1.dt_field = d2
+    obj1.int_field = 2
+    obj1.save()
+    obj2.delete()
+    with pghistory.context() as ctx:
+        obj1.dt_field = d3
+        obj1.int_field = 3
+        obj1.save()
+    obj1.dt_field = d4
+    obj1.save()
+
+    def as_of(qs):
+        return [(obj.__class__, obj.id, obj.dt_field, obj.int_field) for obj in qs]
+
+    with django_assert_num_queries(1):
+        assert as_of(event_model.objects.as_of(created_at)) == [
+            (test_models.EventModel, obj1.id, d1, 1),
+            (test_models.EventModel, obj2_id, d1, 5),
+        ]
+
+    # Deleted objects are excluded and updates use the new row
+    objs = list(event_model.objects.as_of(dt.datetime.now(dt.timezone.utc)))
+    assert as_of(objs) == [(test_models.EventModel, obj1.id, d4, 3)]
+    assert not objs[0]._state.adding
+    assert as_of(event_model.objects.as_of(context_id=ctx.id)) == [
+        (test_models.EventModel, obj1.id, d3, 3)
+    ]
+    custom_objs = test_models.CustomEventModel.objects.as_of(context_id=ctx.id)
+    assert {obj.dt_field for obj in custom_objs} == {d1}
+    assert as_of(event_model.objects.filter(pgh_obj_id=obj2_id).as_of(created_at)) == [
+        (test_models.EventModel, obj2_id, d1, 5)
+    ]
+
+    # Fields are reconstructed for event models that only store changes
+    changes_obj = test_models.StoreChangesModel.objects.create(int_field=1, char_field="a")
+    changes_obj.char_field = "b"
+    changes_obj.save()
+    with django_assert_num_queries(1):
+        objs = list(
+            test_models.StoreChangesModelEvent.objects.as_of(dt.datetime.now(dt.timezone.utc))
+        )
+    assert [(obj.id, obj.int_field, obj.char_field) for obj in objs] == [(changes_obj.id, 1, "b")]
+
+    with pytest.raises(ValueError, match="either"):
+        event_model.objects.as_of()
+
+    with pytest.raises(ValueError, match="pgh_obj"):
+        test_models.EventModel.pgh_event_models["no_pgh_obj_manual_event"].objects.as_of(
+            created_at
+        )
+
+
 @pytest.mark.django_db(transaction=True)
 def test_events_multiple_references(django_assert_num_queries, mocker):
     """
@@ -496,6 +928,135 @@ def test_events_references_custom_pk(mocker):
     ]
 
 
+@pytest.mark.django_db
+def test_events_references_and_tracks_params(django_assert_num_queries):
+    """
+    Verify querysets passed to references() and tracks() are filtered with
+    subqueries and lists of objects with a single array parameter
+    """
+    cm1 = ddf.G(test_models.CustomModel, int_field=1)
+    cm2 = ddf.G(test_models.CustomModel, int_field=2)
+    ddf.G(test_models.CustomModel, int_field=3)
+    events = pghistory.models.Events.objects.across("tests.CustomModelSnapshot")
+
+    for method in ("references", "tracks"):
+        qs = test_models.CustomModel.objects.filter(int_field__lte=2)
+        with django_assert_num_queries(1) as queries:
+            assert set(getattr(events, method)(qs).values_list("pgh_obj_id", flat=True)) == {
+                str(cm1.pk),
+                str(cm2.pk),
+            }
+
+        assert 'IN (SELECT "tests_custommodel"."my_pk"' in queries[0]["sql"]
+        assert qs._result_cache is None
+
+    for filtered in (events.references(cm1, cm2), events.tracks([cm1, cm2])):
+        sql, params = filtered.query.sql_with_params()
+        assert "= ANY(%s)" in sql
+        assert [cm1.pk, cm2.pk] in list(params)
+        assert set(filtered.values_list("pgh_obj_id", flat=True)) == {str(cm1.pk), str(cm2.pk)}
+
+
+@pytest.mark.django_db
+def test_events_extra_field_deprecation():
+    """
+    Verify extra fields of aggregate event models are deprecated when the
+    model is prepared instead of when queries are compiled
+    """
+    with pytest.warns(DeprecationWarning, match="extra field 'tests.CustomEvents.user'"):
+        test_models.CustomEvents.pghistory_setup()
+
+    pghistory.models.EventsQueryCompiler._get_select_sql.cache_clear()
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        list(test_models.CustomEvents.objects.values_list("user", flat=True))
+        pghistory.models.MiddlewareEvents.pghistory_setup()
+
+
+@pytest.mark.django_db
+def test_events_cte_cached():
+    """
+    Verify the SQL of the aggregate event CTE is cached across queries that
+    only differ by values
+    """
+    cm1 = ddf.G(test_models.CustomModel, int_field=1)
+    cm2 = ddf.G(test_models.CustomModel, int_field=2)
+    events = pghistory.models.Events.objects.order_by("-pgh_created_at")
+    get_select_sql = pghistory.models.EventsQueryCompiler._get_select_sql
+    get_select_sql.cache_clear()
+
+    sql1, params1 = events.tracks(cm1).filter(pgh_label="insert")[:10].query.sql_with_params()
+    num_branches = get_select_sql.cache_info().misses
+    sql2, params2 = events.tracks(cm2).filter(pgh_label="update")[:10].query.sql_with_params()
+
+    assert num_branches == 2
+    assert sql1 == sql2
+    assert params1 != params2
+    assert get_select_sql.cache_info().hits == num_branches
+    assert get_select_sql.cache_info().misses == num_branches
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("descending", [False, True])
+def test_events_after(descending):
+    """
+    Verify keyset pagination of Events and event models returns every event once
+    """
+    for i in range(3):
+        sm = ddf.G(test_models.SnapshotModel, int_field=i)
+        sm.int_field += 10
+        sm.save()
+        ddf.G(test_models.CustomModel, int_field=i)
+
+    direction = "-" if descending else ""
+    events = pghistory.models.Events.objects.across(
+        "tests.SnapshotModelSnapshot",
+        "tests.CustomModelSnapshot",
+        "tests.SnapshotModelDtFieldEvent",
+    )
+    expected = list(
+        events.order_by(
+            f"{direction}pgh_created_at", f"{direction}pgh_model", f"{direction}pgh_id"
+        ).values_list("pgh_slug", "pgh_diff")
+    )
+    assert len(expected) == 12
+
+    paginated, cursor = [], None
+    while page := list(events.after(cursor, descending=descending)[:5]):
+        paginated.extend((event.pgh_slug, event.pgh_diff) for event in page)
+        cursor = page[-1]
+        if len(paginated) == 5:
+            # Tuples can also be used as cursors
+            cursor = (cursor.pgh_created_at, cursor.pgh_model, cursor.pgh_id)
+
+    assert paginated == expected
+
+    sql, _ = events.after(cursor, descending=descending)[:5].query.sql_with_params()
+    assert _count_limits(sql) == 4
+
+    event_model = test_models.SnapshotModel.pgh_event_models["snapshot_update"]
+    expected = list(
+        event_model.objects.order_by(f"{direction}pgh_created_at", f"{direction}pgh_id")
+    )
+    paginated, cursor = [], None
+    while page := list(event_model.objects.after(cursor, descending=descending)[:2]):
+        paginated.extend(page)
+        cursor = page[-1]
+
+    assert paginated == expected
+    assert (
+        list(
+            event_model.objects.after(
+                (cursor.pgh_created_at, cursor.pgh_id), descending=descending
+            )
+        )
+        == []
+    )
+
+    with pytest.raises(ValueError, match="Cursor must be a tuple"):
+        event_model.objects.after((cursor.pgh_created_at,))
+
+
 @pytest.mark.django_db
 def test_events_usage():
     """Verifies the Events queryset is used properly"""
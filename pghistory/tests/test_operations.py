@@ -0,0 +1,37 @@
+import pytest
+from django.db import connection
+from django.db.migrations.state import ProjectState
+
+from pghistory.operations import InstallAttachContextFunc
+
+
+def _get_attach_context_func():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_get_functiondef('_pgh_attach_context'::regproc)")
+        return cursor.fetchone()[0]
+
+
+def test_install_attach_context_func_deconstruct():
+    operation = InstallAttachContextFunc("session")
+    assert operation.deconstruct() == ("InstallAttachContextFunc", ("session",), {})
+    assert operation.describe() == 'Install _pgh_attach_context() with the "session" cache'
+    assert operation.migration_name_fragment == "install_attach_context_func"
+    assert InstallAttachContextFunc().describe() == (
+        'Install _pgh_attach_context() with the "default" cache'
+    )
+
+
+@pytest.mark.django_db
+def test_install_attach_context_func():
+    """Verify the operation installs the function with the cache and reverses it"""
+    operation = InstallAttachContextFunc("session")
+    state = ProjectState()
+    operation.state_forwards("tests", state)
+
+    with connection.schema_editor() as schema_editor:
+        operation.database_forwards("tests", schema_editor, state, state)
+    assert "pghistory.written_context" in _get_attach_context_func()
+
+    with connection.schema_editor() as schema_editor:
+        operation.database_backwards("tests", schema_editor, state, state)
+    assert "pghistory.attached_context" in _get_attach_context_func()
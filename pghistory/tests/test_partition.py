@@ -0,0 +1,179 @@
+import datetime as dt
+import types
+
+import ddf
+import pgtrigger
+import pytest
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.utils import InternalError
+
+import pghistory
+from pghistory import partition
+from pghistory.tests import models as test_models
+
+
+def _get_partition_table(event):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT tableoid::regclass::TEXT FROM tests_partitionmodelevent WHERE pgh_id = %s",
+            [event.pgh_id],
+        )
+        return cursor.fetchone()[0]
+
+
+def _table_exists(table):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [table])
+        return cursor.fetchone()[0]
+
+
+@pytest.mark.parametrize(
+    "interval, truncated, shifted",
+    [
+        ("day", dt.datetime(2030, 1, 15), dt.datetime(2030, 1, 13)),
+        ("week", dt.datetime(2030, 1, 14), dt.datetime(2029, 12, 31)),
+        ("month", dt.datetime(2030, 1, 1), dt.datetime(2029, 11, 1)),
+        ("year", dt.datetime(2030, 1, 1), dt.datetime(2028, 1, 1)),
+    ],
+)
+def test_truncate_and_shift(interval, truncated, shifted):
+    truncated = truncated.replace(tzinfo=dt.timezone.utc)
+    shifted = shifted.replace(tzinfo=dt.timezone.utc)
+    now = dt.datetime(2030, 1, 15, 12, 30, tzinfo=dt.timezone.utc)
+
+    assert partition._truncate(now, interval) == truncated
+    assert partition._shift(truncated, interval, -2) == shifted
+    assert partition._shift(shifted, interval, 2) == truncated
+
+
+def test_get_partition_name():
+    lower = dt.datetime(2030, 1, 1, tzinfo=dt.timezone.utc)
+    model = types.SimpleNamespace(
+        _meta=types.SimpleNamespace(db_table="events", pgh_partition={"interval": "day"})
+    )
+    assert partition._get_partition_name(model, lower, connection) == "events_p20300101"
+    assert partition._get_partition_name(model, None, connection) == "events_default"
+
+    # Long names are truncated with a hash of the table name
+    model._meta.db_table = "e" * 63
+    name = partition._get_partition_name(model, lower, connection)
+    assert len(name) == 63
+    assert name.endswith("_p20300101")
+
+
+def test_invalid_partition_interval():
+    with pytest.raises(ValueError, match="partition_interval must be"):
+        pghistory.create_event_model(
+            test_models.PartitionModel, partition_by="pgh_created_at", partition_interval="hour"
+        )
+
+
+@pytest.mark.parametrize(
+    "partition_by, kwargs, match",
+    [
+        ("created", {}, 'field "created" does not exist'),
+        ("int_field", {}, 'field "int_field" must be a non-nullable DateField'),
+        # Fields of events that store changes are nullable
+        ("dt_field", {"store_changes": 2}, 'field "dt_field" must be a non-nullable DateField'),
+    ],
+)
+def test_invalid_partition_by(partition_by, kwargs, match):
+    with pytest.raises(ValueError, match=match):
+        pghistory.create_event_model(
+            test_models.SnapshotModel,
+            partition_by=partition_by,
+            model_name="InvalidPartitionEvent",
+            **kwargs,
+        )
+
+
+@pytest.mark.django_db
+def test_partitioned_event_table():
+    """Verify partitioned event tables are created with the upcoming partitions"""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE relname = 'tests_partitionmodelevent'")
+        assert cursor.fetchone()[0] == "p"
+
+    obj = ddf.G(test_models.PartitionModel, int_field=1)
+    obj.int_field = 2
+    obj.save()
+
+    event = obj.events.order_by("pgh_id").last()
+    assert event.pgh_label == "update"
+    assert _get_partition_table(event) == partition._get_partition_name(
+        test_models.PartitionModelEvent,
+        partition._truncate(event.pgh_created_at, "month"),
+        connection,
+    )
+
+    # Triggers of the event model are used by the partitions
+    with pytest.raises(InternalError, match="Cannot update or delete"):
+        event.delete()
+
+
+@pytest.mark.django_db
+def test_create_and_detach_partitions(mocker):
+    """Verify upcoming partitions are created and old ones are detached"""
+    obj = ddf.G(test_models.PartitionModel, int_field=1)
+    event = obj.events.get()
+
+    # Events outside of the partitions are stored in the default partition
+    with pgtrigger.ignore("tests.PartitionModelEvent:append_only"):
+        test_models.PartitionModelEvent.objects.filter(pgh_id=event.pgh_id).update(
+            pgh_created_at=dt.datetime(2030, 1, 20, tzinfo=dt.timezone.utc)
+        )
+    assert _get_partition_table(event) == "tests_partitionmodelevent_default"
+
+    mocker.patch(
+        "django.utils.timezone.now",
+        return_value=dt.datetime(2030, 1, 15, tzinfo=dt.timezone.utc),
+    )
+    assert pghistory.create_partitions(premake=1) == [
+        "tests_partitionmodelevent_p203001",
+        "tests_partitionmodelevent_p203002",
+    ]
+    assert pghistory.create_partitions(test_models.PartitionModelEvent, premake=1) == []
+
+    # Events in the default partition are moved and are still protected
+    assert _get_partition_table(event) == "tests_partitionmodelevent_p203001"
+    with pytest.raises(InternalError, match="Cannot update or delete"), transaction.atomic():
+        test_models.PartitionModelEvent.objects.filter(pgh_id=event.pgh_id).delete()
+
+    detached = pghistory.detach_partitions(before=dt.datetime(2030, 1, 1, tzinfo=dt.timezone.utc))
+    assert detached
+    assert "tests_partitionmodelevent_p203001" not in detached
+    assert all(_table_exists(name) for name in detached)
+
+    assert pghistory.detach_partitions(
+        before=dt.datetime(2030, 2, 1, tzinfo=dt.timezone.utc), drop=True
+    ) == ["tests_partitionmodelevent_p203001"]
+    assert not _table_exists("tests_partitionmodelevent_p203001")
+    assert not test_models.PartitionModelEvent.objects.exists()
+    assert _table_exists("tests_partitionmodelevent_default")
+
+
+@pytest.mark.django_db
+def test_pghistory_partition_command(mocker, capsys):
+    mocker.patch(
+        "django.utils.timezone.now",
+        return_value=dt.datetime(2030, 3, 15, tzinfo=dt.timezone.utc),
+    )
+    call_command("pghistory_partition", "tests.PartitionModelEvent", "--premake=0")
+    assert capsys.readouterr().out == "Created tests_partitionmodelevent_p203003\n"
+
+    call_command("pghistory_partition", "--premake=1", "--retain=0")
+    out = capsys.readouterr().out
+    assert "Created tests_partitionmodelevent_p203004\n" in out
+    assert "Detached tests_partitionmodelevent_p203003\n" not in out
+    assert "Detached " in out
+
+    call_command("pghistory_partition", "--premake=1", "--retain=0", "--drop")
+    assert capsys.readouterr().out == ""
+
+    mocker.patch(
+        "django.utils.timezone.now",
+        return_value=dt.datetime(2030, 4, 15, tzinfo=dt.timezone.utc),
+    )
+    call_command("pghistory_partition", "--premake=0", "--retain=0", "--drop")
+    assert capsys.readouterr().out == "Dropped tests_partitionmodelevent_p203003\n"
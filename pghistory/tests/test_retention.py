@@ -0,0 +1,237 @@
+import datetime as dt
+import re
+
+import ddf
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+import pghistory
+from pghistory import retention
+from pghistory.models import Context
+from pghistory.tests import models as test_models
+
+
+def _make_events(model, num_updates, **kwargs):
+    obj = ddf.G(model, int_field=0, **kwargs)
+    for i in range(num_updates):
+        obj.int_field = i + 1
+        obj.save()
+
+    return obj
+
+
+@pytest.mark.django_db
+def test_prune_age():
+    obj = _make_events(test_models.SnapshotModel, 2)
+    other = _make_events(test_models.SnapshotModel, 0)
+    assert obj.snapshot.count() == 3
+
+    assert pghistory.prune(test_models.SnapshotModelSnapshot, age=dt.timedelta(days=1)) == {
+        test_models.SnapshotModelSnapshot: 0
+    }
+
+    # The latest event of each object is kept
+    assert pghistory.prune(
+        test_models.SnapshotModelSnapshot, age=dt.timedelta(0), batch_size=1
+    ) == {test_models.SnapshotModelSnapshot: 2}
+    assert list(obj.snapshot.values_list("int_field", flat=True)) == [2]
+    assert other.snapshot.count() == 1
+
+    assert pghistory.prune(
+        test_models.SnapshotModelSnapshot, age=dt.timedelta(0), keep_latest=False
+    ) == {test_models.SnapshotModelSnapshot: 2}
+    assert not test_models.SnapshotModelSnapshot.objects.exists()
+
+
+@pytest.mark.django_db
+def test_prune_max_events():
+    obj = _make_events(test_models.SnapshotModel, 4)
+    other = _make_events(test_models.SnapshotModel, 1)
+
+    assert pghistory.prune(test_models.SnapshotModelSnapshot, max_events=2, batch_size=2) == {
+        test_models.SnapshotModelSnapshot: 3
+    }
+    assert list(obj.snapshot.order_by("pgh_id").values_list("int_field", flat=True)) == [3, 4]
+    assert other.snapshot.count() == 2
+
+    with pytest.raises(ValueError, match="at least 1"):
+        pghistory.prune(test_models.SnapshotModelSnapshot, max_events=0)
+
+    with pytest.raises(ValueError, match="obj_field to prune"):
+        pghistory.prune(test_models.NoPghObjSnapshot, max_events=1)
+
+
+@pytest.mark.django_db
+def test_prune_append_only():
+    """Verify the append-only trigger is ignored when pruning"""
+    obj = _make_events(test_models.PartitionModel, 2)
+
+    assert pghistory.prune(test_models.PartitionModelEvent, max_events=1) == {
+        test_models.PartitionModelEvent: 2
+    }
+    assert list(obj.events.values_list("int_field", flat=True)) == [2]
+
+
+@pytest.mark.django_db
+def test_prune_stored_changes():
+    """Verify events needed to reconstruct kept events aren't pruned"""
+    obj = test_models.StoreChangesModel.objects.create(int_field=0, char_field="a")
+    for i in range(6):
+        obj.int_field = i + 1
+        obj.save()
+
+    events = test_models.StoreChangesModelEvent.objects.order_by("pgh_id")
+    assert [event.pgh_changed is None for event in events] == [
+        True,
+        False,
+        False,
+        True,
+        False,
+        False,
+        True,
+    ]
+    reconstructed = [event.reconstruct().int_field for event in events]
+
+    # The latest three events depend on the fourth event, which stores all fields
+    assert pghistory.prune(test_models.StoreChangesModelEvent, max_events=3) == {
+        test_models.StoreChangesModelEvent: 3
+    }
+    assert [event.reconstruct().int_field for event in events.all()] == reconstructed[3:]
+
+    assert pghistory.prune(test_models.StoreChangesModelEvent, max_events=1) == {
+        test_models.StoreChangesModelEvent: 3
+    }
+    assert [event.reconstruct().int_field for event in events.all()] == [6]
+
+
+@pytest.mark.django_db
+def test_prune_settings(settings):
+    _make_events(test_models.SnapshotModel, 2)
+
+    with pytest.raises(ValueError, match="Supply an age"):
+        settings.PGHISTORY_RETENTION = {"tests.SnapshotModelSnapshot": {}}
+        pghistory.prune()
+
+    settings.PGHISTORY_RETENTION = {
+        "tests.SnapshotModelSnapshot": {"age": dt.timedelta(0), "keep_latest": False}
+    }
+    assert pghistory.prune(test_models.SnapshotModelSnapshot, test_models.EventModelEvent) == {
+        test_models.SnapshotModelSnapshot: 3
+    }
+
+
+@pytest.mark.django_db
+def test_prune_contexts():
+    with pghistory.context(key="value"):
+        _make_events(test_models.PartitionModel, 0)
+    with pghistory.context(key="other"):
+        _make_events(test_models.SnapshotModel, 0)
+
+    assert Context.objects.count() == 2
+    assert pghistory.prune_contexts(min_age=dt.timedelta(0)) == 0
+
+    pghistory.prune(test_models.PartitionModelEvent, age=dt.timedelta(0), keep_latest=False)
+
+    # Recently updated contexts are kept
+    assert pghistory.prune_contexts() == 0
+    assert pghistory.prune_contexts(min_age=dt.timedelta(0), batch_size=1) == 1
+    assert list(Context.objects.values_list("metadata", flat=True)) == [{"key": "other"}]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_prune_contexts_session_cache():
+    """Verify contexts cached by the session are written again after they're pruned"""
+    Context.install_pgh_attach_context_func(cache="session")
+    try:
+        with pghistory.context(key="value"):
+            _make_events(test_models.PartitionModel, 0)
+            pghistory.prune(
+                test_models.PartitionModelEvent, age=dt.timedelta(0), keep_latest=False
+            )
+            assert pghistory.prune_contexts(min_age=dt.timedelta(0)) == 1
+            assert not Context.objects.exists()
+
+            obj = _make_events(test_models.PartitionModel, 0)
+
+        assert obj.events.get().pgh_context.metadata == {"key": "value"}
+    finally:
+        Context.install_pgh_attach_context_func()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_prune_contexts_locked():
+    """Verify contexts locked by other transactions are skipped and others are
+    locked before they are deleted by a second statement"""
+    with pghistory.context(key="value") as context:
+        _make_events(test_models.PartitionModel, 0)
+    pghistory.prune(test_models.PartitionModelEvent, age=dt.timedelta(0), keep_latest=False)
+
+    other = connection.get_new_connection(connection.get_connection_params())
+    try:
+        with other.cursor() as cursor:
+            cursor.execute(
+                f"SELECT FROM {Context._meta.db_table} WHERE id = %s FOR KEY SHARE",
+                [str(context.id)],
+            )
+            assert pghistory.prune_contexts(min_age=dt.timedelta(0)) == 0
+
+        other.commit()
+    finally:
+        other.close()
+
+    with CaptureQueriesContext(connection) as queries:
+        assert pghistory.prune_contexts(min_age=dt.timedelta(0)) == 1
+
+    lock_sql, delete_sql = [query["sql"] for query in queries if "ANY" in query["sql"]]
+    assert "FOR UPDATE SKIP LOCKED" in lock_sql
+    assert delete_sql.startswith("DELETE") and "FOR UPDATE" not in delete_sql
+
+
+@pytest.mark.django_db
+def test_prune_contexts_progress():
+    for i in range(3):
+        with pghistory.context(key=i):
+            _make_events(test_models.PartitionModel, 0)
+
+    pghistory.prune(test_models.PartitionModelEvent, age=dt.timedelta(0), keep_latest=False)
+    assert list(
+        retention._prune_contexts(min_age=dt.timedelta(0), batch_size=2, using="default")
+    ) == [(2, 2), (1, 1)]
+
+
+@pytest.mark.django_db
+def test_pghistory_prune_command(settings, capsys):
+    _make_events(test_models.SnapshotModel, 2)
+    with pghistory.context(key="value"):
+        _make_events(test_models.PartitionModel, 0)
+
+    call_command("pghistory_prune", "tests.SnapshotModelSnapshot", "--age=0")
+    out = capsys.readouterr().out
+    assert re.match(r"Pruned 2 events from tests.SnapshotModelSnapshot in .*s \(\d+/s\)\n$", out)
+
+    call_command(
+        "pghistory_prune",
+        "--max-events=1",
+        "--no-keep-latest",
+        "--contexts",
+        "--contexts-min-age=0",
+    )
+    out = capsys.readouterr().out
+    assert "Pruned 0 events from tests.SnapshotModelSnapshot" in out
+    assert "Pruned 0 events from tests.PartitionModelEvent" in out
+    assert "Pruned 0 contexts from pghistory.Context" in out
+
+    settings.PGHISTORY_RETENTION = {
+        "tests.PartitionModelEvent": {"age": dt.timedelta(0), "keep_latest": False}
+    }
+    call_command("pghistory_prune", "--contexts")
+    out = capsys.readouterr().out.splitlines()
+    assert out[0].startswith("Pruned 1 events from tests.PartitionModelEvent")
+    assert out[1].startswith("Pruned 0 contexts from pghistory.Context")
+
+    call_command("pghistory_prune", "--contexts", "--contexts-min-age=0", "--verbosity=2")
+    out = capsys.readouterr().out.splitlines()
+    assert out[1] == "Scanned 1 contexts, pruned 1"
+    assert out[2].startswith("Pruned 1 contexts from pghistory.Context")
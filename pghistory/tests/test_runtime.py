@@ -1,7 +1,16 @@
+import contextlib
+import os
+import time
+
 import pytest
-from django.db import connection
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
+import pghistory.config
+import pghistory.models
 import pghistory.runtime
+import pghistory.tests.models as test_models
 import pghistory.utils
 
 
@@ -37,12 +46,154 @@ import pghistory.utils
         ("SET search_path = public", False),
         (b"SET TRANSACTION ISOLATION LEVEL REPEATABLE READ", True),
         (b"SELECT * FROM table", True),
+        ("", False),
+        (None, False),
+        ("  \n\t select 1", True),
+        ("/* comment */ SELECT 1", True),
+        ("-- comment\nSELECT 1", True),
+        ("-- comment\n/* multi\nline */\n  UPDATE table SET col = 1", False),
+        (b"/* comment */ select 1", True),
+        ("/* unterminated comment", False),
+        ("withdraw", False),
+        ("WITH a AS (SELECT 1) SELECT * FROM a", True),
+        ("with recursive a(n) as (select 1 union all select n + 1 from a) select n from a", True),
+        ("WITH a AS MATERIALIZED (SELECT ')' AS b), c AS (SELECT 1) SELECT * FROM a", True),
+        ('WITH "update" AS (SELECT 1 AS "(") SELECT * FROM "update"', True),
+        ("WITH a AS (SELECT $$ ) insert $$) SELECT * FROM a", True),
+        ("WITH a AS (SELECT 1) INSERT INTO t SELECT * FROM a", False),
+        ("WITH a AS (SELECT 1) UPDATE t SET col = 1", False),
+        ("WITH a AS (SELECT 1) DELETE FROM t", False),
+        ("WITH a AS (UPDATE t SET col = 1 RETURNING *) SELECT * FROM a", False),
+        ("WITH a AS (SELECT 1), b AS (\n  DELETE FROM t RETURNING *) SELECT * FROM a", False),
+        ("WITH a AS (SELECT 'unterminated", False),
+        ("WITH a AS (SELECT 1)) SELECT 1", False),
+        ("WITH a AS (SELECT 1)", False),
+        (b"WITH a AS (SELECT 1) SELECT * FROM a", True),
+        (b"WITH a AS (SELECT 1) INSERT INTO t SELECT * FROM a", False),
+        ("WITH a AS (SELECT " + "1, " * 5000 + "1) SELECT * FROM a", False),
     ],
 )
 def test_is_ignored_statement(statement, expected):
     assert pghistory.runtime._is_ignored_statement(statement) == expected
 
 
+class _TrackedSQL(str):
+    """A statement that records the slices taken from it and fails if it's copied whole"""
+
+    def __new__(cls, value):
+        sql = super().__new__(cls, value)
+        sql.slices = []
+        return sql
+
+    def __getitem__(self, key):
+        self.slices.append(key)
+        return super().__getitem__(key)
+
+    def lower(self):
+        raise AssertionError("The whole statement was lowercased")
+
+    def strip(self, *args):
+        raise AssertionError("The whole statement was stripped")
+
+
+class _TrackedBytesSQL(bytes):
+    """A bytes statement that records the slices taken from it and fails if it's decoded whole"""
+
+    def __new__(cls, value):
+        sql = super().__new__(cls, value)
+        sql.slices = []
+        return sql
+
+    def __getitem__(self, key):
+        self.slices.append(key)
+        return super().__getitem__(key)
+
+    def decode(self, *args, **kwargs):
+        raise AssertionError("The whole statement was decoded")
+
+
+_BULK_INSERT = (
+    'INSERT INTO "tests_eventmodel" ("dt_field", "int_field") VALUES '
+    + ", ".join(["('2024-01-01T00:00:00+00:00'::timestamptz, %s)"] * 5_000)
+    + ' RETURNING "tests_eventmodel"."id"'
+)
+_LARGE_SELECT = (
+    'SELECT "tests_eventmodel"."id" FROM "tests_eventmodel" WHERE "tests_eventmodel"."id" IN ('
+    + ", ".join(["%s"] * 5_000)
+    + ")"
+)
+
+
+@pytest.mark.parametrize(
+    "statement, expected",
+    [
+        (_BULK_INSERT, False),
+        (_LARGE_SELECT, True),
+        ("WITH a AS (SELECT 1) " + _LARGE_SELECT, True),
+        ("WITH a AS (SELECT 1) " + _BULK_INSERT, False),
+        # The main statement is past the CTE prefix, so the statement isn't ignored
+        ("WITH a AS (" + _LARGE_SELECT + ") SELECT * FROM a", False),
+        ("/* " + "x" * 300 + " */ SELECT 1", False),
+    ],
+)
+@pytest.mark.parametrize("tracked_cls", [_TrackedSQL, _TrackedBytesSQL])
+def test_is_ignored_statement_bounded_prefix(statement, expected, tracked_cls):
+    """
+    Verify large statements are classified from a bounded prefix without
+    copying, lowercasing, or decoding the whole statement
+    """
+    sql = tracked_cls(statement if tracked_cls is _TrackedSQL else statement.encode())
+
+    assert pghistory.runtime._is_ignored_statement(sql) == expected
+    assert sql.slices
+    assert all(
+        key.start is None
+        and key.stop in (pghistory.runtime.SQL_HEAD_LENGTH, pghistory.runtime.SQL_CTE_HEAD_LENGTH)
+        for key in sql.slices
+    )
+
+
+@pytest.mark.skipif(
+    not os.environ.get("PGHISTORY_BENCHMARK"), reason="Set PGHISTORY_BENCHMARK=1 to run benchmarks"
+)
+def test_is_ignored_statement_benchmark():
+    """
+    Benchmarks the statement classifier over typical Django SQL against
+    a classifier that lowercases and decodes the entire statement
+    """
+
+    def _legacy_is_ignored_statement(sql):
+        sql = sql.strip().lower() if sql else ""
+        sql = sql.decode() if isinstance(sql, bytes) else sql
+        return sql.startswith(pghistory.runtime.IGNORED_SQL_PREFIXES)
+
+    bulk_insert = _BULK_INSERT * 10
+    corpus = [
+        'SELECT "tests_eventmodel"."id", "tests_eventmodel"."dt_field" FROM "tests_eventmodel"'
+        ' WHERE "tests_eventmodel"."id" = %s LIMIT 21',
+        'UPDATE "tests_eventmodel" SET "dt_field" = %s, "int_field" = %s'
+        ' WHERE "tests_eventmodel"."id" = %s',
+        'DELETE FROM "tests_eventmodel" WHERE "tests_eventmodel"."id" IN (%s, %s, %s)',
+        'SAVEPOINT "s140_x1"',
+        'RELEASE SAVEPOINT "s140_x1"',
+        '/* controller=\'index\' */ SELECT 1 AS "a" FROM "auth_user" LIMIT 1',
+        "WITH a AS (SELECT 1) SELECT * FROM a",
+        bulk_insert,
+        bulk_insert.encode(),
+    ]
+
+    def _time(classifier):
+        start = time.perf_counter()
+        for _ in range(20):
+            for sql in corpus:
+                classifier(sql)
+        return time.perf_counter() - start
+
+    # The bulk insert dominates the legacy classifier. The bounded classifier
+    # only ever looks at the beginning of it
+    assert _time(pghistory.runtime._is_ignored_statement) < _time(_legacy_is_ignored_statement)
+
+
 @pytest.mark.skipif(
     pghistory.utils.psycopg_maj_version == 3, reason="Psycopg2 preserves entire query"
 )
@@ -65,3 +216,104 @@ def test_inject_history_context(settings, mocker, sql, params):
             cursor.execute(sql, params)
             query = connection.queries[-1]
             assert query["sql"].startswith(expected_sql)
+
+
+def _num_injections(queries):
+    return sum(
+        "set_config('pghistory.context_id'" in query["sql"] for query in queries.captured_queries
+    )
+
+
+@pytest.mark.django_db
+def test_inject_history_context_per_transaction(settings):
+    """Context is only injected once per transaction unless it changes"""
+    settings.PGHISTORY_CONTEXT_INJECTION = "transaction"
+
+    with pghistory.context(key="val") as ctx:
+        with CaptureQueriesContext(connection) as queries:
+            for i in range(3):
+                test_models.EventModel.objects.create(dt_field=timezone.now(), int_field=i)
+
+        assert _num_injections(queries) == 1
+
+        # Changing the metadata results in injecting the context again
+        with CaptureQueriesContext(connection) as queries:
+            with pghistory.context(key2="val2"):
+                test_models.EventModel.objects.create(dt_field=timezone.now(), int_field=3)
+                test_models.EventModel.objects.create(dt_field=timezone.now(), int_field=4)
+
+        assert _num_injections(queries) == 1
+
+        # Rolling back a savepoint may revert the context variables, so they
+        # are injected again
+        with CaptureQueriesContext(connection) as queries:
+            with contextlib.suppress(RuntimeError), transaction.atomic():
+                pghistory.context(key3="val3")
+                test_models.EventModel.objects.create(dt_field=timezone.now(), int_field=5)
+                raise RuntimeError
+
+            test_models.EventModel.objects.create(dt_field=timezone.now(), int_field=6)
+
+        assert _num_injections(queries) == 2
+
+    events = test_models.EventModel.pgh_event_models["model.create"].objects.order_by("pgh_id")
+    assert [event.int_field for event in events] == [0, 1, 2, 3, 4, 6]
+    assert {event.pgh_context_id for event in events} == {ctx.id}
+    assert pghistory.models.Context.objects.get().metadata == {
+        "key": "val",
+        "key2": "val2",
+        "key3": "val3",
+    }
+
+
+@pytest.mark.django_db(transaction=True)
+def test_inject_history_context_per_transaction_autocommit(settings):
+    """Every statement is its own transaction in autocommit mode"""
+    settings.PGHISTORY_CONTEXT_INJECTION = "transaction"
+
+    with pghistory.context(key="val") as ctx:
+        with CaptureQueriesContext(connection) as queries:
+            test_models.EventModel.objects.create(dt_field=timezone.now(), int_field=1)
+            test_models.EventModel.objects.create(dt_field=timezone.now(), int_field=2)
+
+            with transaction.atomic():
+                test_models.EventModel.objects.create(dt_field=timezone.now(), int_field=3)
+                test_models.EventModel.objects.create(dt_field=timezone.now(), int_field=4)
+
+            # A new transaction that starts with an ignored statement still
+            # gets the context
+            with transaction.atomic():
+                assert test_models.EventModel.objects.exists()
+                test_models.EventModel.objects.create(dt_field=timezone.now(), int_field=5)
+
+        assert _num_injections(queries) == 4
+
+    events = test_models.EventModel.pgh_event_models["model.create"].objects.all()
+    assert len(events) == 5
+    assert {event.pgh_context_id for event in events} == {ctx.id}
+
+
+@pytest.mark.django_db
+def test_serialized_metadata_cached(mocker):
+    """Metadata is only serialized again when it is updated"""
+    dumps = mocker.spy(pghistory.runtime.json, "dumps")
+    json_encoder = mocker.spy(pghistory.config, "json_encoder")
+
+    with pghistory.context(key="val") as ctx:
+        for i in range(3):
+            test_models.EventModel.objects.create(dt_field=timezone.now(), int_field=i)
+
+        assert dumps.call_count == 1
+        assert ctx.version == 0
+
+        pghistory.context(key2="val2")
+        assert ctx.version == 1
+        assert ctx.serialized_metadata == '{"key": "val", "key2": "val2"}'
+
+        for i in range(3):
+            test_models.EventModel.objects.create(dt_field=timezone.now(), int_field=i)
+
+        assert dumps.call_count == 2
+
+    assert json_encoder.call_count == 1
+    assert pghistory.models.Context.objects.get().metadata == {"key": "val", "key2": "val2"}
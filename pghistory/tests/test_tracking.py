@@ -1,9 +1,17 @@
+import asyncio
+import contextlib
+import io
+
 import ddf
 import pytest
-from django.db import connection
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 import pghistory.models
+import pghistory.runtime
 import pghistory.tests.models as test_models
+import pghistory.utils
 
 
 @pytest.mark.asyncio
@@ -25,6 +33,134 @@ async def test_async_context():
     await pghistory.models.Context.objects.all().adelete()
 
 
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_async_context_concurrent_tasks():
+    """
+    Concurrent tasks on the same event loop have isolated contexts
+    """
+    entered = asyncio.Event()
+
+    async def run(task_id):
+        async with pghistory.context(task=task_id) as ctx:
+            # Wait until both tasks have entered the context
+            if task_id == 1:
+                entered.set()
+            await entered.wait()
+
+            pghistory.context(extra=task_id)
+            obj = await test_models.BigAutoFieldModel.objects.acreate()
+            return ctx, obj
+
+    (ctx1, obj1), (ctx2, obj2) = await asyncio.gather(run(1), run(2))
+    assert ctx1.id != ctx2.id
+    assert ctx1.metadata == {"task": 1, "extra": 1}
+    assert ctx2.metadata == {"task": 2, "extra": 2}
+    assert not hasattr(pghistory.runtime._tracker, "value")
+
+    events = test_models.BigAutoFieldModel.pgh_event_model.objects.select_related("pgh_context")
+    contexts = {event.pgh_obj_id: event.pgh_context async for event in events}
+    assert contexts[obj1.id].id == ctx1.id
+    assert contexts[obj1.id].metadata == {"task": 1, "extra": 1}
+    assert contexts[obj2.id].id == ctx2.id
+    assert contexts[obj2.id].metadata == {"task": 2, "extra": 2}
+
+    # async pytest django does not clean up the database. Clean up manually
+    await test_models.BigAutoFieldModel.pgh_event_model.objects.all().adelete()
+    await test_models.BigAutoFieldModel.objects.all().adelete()
+    await pghistory.models.Context.objects.all().adelete()
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_async_context_shared_instance():
+    """
+    Concurrent tasks that enter the same instance have isolated contexts
+    """
+    shared = pghistory.context(shared=True)
+    entered1, entered2, exited1 = asyncio.Event(), asyncio.Event(), asyncio.Event()
+
+    async def run1():
+        async with shared as ctx:
+            pghistory.context(task=1)
+            entered1.set()
+            await entered2.wait()
+
+        assert not hasattr(pghistory.runtime._tracker, "value")
+        exited1.set()
+        return ctx
+
+    async def run2():
+        await entered1.wait()
+        async with shared as ctx:
+            pghistory.context(task=2)
+            entered2.set()
+            # The first task exits while the second task is still inside
+            await exited1.wait()
+            assert pghistory.runtime._tracker.value is ctx
+
+        assert not hasattr(pghistory.runtime._tracker, "value")
+        return ctx
+
+    ctx1, ctx2 = await asyncio.gather(run1(), run2())
+    assert ctx1.id != ctx2.id
+    assert ctx1.metadata == {"shared": True, "task": 1}
+    assert ctx2.metadata == {"shared": True, "task": 2}
+    assert shared.metadata == {"shared": True}
+    assert not hasattr(pghistory.runtime._tracker, "value")
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_async_context_decorator():
+    """
+    Decorated coroutine functions enter the context while they run
+    """
+
+    @pghistory.context(decorated=True)
+    async def create(value):
+        pghistory.context(value=value)
+        await asyncio.sleep(0)
+        return (
+            pghistory.runtime._tracker.value,
+            await test_models.BigAutoFieldModel.objects.acreate(),
+        )
+
+    (ctx1, obj1), (ctx2, obj2) = await asyncio.gather(create(1), create(2))
+    assert ctx1.id != ctx2.id
+    assert ctx1.metadata == {"decorated": True, "value": 1}
+    assert ctx2.metadata == {"decorated": True, "value": 2}
+    assert not hasattr(pghistory.runtime._tracker, "value")
+
+    events = test_models.BigAutoFieldModel.pgh_event_model.objects.select_related("pgh_context")
+    contexts = {event.pgh_obj_id: event.pgh_context async for event in events}
+    assert contexts[obj1.id].id == ctx1.id
+    assert contexts[obj2.id].id == ctx2.id
+
+    # async pytest django does not clean up the database. Clean up manually
+    await test_models.BigAutoFieldModel.pgh_event_model.objects.all().adelete()
+    await test_models.BigAutoFieldModel.objects.all().adelete()
+    await pghistory.models.Context.objects.all().adelete()
+
+
+def test_context_decorator_reentered():
+    """
+    Contexts of decorated functions are removed on exit and don't share metadata
+    """
+
+    decorator = pghistory.context(decorated=True)
+
+    @decorator
+    def run(value):
+        pghistory.context(value=value)
+        return pghistory.runtime._tracker.value
+
+    assert run(1).metadata == {"decorated": True, "value": 1}
+    assert run(2).metadata == {"decorated": True, "value": 2}
+    assert decorator.metadata == {"decorated": True}
+    assert not hasattr(pghistory.runtime._tracker, "value")
+
+
 @pytest.mark.django_db(transaction=True)
 def test_concurrent_index_creation():
     """
@@ -238,3 +374,155 @@ def test_nested_tracking(mocker, event_model):
                 "id": m.id,
             },
         ]
+
+
+def _copy_event_model_rows(cursor, rows):
+    """Bulk load EventModel rows with COPY, bypassing Django's execute wrappers"""
+    table = test_models.EventModel._meta.db_table
+    sql = f"COPY {table} (dt_field, int_field) FROM STDIN"
+    data = "".join(f"{dt.isoformat()}\t{int_field}\n" for dt, int_field in rows)
+    if pghistory.utils.psycopg_maj_version == 2:
+        cursor.copy_expert(sql, io.StringIO(data))
+    else:
+        with cursor.copy(sql) as copy:
+            copy.write(data)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("injection", ["statement", "transaction"])
+def test_context_bind(settings, injection):
+    """Context can be bound to the transaction for operations that bypass Django"""
+    settings.PGHISTORY_CONTEXT_INJECTION = injection
+    event_model = test_models.EventModel.pgh_event_models["model.create"]
+    now = timezone.now()
+
+    # Without binding, COPY does not attach context
+    with pghistory.context(key="val"):
+        with connection.cursor() as cursor:
+            _copy_event_model_rows(cursor, [(now, 1)])
+
+    assert event_model.objects.get().pgh_context_id is None
+    event_model.objects.all().delete()
+
+    with pghistory.context(key="val") as ctx:
+        assert pghistory.context.bind() == ctx
+        with connection.cursor() as cursor:
+            _copy_event_model_rows(cursor, [(now, 1), (now, 2)])
+
+        pghistory.context(key2="val2")
+        pghistory.context.bind()
+        with connection.cursor() as cursor:
+            _copy_event_model_rows(cursor, [(now, 3)])
+
+    assert {event.pgh_context_id for event in event_model.objects.all()} == {ctx.id}
+    assert event_model.objects.count() == 3
+    assert pghistory.models.Context.objects.get().metadata == {"key": "val", "key2": "val2"}
+
+    # Binding is ignored without an active context
+    assert pghistory.context.bind() is None
+
+
+@pytest.mark.django_db
+def test_context_bind_once_per_transaction(settings):
+    """Context is only bound once per transaction with transaction-level injection"""
+    settings.PGHISTORY_CONTEXT_INJECTION = "transaction"
+
+    with pghistory.context(key="val"):
+        with CaptureQueriesContext(connection) as queries:
+            pghistory.context.bind()
+            pghistory.context.bind()
+            ddf.G(test_models.EventModel)
+
+    assert sum("set_config" in query["sql"] for query in queries.captured_queries) == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_context_bind_autocommit():
+    """Context can only be bound inside of a transaction"""
+    with pghistory.context(key="val"):
+        with pytest.raises(RuntimeError, match="inside a transaction"):
+            pghistory.context.bind()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("event_model", [test_models.EventModel, test_models.EventModelStatement])
+def test_attached_context_cached_per_transaction(event_model):
+    """
+    Context is only upserted once per transaction unless the metadata changes
+    """
+    with pghistory.context(key="val") as ctx:
+        ddf.G(event_model)
+        assert pghistory.models.Context.objects.get().id == ctx.id
+
+        # Remove the context behind the function's back. Since the context was
+        # already attached in this transaction, it is not upserted again
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {pghistory.models.Context._meta.db_table}")
+
+        ddf.G(event_model)
+        assert not pghistory.models.Context.objects.exists()
+
+        # Changing the metadata upserts the context again
+        pghistory.context(key2="val2")
+        ddf.G(event_model)
+        assert pghistory.models.Context.objects.get().metadata == {"key": "val", "key2": "val2"}
+
+        # Rolling back a savepoint reverts the cache along with the upsert
+        with contextlib.suppress(RuntimeError), transaction.atomic():
+            pghistory.context(key3="val3")
+            ddf.G(event_model)
+            assert pghistory.models.Context.objects.get().metadata["key3"] == "val3"
+            raise RuntimeError
+
+        assert "key3" not in pghistory.models.Context.objects.get().metadata
+        ddf.G(event_model)
+        assert pghistory.models.Context.objects.get().metadata["key3"] == "val3"
+
+    assert {
+        event.pgh_context_id
+        for event in event_model.pgh_event_models["model.create"].objects.all()
+    } == {ctx.id}
+
+
+@pytest.fixture
+def session_attach_context_cache():
+    pghistory.models.Context.install_pgh_attach_context_func(cache="session")
+    yield
+    pghistory.models.Context.install_pgh_attach_context_func()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_attached_context_cached_per_session(session_attach_context_cache):
+    """
+    With the session cache, context is only upserted once per session
+    unless the metadata changes
+    """
+    with pghistory.context(key="val") as ctx:
+        ddf.G(test_models.EventModel)
+        assert pghistory.models.Context.objects.get().id == ctx.id
+
+        # Remove the context behind the function's back, such as when it's pruned.
+        # Later transactions find that it's missing and upsert it again
+        pghistory.models.Context.objects.all().delete()
+        ddf.G(test_models.EventModel)
+        assert pghistory.models.Context.objects.get().metadata == {"key": "val"}
+
+        # Changing the metadata upserts the context again
+        pghistory.context(key2="val2")
+        ddf.G(test_models.EventModel)
+        assert pghistory.models.Context.objects.get().metadata == {"key": "val", "key2": "val2"}
+
+        # Rolling back a transaction reverts the cache along with the upsert
+        with contextlib.suppress(RuntimeError), transaction.atomic():
+            pghistory.context(key3="val3")
+            ddf.G(test_models.EventModel)
+            raise RuntimeError
+
+        assert "key3" not in pghistory.models.Context.objects.get().metadata
+        ddf.G(test_models.EventModel)
+        assert pghistory.models.Context.objects.get().metadata["key3"] == "val3"
+
+
+def test_install_pgh_attach_context_func_invalid_cache():
+    with pytest.raises(ValueError, match="Invalid cache"):
+        pghistory.models.Context.install_pgh_attach_context_func(cache="invalid")
@@ -140,3 +140,127 @@ class Event(pgtrigger.Composer):
         return pgtrigger.Func(
             " ".join(line.strip() for line in sql.split("\n") if line.strip()).strip()
         )
+
+
+class StoreDiff(pgtrigger.Trigger):
+    """
+    Stores the diff from the previous event of the tracked object in the
+    "pgh_diff" field when an event is created
+    """
+
+    name = "store_diff"
+    when = pgtrigger.Before
+    operation = pgtrigger.Insert
+
+    def get_func(self, model):
+        # Diffs match the ones computed by the Events model, which compares
+        # the event with the previous event of the object
+        pgh_obj_col = model._meta.get_field("pgh_obj").column
+        sql = f"""
+            SELECT JSONB_OBJECT_AGG(curr.key, ARRAY[prev.value, curr.value])
+            INTO NEW.pgh_diff
+            FROM JSONB_EACH(TO_JSONB(NEW)) curr
+            JOIN JSONB_EACH((
+                SELECT TO_JSONB(_event) FROM "{model._meta.db_table}" _event
+                WHERE _event."{pgh_obj_col}" = NEW."{pgh_obj_col}"
+                    AND _event.pgh_id < NEW.pgh_id
+                ORDER BY _event.pgh_id DESC
+                LIMIT 1
+            )) prev ON curr.key = prev.key
+            WHERE LEFT(curr.key, 4) != 'pgh_' AND curr.value != prev.value;
+            RETURN NEW;
+        """
+        return pgtrigger.Func(
+            " ".join(line.strip() for line in sql.split("\n") if line.strip()).strip()
+        )
+
+
+def _get_changes_chain_sql(event_model, row, include_row, join=""):
+    """
+    Returns the FROM and WHERE SQL of the events of an object since its latest
+    event that stores every field, up to the event of the row
+    """
+    table = event_model._meta.db_table
+    pgh_obj_col = event_model._meta.get_field("pgh_obj").column
+    op = "<=" if include_row else "<"
+    return f"""
+        "{table}" _chain {join}
+        WHERE _chain."{pgh_obj_col}" = {row}."{pgh_obj_col}"
+            AND _chain.pgh_id {op} {row}.pgh_id
+            AND _chain.pgh_id >= (
+                SELECT MAX(_full.pgh_id) FROM "{table}" _full
+                WHERE _full."{pgh_obj_col}" = {row}."{pgh_obj_col}"
+                    AND _full.pgh_id {op} {row}.pgh_id
+                    AND _full.pgh_changed IS NULL
+            )
+    """
+
+
+def get_changes_data_sql(event_model, row, include_row=True):
+    """
+    Returns SQL for the JSONB of the tracked fields of an event model that
+    stores changed fields. Fields that weren't stored by the event of the row
+    are taken from the previous events of the object.
+    """
+    chain_sql = _get_changes_chain_sql(
+        event_model, row, include_row, join=", JSONB_EACH(TO_JSONB(_chain)) _field"
+    )
+    return f"""
+        (
+            SELECT JSONB_OBJECT_AGG(_field.key, _field.value) FROM (
+                SELECT DISTINCT ON (_field.key) _field.key, _field.value
+                FROM {chain_sql}
+                    AND (_chain.pgh_changed IS NULL OR _field.key = ANY(_chain.pgh_changed))
+                    AND LEFT(_field.key, 4) != 'pgh_'
+                ORDER BY _field.key, _chain.pgh_id DESC
+            ) _field
+        )
+    """
+
+
+class StoreChanges(pgtrigger.Trigger):
+    """
+    Only stores the fields that changed since the previous event of the
+    tracked object. Every `interval` events of the object store every field.
+    """
+
+    name = "store_changes"
+    when = pgtrigger.Before
+    operation = pgtrigger.Insert
+    declare = [("_depth", "INTEGER"), ("_prev", "JSONB"), ("_changed", "TEXT[]")]
+    interval = None
+
+    def __init__(self, *, interval=None, **kwargs):
+        self.interval = interval or self.interval
+        if not self.interval or self.interval < 1:  # pragma: no cover
+            raise ValueError('"interval" must be a positive integer')
+
+        super().__init__(**kwargs)
+
+    def get_func(self, model):
+        chain_sql = _get_changes_chain_sql(model, "NEW", include_row=False)
+        sql = f"""
+            NEW.pgh_changed := NULL;
+            SELECT COUNT(*) INTO _depth FROM {chain_sql};
+            IF _depth = 0 OR _depth >= {int(self.interval)} THEN
+                RETURN NEW;
+            END IF;
+
+            _prev := {get_changes_data_sql(model, "NEW", include_row=False)};
+            SELECT COALESCE(ARRAY_AGG(_field.key ORDER BY _field.key), ARRAY[]::TEXT[])
+            INTO _changed
+            FROM JSONB_EACH(TO_JSONB(NEW)) _field
+            WHERE LEFT(_field.key, 4) != 'pgh_'
+                AND _field.value IS DISTINCT FROM _prev -> _field.key;
+
+            NEW := JSONB_POPULATE_RECORD(NEW, (
+                SELECT COALESCE(JSONB_OBJECT_AGG(_field.key, NULL), JSONB_BUILD_OBJECT())
+                FROM JSONB_EACH(TO_JSONB(NEW)) _field
+                WHERE LEFT(_field.key, 4) != 'pgh_' AND _field.key != ALL(_changed)
+            ));
+            NEW.pgh_changed := _changed;
+            RETURN NEW;
+        """
+        return pgtrigger.Func(
+            " ".join(line.strip() for line in sql.split("\n") if line.strip()).strip()
+        )